@@ -0,0 +1,268 @@
+"""admission.py
+
+- ClientPool: the threads engine's `--max-clients` client threads, started up front
+  (the asyncio engine's equivalent is async_server.AdmissionGate).
+- Connections beyond the free slots wait in a queue of `--admission-queue`; the rest get
+  MSG_BUSY and are closed.
+- AdmissionStats: admission counters and recent queue waits; the p99 goes out with the offers.
+- WorkerLoads: the load of each `--workers` process in shared memory, summed for the offers.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import socket
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from common import WIRE_V2, OfferLoad
+
+DEFAULT_MAX_CLIENTS = 1024       # threads engine: client threads
+DEFAULT_ASYNC_MAX_CLIENTS = 0     # asyncio engine: 0 = no limit
+DEFAULT_ADMISSION_QUEUE = 1024
+# Recent queue waits kept for the percentiles in describe().
+WAIT_SAMPLES = 4096
+# The p99 queue wait in the offers covers the admissions of this many seconds.
+LOAD_WINDOW_SEC = 10.0
+
+BUSY_FRAME = WIRE_V2.busy()
+
+
+def reject(conn: socket.socket) -> None:
+    """Tell an accepted connection the server is busy and close it (never blocks)."""
+    try:
+        conn.setblocking(False)
+        conn.send(BUSY_FRAME)
+        # Closing with unread data sends a reset, which can overtake the busy frame.
+        conn.recv(4096)
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class AdmissionStats:
+    """Admission counters and the recent queue waits (seconds)."""
+
+    def __init__(self, max_clients: int, queue_size: int):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._waits: Deque[Tuple[float, float]] = deque(maxlen=WAIT_SAMPLES)  # (admitted at, wait)
+        self.admitted = 0
+        self.queued = 0       # admitted after waiting for a free slot
+        self.rejected = 0
+        self.peak_queue = 0
+
+    def waited(self, seconds: float, queued: bool) -> None:
+        with self._lock:
+            self.admitted += 1
+            if queued:
+                self.queued += 1
+            self._waits.append((time.monotonic(), seconds))
+
+    def queue_depth(self, depth: int) -> None:
+        if depth > self.peak_queue:
+            self.peak_queue = depth
+
+    def reject(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def describe(self) -> str:
+        with self._lock:
+            waits = sorted(wait for _, wait in self._waits)
+        line = (
+            f"admission: {self.max_clients or 'unlimited'} slots, queue {self.queue_size}; {self.admitted} admitted "
+            f"({self.queued} queued), {self.rejected} rejected busy, peak queue {self.peak_queue}"
+        )
+        if waits:
+            line += (
+                f"; queue wait p50 {_percentile(waits, 0.5) * 1e3:.1f} ms, "
+                f"p99 {_percentile(waits, 0.99) * 1e3:.1f} ms, max {waits[-1] * 1e3:.1f} ms"
+            )
+        return line
+
+    def recent_p99(self, window: float = LOAD_WINDOW_SEC) -> float:
+        """p99 queue wait of the admissions in the last `window` seconds (0 without any)."""
+        since = time.monotonic() - window
+        with self._lock:
+            waits = sorted(wait for at, wait in self._waits if at >= since)
+        return _percentile(waits, 0.99) if waits else 0.0
+
+    def load(self, active: int) -> OfferLoad:
+        """The load to offer, with `active` connections served or waiting."""
+        return OfferLoad(active, self.max_clients, self.recent_p99())
+
+
+class WorkerLoads:
+    """The load of each `--workers` process in shared memory; total() is the supervisor's offer."""
+
+    FIELDS = 3  # active, capacity, p99 queue wait
+
+    def __init__(self, workers: int, capacity: int):
+        self._capacity = capacity
+        self._values = multiprocessing.Array("d", self.FIELDS * workers)
+        for idx in range(workers):
+            self.reset(idx)
+
+    def reset(self, idx: int) -> None:
+        """A (re)started worker: idle until it publishes."""
+        self.publish(idx, OfferLoad(0, self._capacity, 0.0))
+
+    def publish(self, idx: int, load: OfferLoad) -> None:
+        start = self.FIELDS * idx
+        with self._values.get_lock():
+            self._values[start:start + self.FIELDS] = [load.active, load.capacity, load.p99_queue_wait]
+
+    def slot(self, idx: int) -> "WorkerLoad":
+        return WorkerLoad(self, idx)
+
+    def total(self) -> OfferLoad:
+        with self._values.get_lock():
+            values = self._values[:]
+        # Percentiles of separate queues do not add up: offer the worst.
+        rows = [values[i:i + self.FIELDS] for i in range(0, len(values), self.FIELDS)]
+        return OfferLoad(
+            int(sum(active for active, _, _ in rows)),
+            int(sum(capacity for _, capacity, _ in rows)),
+            max(p99 for _, _, p99 in rows),
+        )
+
+
+class WorkerLoad:
+    """One worker's slot in WorkerLoads (passed to the worker process)."""
+
+    __slots__ = ("_loads", "_idx")
+
+    def __init__(self, loads: WorkerLoads, idx: int):
+        self._loads = loads
+        self._idx = idx
+
+    def publish(self, load: OfferLoad) -> None:
+        self._loads.publish(self._idx, load)
+
+
+class ClientPool:
+    """`size` client threads started up front; up to `queue_size` more connections wait for one.
+
+    `serve(conn, addr, idle)` runs on a pool thread and owns the connection.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        queue_size: int,
+        serve: Callable[[socket.socket, Tuple[str, int], bool], None],
+        log: Callable[[str], None] = print,
+    ):
+        if size < 1:
+            raise ValueError(f"client pool size must be positive, got {size}")
+        self.size = size
+        self.queue_size = queue_size
+        self.stats = AdmissionStats(size, queue_size)
+        self._serve = serve
+        self._log = log
+        self._cond = threading.Condition()
+        # (conn, addr, idle, time queued), oldest first
+        self._pending: Deque[Tuple[socket.socket, Tuple[str, int], bool, float]] = deque()
+        self._idle = 0      # threads waiting for a connection
+        self._active = 0    # threads serving one
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.size):
+            th = threading.Thread(target=self._run, name=f"client-{i}")
+            th.start()
+            self._threads.append(th)
+
+    @property
+    def waiting(self) -> int:
+        """Connections waiting for a thread (none idle to take them)."""
+        with self._cond:
+            return max(0, len(self._pending) - self._idle)
+
+    @property
+    def active(self) -> int:
+        """Connections being served or waiting to be."""
+        with self._cond:
+            return self._active + len(self._pending)
+
+    def submit(self, conn: socket.socket, addr: Tuple[str, int], idle: bool = False) -> bool:
+        """Queue a connection for the next free thread; False if the queue is full (reject it)."""
+        with self._cond:
+            if self._closed or len(self._pending) >= self._idle + self.queue_size:
+                self.stats.reject()
+                return False
+            self._pending.append((conn, addr, idle, time.monotonic()))
+            self.stats.queue_depth(len(self._pending) - self._idle)
+            self._cond.notify()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                queued = not self._idle_wait()
+                if self._closed:
+                    return
+                conn, addr, idle, since = self._pending.popleft()
+                self._active += 1
+            self.stats.waited(time.monotonic() - since, queued)
+            try:
+                self._serve(conn, addr, idle)
+            except Exception:
+                # A handler bug must not cost the pool a thread.
+                self._log(f"[{addr[0]}:{addr[1]}] Client handler failed:\n{traceback.format_exc().rstrip()}")
+                try:
+                    conn.close()
+                except OSError:
+                    pass
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    if not self._active and not self._pending:
+                        self._cond.notify_all()
+
+    def _idle_wait(self) -> bool:
+        # With self._cond held: True if we had to wait for a connection (or close()).
+        if self._pending or self._closed:
+            return False
+        self._idle += 1
+        try:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+        finally:
+            self._idle -= 1
+        return True
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no connection is served or waiting; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._active and not self._pending, timeout)
+
+    def close(self) -> None:
+        """Stop the threads once their connections end; close the connections still queued."""
+        with self._cond:
+            self._closed = True
+            pending = [entry[0] for entry in self._pending]
+            self._pending.clear()
+            self._cond.notify_all()
+        for conn in pending:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Join the threads, all within `timeout` seconds (after close())."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for th in self._threads:
+            th.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
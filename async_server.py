@@ -0,0 +1,765 @@
+"""async_server.py
+
+asyncio engine for the blackjack server (selected with `server.py --engine asyncio`).
+
+- Same game flow and wire formats as the threaded engine in server.py.
+- Every client is a coroutine on a single event loop instead of an OS thread, so
+  idle players (sitting in "Hit or Stand?") cost a few KB instead of a thread stack.
+- Outgoing payloads are queued and written in one go at decision points (asyncio sets
+  TCP_NODELAY itself); transport write-buffer limits provide backpressure for slow readers.
+- Autoplay sessions (see server.play_table_round) are played in chunks between yields.
+- Keep-alive connections wait for their next request with asyncio.wait_for (idle timeout).
+- SIGUSR2 hands the listening socket to a new server process (see handoff.py); idle
+  keep-alive waits then end and pass their connection over.
+- Phase deadlines (see deadlines.py) wrap the reads in asyncio.wait_for, i.e. the event
+  loop's timer heap; heartbeats are TCP keepalive on the transport's socket.
+- Sessions are not limited by default; with `--max-clients` at most that many are served
+  at once, `--admission-queue` more wait for a slot (AdmissionGate) and the rest get
+  MSG_BUSY. A keep-alive connection gives its slot back while it waits idle.
+- Per-IP rate limits (see ratelimit.py) are checked as a connection comes in, before it
+  waits for a slot, and on every decision.
+- Ctrl+C mirrors server.run_server: one shutdown message, listener and clients closed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import errno
+import signal
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
+
+from blackjack import (
+    BlackJackGame,
+    Card,
+    Shoe,
+    RESULT_LOSS,
+    RESULT_NOT_OVER,
+    RESULT_WIN,
+)
+
+from common import (
+    FRAME_FLAG,
+    FRAME_HEADER,
+    MAGIC_COOKIE,
+    MAX_FRAME_BODY,
+    MSG_DECISION_TABLE,
+    MSG_REQUEST,
+    MSG_REQUEST_AUTOPLAY,
+    MSG_PAYLOAD,
+    UDP_PORT_OFFERS,
+    PREAMBLE_STRUCT,
+    REQUEST_STRUCT,
+    REQUEST_BODY,
+    CLIENT_PAYLOAD_STRUCT,
+    DECISION_BODY,
+    DECISION_TABLE_STRUCT,
+    DECISION_TABLE_BODY,
+    FLAG_DEALER_TRANSCRIPT,
+    FLAG_KEEP_ALIVE,
+    MSG_RESUME,
+    RESUME_STRUCT,
+    RESUME_BODY,
+    WakeupEvent,
+    Wire,
+    unpack_decision_table,
+    wire_for,
+)
+from admission import BUSY_FRAME, AdmissionStats, WorkerLoad
+from deadlines import REAP_DEAD_PEER, PhaseDeadlines, ReapStats, enable_heartbeat
+from gamelog import EVT_INFO, EVT_REGISTERED, EVT_FINISHED, EVT_DISCONNECTED, EVT_RESUMED, EVT_REAPED, EVT_THROTTLED
+from handoff import HANDOFF_SIGNAL, Handoff, Takeover, handoff_supported
+from ratelimit import PeerLimits, PeerQuota, Throttled
+from sessions import Session, SessionTable
+from shuffle import ShoeFactory
+from server import (
+    AUTOPLAY_FLUSH_ROUNDS,
+    GAME_LOG,
+    LISTEN_BACKLOG,
+    ServerConfig,
+    broadcast_offers,
+    close_session_table,
+    publish_load,
+    get_local_ip,
+    open_session_table,
+    play_table_round,
+    print_house_edge,
+    resumed_welcome,
+    rounds_label,
+    session_from_request,
+    session_rounds,
+    _log_state,
+    _log_round_end,
+)
+
+# Per-connection transport buffer limits: drain() blocks on a client that stops reading.
+WRITE_BUFFER_HIGH = 16 * 1024
+WRITE_BUFFER_LOW = 4 * 1024
+
+# StreamReader buffer limit; client messages are tiny (10/38 bytes).
+READ_BUFFER_LIMIT = 4 * 1024
+
+
+class AdmissionGate:
+    """asyncio counterpart of admission.ClientPool: `limit` sessions at once (0 = no limit)."""
+
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.stats = AdmissionStats(limit, queue_size)
+        self._busy = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def active(self) -> int:
+        """Sessions being served or waiting to be."""
+        return self._busy + len(self._waiters)
+
+    async def enter(self) -> bool:
+        """Take a slot, waiting for one if need be; False if the queue is full (reject)."""
+        if (not self.limit or self._busy < self.limit) and not self._waiters:
+            self._busy += 1
+            self.stats.waited(0.0, False)
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.stats.reject()
+            return False
+        since = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self.stats.queue_depth(len(self._waiters))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.leave()  # the slot was handed over just as we were cancelled
+            else:
+                self._waiters.remove(fut)
+            raise
+        self.stats.waited(time.monotonic() - since, True)
+        return True
+
+    def leave(self) -> None:
+        """Give the slot back: to the longest waiting connection, if any."""
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._busy -= 1
+
+
+class GateSlot:
+    """One connection's hold on an AdmissionGate slot: taken per session, not per connection."""
+
+    __slots__ = ("_gate", "_held")
+
+    def __init__(self, gate: AdmissionGate):
+        self._gate = gate
+        self._held = False
+
+    async def enter(self) -> bool:
+        self._held = await self._gate.enter()
+        return self._held
+
+    def leave(self) -> None:
+        if self._held:
+            self._held = False
+            self._gate.leave()
+
+
+async def recv_exact(reader: asyncio.StreamReader, n: int) -> Optional[bytes]:
+    """Read exactly n bytes; returns None if the connection closes first."""
+    try:
+        return await reader.readexactly(n)
+    except (asyncio.IncompleteReadError, ConnectionError, OSError):
+        return None
+
+
+async def within(deadlines: PhaseDeadlines, aw):
+    """Await a read; None (and `deadlines` expired) once the current phase's deadline passes."""
+    left = deadlines.left()
+    if left is None:
+        return await aw
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError:
+        deadlines.expire()
+        return None
+
+
+async def recv_message(
+    reader: asyncio.StreamReader,
+    wire: Wire,
+    v1_layout: struct.Struct,
+    body: struct.Struct,
+    types: Tuple[int, ...],
+    consumed: bytes = b"",
+) -> Optional[tuple]:
+    """asyncio counterpart of Wire.read; `consumed` = bytes of the message already read."""
+    if not wire.framed:
+        raw = await recv_exact(reader, v1_layout.size - len(consumed))
+        return None if raw is None else v1_layout.unpack(consumed + raw)
+    while True:
+        raw = await recv_exact(reader, FRAME_HEADER.size - len(consumed))
+        if raw is None:
+            return None
+        cookie, marker, msg_type, length = FRAME_HEADER.unpack(consumed + raw)
+        consumed = b""
+        if cookie != MAGIC_COOKIE or not marker & FRAME_FLAG or length > MAX_FRAME_BODY:
+            return None
+        data = await recv_exact(reader, length) if length else b""
+        if data is None:
+            return None
+        fields = wire.decode_frame(msg_type, data, body, types)
+        if fields is not None:
+            return fields
+
+
+def send_server_payload(out: List[bytes], wire: Wire, result: int, card: Optional[Card]) -> None:
+    # Queued only; see flush().
+    out.append(wire.server_payload(result, card))
+
+
+def send_dealer_card(
+    out: List[bytes], wire: Wire, dealer_cards: Optional[List[Card]], result: int, card: Card
+) -> None:
+    """Send a dealer card now, or collect it for the transcript (dealer_cards not None)."""
+    if dealer_cards is None:
+        send_server_payload(out, wire, result, card)
+    else:
+        dealer_cards.append(card)
+
+
+async def flush(writer: asyncio.StreamWriter, out: List[bytes]) -> None:
+    """Hand the queued payloads to the transport in one write, then apply backpressure."""
+    if out:
+        writer.writelines(out)
+        out.clear()
+    await writer.drain()
+
+
+async def play_one_round(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    wire: Wire,
+    server_name: str,
+    round_idx: int,
+    rounds_total: int,
+    player_name: str,
+    shoe: Optional[Shoe] = None,
+    transcript: bool = False,
+    session: Optional[Session] = None,
+    deadlines: Optional[PhaseDeadlines] = None,
+    quota: Optional[PeerQuota] = None,
+) -> int:
+    # A resumed session continues its parked game; the client got its cards in MSG_ROUND_STATE.
+    game = session.game if session is not None else None
+    sampled = GAME_LOG.round_sampled()
+    deadlines = deadlines or PhaseDeadlines()
+    quota = quota or PeerQuota()
+    out: List[bytes] = []
+    if game is None:
+        game = BlackJackGame(player_name, shoe)
+        game.start_game()
+
+        # Initial reveal: player 2 cards; dealer shows only first.
+        p_cards = game.get_player_cards()
+        d_cards = game.get_dealer_cards()
+
+        send_server_payload(out, wire, RESULT_NOT_OVER, p_cards[0])
+        send_server_payload(out, wire, RESULT_NOT_OVER, p_cards[1])
+        send_server_payload(out, wire, RESULT_NOT_OVER, d_cards[0])
+        if session is not None:
+            session.update(game)
+
+    player_hand = game.get_player_hand()
+    dealer_hand = game.get_dealer_hand()
+
+    _log_state(
+        sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=True
+    )
+
+    # Player decisions loop
+    while True:
+        await flush(writer, out)
+        deadlines.decision()
+        msg = await within(deadlines, recv_message(reader, wire, CLIENT_PAYLOAD_STRUCT, DECISION_BODY, (MSG_PAYLOAD,)))
+        if not msg:
+            raise ConnectionError("client disconnected")
+        quota.decision()
+
+        cookie, msg_type, decision_raw = msg
+        if cookie != MAGIC_COOKIE or msg_type != MSG_PAYLOAD:
+            continue
+
+        decision = decision_raw.decode("utf-8", errors="ignore").strip("\x00")
+        if decision not in ("Hittt", "Stand"):
+            decision = "Stand"
+
+        if decision == "Stand":
+            break
+
+        card, state = game.player_hit()
+        send_server_payload(out, wire, state, card)
+        _log_state(
+            sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=True
+        )
+
+        if state == RESULT_LOSS:
+            # Bust: state already printed with the bust card (avoid printing the same final state twice).
+            if session is not None:
+                session.update(None)
+            await flush(writer, out)
+            return _log_round_end(sampled, round_idx, rounds_total, game, state)
+        if session is not None:
+            session.update(game)
+
+    # The outcome no longer depends on the player: a drop from here on resumes at the next round.
+    if session is not None:
+        session.decide()
+
+    # Dealer reveals hidden card then hits while < 17 (collected for a transcript if asked).
+    dealer_cards: Optional[List[Card]] = [] if transcript else None
+    hidden = game.reveal_dealer_hidden()
+    if hidden is not None:
+        send_dealer_card(out, wire, dealer_cards, RESULT_NOT_OVER, hidden)
+
+    _log_state(
+        sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False
+    )
+
+    while game.dealer_should_hit():
+        card, state = game.dealer_hit()
+        send_dealer_card(out, wire, dealer_cards, state, card)
+        _log_state(
+            sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False
+        )
+
+        if state == RESULT_WIN:
+            # Dealer bust: state already printed with the bust card (avoid printing the same final state twice).
+            if dealer_cards is not None:
+                out.append(wire.dealer_transcript(state, dealer_cards))
+            if session is not None:
+                session.update(None)  # checkpoint the shoe past the dealer's cards
+            await flush(writer, out)
+            return _log_round_end(sampled, round_idx, rounds_total, game, state)
+    result = game.final_result()
+    if dealer_cards is None:
+        send_server_payload(out, wire, result, None)
+    else:
+        out.append(wire.dealer_transcript(result, dealer_cards))
+    if session is not None:
+        session.update(None)  # checkpoint the shoe past the dealer's cards
+    await flush(writer, out)
+    return _log_round_end(sampled, round_idx, rounds_total, game, result)
+
+
+async def play_session(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    wire: Wire,
+    config: ServerConfig,
+    session: Session,
+    deadlines: PhaseDeadlines,
+    quota: PeerQuota,
+) -> bool:
+    """asyncio counterpart of server.play_session; False if the session deadline passed."""
+    total = rounds_label(session.rounds)
+    if session.table is None:
+        for r in session_rounds(session.rounds, session.next_round):
+            session.round_idx = r
+            await play_one_round(
+                reader, writer, wire, config.server_name, r, total, session.client_name, session.shoe,
+                transcript=bool(session.flags & FLAG_DEALER_TRANSCRIPT), session=session, deadlines=deadlines,
+                quota=quota,
+            )
+        return True
+
+    # Rounds are CPU-only here: after each chunk, let the other sessions run.
+    out: List[bytes] = []
+    for r in session_rounds(session.rounds):
+        out.append(play_table_round(wire, r, total, session.client_name, session.shoe, session.table))
+        if r % AUTOPLAY_FLUSH_ROUNDS == 0:
+            await flush(writer, out)
+            if not deadlines.check():
+                return False
+            await asyncio.sleep(0)
+    await flush(writer, out)
+    return True
+
+
+async def serve_session(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    wire: Wire,
+    head: bytes,
+    peer: str,
+    config: ServerConfig,
+    shoes: ShoeFactory,
+    sessions: SessionTable,
+    deadlines: PhaseDeadlines,
+    quota: PeerQuota,
+) -> bool:
+    """asyncio counterpart of server.serve_session; `head` = the request's preamble bytes."""
+    if wire.framed:
+        # Read the rest of the frame header to see whether this is a request or MSG_RESUME.
+        rest = await within(deadlines, recv_exact(reader, FRAME_HEADER.size - len(head)))
+        if rest is None:
+            return False
+        head += rest
+    if wire.framed and FRAME_HEADER.unpack(head)[2] == MSG_RESUME:
+        msg = await within(
+            deadlines, recv_message(reader, wire, RESUME_STRUCT, RESUME_BODY, (MSG_RESUME,), consumed=head)
+        )
+        if msg:
+            quota.decision()
+        session = sessions.claim(msg[2]) if msg else None
+        if session is None:
+            # Unknown or expired token: a welcome without a token tells the client so.
+            if msg:
+                await flush(writer, [wire.welcome()])
+            return False
+        writer.write(resumed_welcome(wire, session))
+        GAME_LOG.event(EVT_RESUMED, peer, session.client_name, session.next_round)
+        deadlines.start_session()
+    else:
+        req_types = (MSG_REQUEST, MSG_REQUEST_AUTOPLAY)
+        req = await within(
+            deadlines, recv_message(reader, wire, REQUEST_STRUCT, REQUEST_BODY, req_types, consumed=head)
+        )
+        if req:
+            quota.decision()
+        session = session_from_request(req, config, shoes, sessions) if req else None
+        if session is None:
+            return False
+        if req[1] == MSG_REQUEST_AUTOPLAY:
+            msg = await within(
+                deadlines,
+                recv_message(reader, wire, DECISION_TABLE_STRUCT, DECISION_TABLE_BODY, (MSG_DECISION_TABLE,)),
+            )
+            session.table = unpack_decision_table(msg) if msg else None
+            if session.table is None:
+                return False
+        if wire.framed:
+            writer.write(wire.welcome(session.flags, session.token))
+        GAME_LOG.event(EVT_REGISTERED, peer, session.client_name, rounds_label(session.rounds))
+        deadlines.start_session()
+
+    start = session.next_round  # after a resume, earlier rounds were played elsewhere
+    try:
+        if not await play_session(reader, writer, wire, config, session, deadlines, quota):
+            return False
+    except (ConnectionError, OSError):
+        # Keep a resumable session for its client to reconnect (shutdown cancels instead).
+        if session.resumable:
+            sessions.park(session)
+        raise
+    if session.resumable:
+        sessions.close(session)
+    keep = bool(session.flags & FLAG_KEEP_ALIVE)
+    GAME_LOG.event(EVT_FINISHED, peer, session.rounds - start + 1, None, None, keep)
+    return keep
+
+
+async def wait_for_request(
+    reader: asyncio.StreamReader, timeout: float, draining: Optional[asyncio.Event] = None
+) -> Optional[bytes]:
+    """Keep-alive wait for the next preamble: None after `timeout` s, at EOF, or once `draining` is set."""
+    if draining is None:
+        try:
+            return await asyncio.wait_for(recv_exact(reader, PREAMBLE_STRUCT.size), timeout)
+        except asyncio.TimeoutError:
+            return None
+    read = asyncio.ensure_future(recv_exact(reader, PREAMBLE_STRUCT.size))
+    drained = asyncio.ensure_future(draining.wait())
+    try:
+        done, _ = await asyncio.wait({read, drained}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        read.cancel()
+        drained.cancel()
+    return read.result() if read in done else None
+
+
+def _reap_reason(reader: asyncio.StreamReader, deadlines: PhaseDeadlines) -> str:
+    """Why the connection is being reaped ("" = it is not): a deadline, or a dead peer."""
+    if not deadlines.expired:
+        exc = reader.exception()
+        if isinstance(exc, OSError) and exc.errno == errno.ETIMEDOUT:
+            # Heartbeats (or unacknowledged sends) went unanswered.
+            deadlines.expire(REAP_DEAD_PEER)
+    return deadlines.expired
+
+
+async def handle_client(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    stop_evt: asyncio.Event,
+    config: ServerConfig,
+    shoes: ShoeFactory,
+    sessions: SessionTable,
+    handoff: Optional[Handoff] = None,
+    draining: Optional[asyncio.Event] = None,
+    idle: bool = False,
+    admission: Optional[AdmissionGate] = None,
+    reaped: Optional[ReapStats] = None,
+    limits: Optional[PeerLimits] = None,
+) -> None:
+    # idle = a keep-alive connection taken over from the previous server process (handoff.py)
+    addr = writer.get_extra_info("peername") or ("?", 0)
+    peer = f"{addr[0]}:{addr[1]}"
+    deadlines = config.phase_deadlines()
+    quota = limits.quota(addr[0]) if limits is not None else PeerQuota()
+    slot = GateSlot(admission) if admission is not None else None
+
+    async def admitted() -> bool:
+        # A slot for the next session; without one the connection is told the server is busy.
+        if slot is None or await slot.enter():
+            return True
+        writer.write(BUSY_FRAME)
+        return False
+
+    try:
+        if not idle and not await admitted():
+            return
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH, low=WRITE_BUFFER_LOW)
+        enable_heartbeat(writer.get_extra_info("socket"), config.heartbeat)
+
+        # v1 or v2 is decided by the byte after the cookie of the first message.
+        deadlines.request()
+        if idle:
+            head = await wait_for_request(reader, config.keepalive_idle)
+            if head and not await admitted():
+                return
+        else:
+            head = await within(deadlines, recv_exact(reader, PREAMBLE_STRUCT.size))
+        if not head:
+            return
+        cookie, marker = PREAMBLE_STRUCT.unpack(head)
+        wire = wire_for(marker)
+        if cookie != MAGIC_COOKIE or wire is None:
+            return
+
+        while await serve_session(reader, writer, wire, head, peer, config, shoes, sessions, deadlines, quota):
+            # Keep-alive: wait for the next request without a slot.
+            if slot is not None:
+                slot.leave()
+            deadlines.idle()
+            deadline = time.monotonic() + config.keepalive_idle
+            head = await wait_for_request(reader, config.keepalive_idle, draining)
+            if head is None and handoff is not None and handoff.active and not stop_evt.is_set():
+                # Draining: the idle connection moves to the new process.
+                if handoff.send_connection(writer.get_extra_info("socket")):
+                    return
+                head = await wait_for_request(reader, max(0.0, deadline - time.monotonic()))
+            if not head or not await admitted():
+                return
+            deadlines.request()
+
+    except Throttled as exc:
+        GAME_LOG.event(EVT_THROTTLED, peer, str(exc))
+    except (ConnectionError, OSError):
+        # Client may disconnect mid-round (e.g., Ctrl+C).
+        # If the server itself is not shutting down, report it.
+        if not stop_evt.is_set() and not _reap_reason(reader, deadlines):
+            GAME_LOG.event(EVT_DISCONNECTED, peer)
+    except asyncio.CancelledError:
+        # Cancelled by shutdown; the finally block closes the connection.
+        pass
+    finally:
+        if slot is not None:
+            slot.leave()
+        reason = _reap_reason(reader, deadlines)
+        if reason and not stop_evt.is_set():
+            GAME_LOG.event(EVT_REAPED, peer, reason)
+            if reaped is not None:
+                reaped.count(reason)
+        writer.close()
+
+
+async def _serve(
+    config: ServerConfig, worker: bool, takeover: Optional[Takeover] = None, load_slot: Optional[WorkerLoad] = None
+) -> None:
+    loop = asyncio.get_running_loop()
+    stop_evt = asyncio.Event()
+    # Set once a handoff succeeded: keep-alive waits then pass their connection over.
+    draining = asyncio.Event()
+    handoff = Handoff(threading.Event()) if handoff_supported() and not worker else None
+    # Shuffles run on the pool's thread; with --seed, a pool miss or a dry shoe, on the loop.
+    shoes = ShoeFactory(config.decks, config.penetration, config.seed, config.secure_rng, config.shuffle_pool)
+    sessions = open_session_table(config, shoes, worker, takeover is not None)
+    client_tasks: Set[asyncio.Task] = set()
+    gate = AdmissionGate(config.client_slots(), config.admission_queue)
+    reaped = ReapStats()
+    limits = config.peer_limits()
+
+    async def _on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, idle: bool = False) -> None:
+        if not idle and not limits.connect((writer.get_extra_info("peername") or ("?",))[0]):
+            # Over its connection rate: turned away before it waits for a slot.
+            writer.write(BUSY_FRAME)
+            writer.close()
+            return
+        task = asyncio.current_task()
+        client_tasks.add(task)
+        try:
+            await handle_client(
+                reader, writer, stop_evt, config, shoes, sessions, handoff, draining, idle, gate, reaped, limits
+            )
+        finally:
+            client_tasks.discard(task)
+
+    async def _adopt_connection(conn: socket.socket) -> None:
+        # An idle keep-alive connection passed over by the old process (handoff.Takeover).
+        try:
+            reader, writer = await asyncio.open_connection(sock=conn, limit=READ_BUFFER_LIMIT)
+        except OSError:
+            conn.close()
+            return
+        await _on_connect(reader, writer, idle=True)
+
+    if takeover is not None:
+        server = await asyncio.start_server(
+            _on_connect, sock=takeover.listener(), backlog=LISTEN_BACKLOG, limit=READ_BUFFER_LIMIT
+        )
+    else:
+        server = await asyncio.start_server(
+            _on_connect,
+            host="",
+            port=config.tcp_port,
+            family=socket.AF_INET,
+            reuse_address=True,
+            reuse_port=worker or None,
+            backlog=LISTEN_BACKLOG,
+            limit=READ_BUFFER_LIMIT,
+        )
+    port = server.sockets[0].getsockname()[1]
+
+    # Offers (and ping echoes) reuse the threaded broadcaster; it reads the gate's load off the loop.
+    offer_stop_evt = WakeupEvent()
+    if not worker:
+        offer_thread = threading.Thread(
+            target=broadcast_offers,
+            args=(offer_stop_evt, config.server_name, port, lambda: gate.stats.load(gate.active)),
+            daemon=True,
+        )
+        offer_thread.start()
+        print(f"Offering UDP broadcasts on port {UDP_PORT_OFFERS}, TCP listening on port {port}")
+    elif load_slot is not None:
+        threading.Thread(
+            target=publish_load,
+            args=(offer_stop_evt, load_slot, lambda: gate.stats.load(gate.active)),
+            daemon=True,
+        ).start()
+
+    def _shutdown() -> None:
+        # Ensure the shutdown message is printed exactly once.
+        if stop_evt.is_set():
+            return
+        if handoff is not None and handoff.pid:
+            print(f"\nDrained; server process {handoff.pid} has taken over")
+        elif not worker:
+            print("\nServer shutting down gracefully...")
+        stop_evt.set()
+
+    async def _handoff() -> None:
+        # Handoff.start blocks until the new process is ready: run it off the loop.
+        if not await loop.run_in_executor(None, handoff.start, server.sockets[0]):
+            GAME_LOG.event(EVT_INFO, "Handoff failed: the new server process did not start; still serving")
+            return
+        GAME_LOG.event(EVT_INFO, f"Server process {handoff.pid} took over the listening socket; draining")
+        offer_stop_evt.set()
+        server.close()
+        draining.set()
+        await loop.run_in_executor(None, handoff.release, sessions)
+
+        # Let the active sessions finish, then exit.
+        deadline = loop.time() + config.drain_timeout
+        while client_tasks and not stop_evt.is_set():
+            timeout = deadline - loop.time() if config.drain_timeout > 0 else None
+            if timeout is not None and timeout <= 0:
+                GAME_LOG.event(EVT_INFO, f"Drain timeout: closing {len(client_tasks)} sessions still active")
+                break
+            await asyncio.wait(set(client_tasks), timeout=timeout)
+        handoff.close()
+        _shutdown()
+
+    handoff_tasks: Set[asyncio.Task] = set()
+
+    def _on_handoff_signal() -> None:
+        task = loop.create_task(_handoff())
+        handoff_tasks.add(task)
+        task.add_done_callback(handoff_tasks.discard)
+
+    try:
+        loop.add_signal_handler(signal.SIGINT, _shutdown)
+        if handoff is not None:
+            loop.add_signal_handler(HANDOFF_SIGNAL, _on_handoff_signal)
+    except (NotImplementedError, RuntimeError):
+        # Not available on this platform/loop; KeyboardInterrupt is handled by the caller.
+        pass
+
+    shoes.start()
+    GAME_LOG.start()
+    if takeover is not None:
+        takeover.ready(
+            shoes, sessions,
+            lambda conn: asyncio.run_coroutine_threadsafe(_adopt_connection(conn), loop),
+            lambda text: GAME_LOG.event(EVT_INFO, text),
+        )
+    try:
+        await stop_evt.wait()
+    finally:
+        offer_stop_evt.set()
+
+        # Stop accepting, then cancel active sessions so their sockets get closed.
+        server.close()
+        for task in list(client_tasks):
+            task.cancel()
+        if client_tasks:
+            await asyncio.gather(*client_tasks, return_exceptions=True)
+        await server.wait_closed()
+        shoes.close()
+        if shoes.pool is not None:
+            GAME_LOG.event(EVT_INFO, shoes.describe())
+        close_session_table(sessions)
+        if gate.stats.queued or gate.stats.rejected:
+            GAME_LOG.event(EVT_INFO, gate.stats.describe())
+        if reaped.total:
+            GAME_LOG.event(EVT_INFO, reaped.describe())
+        if limits.refused:
+            GAME_LOG.event(EVT_INFO, limits.describe())
+        if handoff is not None and handoff.pid:
+            GAME_LOG.event(EVT_INFO, handoff.describe())
+        GAME_LOG.close()
+
+        try:
+            loop.remove_signal_handler(signal.SIGINT)
+            if handoff is not None:
+                loop.remove_signal_handler(HANDOFF_SIGNAL)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+
+def run_server_async(
+    config: Optional[ServerConfig] = None, *, worker: bool = False, load_slot: Optional[WorkerLoad] = None
+) -> None:
+    # worker=True: see server.run_server (SO_REUSEPORT, no offers/banner, load to `load_slot`).
+    config = config or ServerConfig()
+    GAME_LOG.configure(config.log_verbosity, config.log_sample_rate)
+    # Started by a handoff (handoff.py): the listening socket comes from the old process.
+    takeover = Takeover.from_env() if not worker else None
+    if not worker:
+        ip = get_local_ip()
+        print(f"Server started, listening on IP address {ip}")
+        if takeover is not None:
+            print(f"Taking over from server process {takeover.pid}")
+        print_house_edge(config)
+    asyncio.run(_serve(config, worker, takeover, load_slot))
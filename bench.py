@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""bench.py
+
+Micro-benchmarks for hot paths (no networking unless a benchmark says so).
+
+    python bench.py hand [--rounds N]
+    python bench.py ev [--rounds N] [--think SEC]
+    python bench.py checkpoint [--rounds N]
+    python bench.py shutdown [--sessions N] [--engine threads|asyncio]   (networking)
+    python bench.py overload [--sessions N] [--rounds N] [--engine threads|asyncio]   (networking)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import blackjack
+from blackjack import ACE_VALUE, BLACKJACK, DEFAULT_SHOE_DECKS, BlackJackGame, Card, ROYALTY_VALUE, Shoe
+
+
+class _RewalkHand(blackjack.Hand):
+    """The pre-incremental Hand: every value query re-walks all cards."""
+
+    @property  # type: ignore[override]
+    def value(self) -> int:
+        total = 0
+        aces = 0
+        for card in self.cards:
+            if card.value in ("J", "Q", "K"):
+                total += ROYALTY_VALUE
+            elif card.value == "A":
+                total += ACE_VALUE
+                aces += 1
+            else:
+                total += int(card.value)
+        while total > BLACKJACK and aces > 0:
+            total -= ROYALTY_VALUE
+            aces -= 1
+        return total
+
+    @value.setter
+    def value(self, _v: int) -> None:
+        pass
+
+    def add_card(self, card: Card) -> None:
+        self.cards.append(card)
+
+
+def _time_dealer_loop(rounds: int, hand_cls: type) -> float:
+    """Seconds spent in the dealer draw loop + resolution (deck setup excluded)."""
+    saved = blackjack.Hand
+    blackjack.Hand = hand_cls  # Player() picks the Hand class up from the module
+    try:
+        games: List[BlackJackGame] = []
+        for _ in range(rounds):
+            game = BlackJackGame("bench")
+            game.start_game()
+            games.append(game)
+        start = time.perf_counter()
+        for game in games:
+            while game.dealer_should_hit():
+                game.dealer_hit()
+            game.final_result()
+        return time.perf_counter() - start
+    finally:
+        blackjack.Hand = saved
+
+
+def bench_hand(args: argparse.Namespace) -> None:
+    old = _time_dealer_loop(args.rounds, _RewalkHand)
+    new = _time_dealer_loop(args.rounds, blackjack.Hand)
+    print(f"dealer draw loop, {args.rounds} rounds")
+    print(f"  re-walk Hand:     {old * 1e6 / args.rounds:7.2f} us/round")
+    print(f"  incremental Hand: {new * 1e6 / args.rounds:7.2f} us/round  ({old / new:.1f}x faster)")
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+# Per-decision latency blackjack.ev is held to.
+EV_P99_TARGET_SEC = 0.001
+# The --hint pass: rounds played, --think seconds each like a player would, and
+# client.HINT_EV_BUDGET_SEC (importing client would install its SIGINT handler).
+HINT_ROUNDS = 100
+HINT_EV_BUDGET_SEC = 0.0005
+
+
+def bench_ev(args: argparse.Namespace) -> None:
+    """Latency of blackjack.ev over a session shoe, following its advice.
+
+    The first decision of a round meets a new composition (cold); the decisions after a
+    hit find their subtree in the oracle's LRU cache (warm). Each kind is checked against
+    EV_P99_TARGET_SEC separately: cold decisions with deep hit trees do not meet it.
+    Then the client's --hint path on a new oracle: ev_within(), with the fresh shoe warmed
+    in the background at the start and when the cut card comes out, and how many first
+    decisions got their exact EVs within the target.
+    """
+    from strategy import EvOracle, default_oracle
+
+    start = time.perf_counter()
+    oracle = default_oracle()
+    setup = time.perf_counter() - start
+    shoe = Shoe()
+    latencies: Dict[str, List[float]] = {"first decision": [], "after a hit": []}
+    for _ in range(args.rounds):
+        game = BlackJackGame("bench", shoe)
+        game.start_game()
+        player, (up, hole) = game.get_player_hand(), game.get_dealer_cards()
+        kind = "first decision"
+        while True:
+            unseen = list(shoe.rank_counts)
+            unseen[hole.rank - 1] += 1
+            t0 = time.perf_counter()
+            stand_ev, hit_ev = blackjack.ev(player, up, unseen)
+            latencies[kind].append(time.perf_counter() - t0)
+            if hit_ev <= stand_ev:
+                break
+            kind = "after a hit"
+            game.player_hit()
+            if player.is_busted:
+                break
+
+    print(f"blackjack.ev, {args.rounds} rounds (1-deck shoe), oracle setup {setup * 1e3:.0f} ms")
+    for kind, values in latencies.items():
+        if not values:
+            continue
+        values.sort()
+        p99 = _percentile(values, 0.99)
+        verdict = "met" if p99 < EV_P99_TARGET_SEC else "MISSED"
+        print(
+            f"  {kind:15s} {len(values):6d} calls  p50 {_percentile(values, 0.5) * 1e3:8.3f} ms"
+            f"  p99 {p99 * 1e3:8.3f} ms  max {values[-1] * 1e3:8.3f} ms"
+            f"  (p99 < {EV_P99_TARGET_SEC * 1e3:g} ms target {verdict})"
+        )
+    print(f"  cache: {oracle.cache_info()}")
+
+    oracle, shoe, exact = EvOracle(), Shoe(), 0
+    full_shoe = [len(blackjack.SUITS) * shoe.decks] * len(blackjack.VALUES)
+    hint_latencies: List[float] = []
+    oracle.warm(full_shoe)
+    time.sleep(args.think)
+    for _ in range(min(args.rounds, HINT_ROUNDS)):
+        game = BlackJackGame("bench", shoe)
+        game.start_game()
+        player, (up, hole) = game.get_player_hand(), game.get_dealer_cards()
+        unseen = list(shoe.rank_counts)
+        unseen[hole.rank - 1] += 1
+        t0 = time.perf_counter()
+        evs = oracle.ev_within(player, up, unseen, HINT_EV_BUDGET_SEC)
+        hint_latencies.append(time.perf_counter() - t0)
+        exact += evs is not None
+        if shoe.cut_card_reached:
+            oracle.warm(full_shoe)
+        time.sleep(args.think)
+    hint_latencies.sort()
+    p99 = _percentile(hint_latencies, 0.99)
+    print(
+        f"ev_within (--hint), {len(hint_latencies)} first decisions, {args.think:g} s think time:"
+        f"  p99 {p99 * 1e3:.3f} ms ({'met' if p99 < EV_P99_TARGET_SEC else 'MISSED'}),"
+        f" exact EVs {exact} (the rest: chart move only)"
+    )
+
+
+def _time_session_rounds(rounds: int, session) -> float:
+    """Play `rounds` rounds the way server.play_one_round records them (hit below 17)."""
+    start = time.perf_counter()
+    for round_idx in range(1, rounds + 1):
+        session.round_idx = round_idx
+        game = BlackJackGame("bench", session.shoe)
+        game.start_game()
+        session.update(game)
+        while game.get_player_hand().value < 17:
+            game.player_hit()
+            if game.get_player_hand().is_busted:
+                break
+            session.update(game)
+        session.update(None)
+        while game.dealer_should_hit():
+            game.dealer_hit()
+        game.final_result()
+    return time.perf_counter() - start
+
+
+def bench_checkpoint(args: argparse.Namespace) -> None:
+    """Game-path cost of checkpointing a resumable session (writer thread + fsync included)."""
+    import tempfile
+
+    from checkpoint import Checkpointer
+    from sessions import Session
+
+    plain = _time_session_rounds(args.rounds, Session("bench", 0, 0, Shoe()))
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoints = Checkpointer(os.path.join(tmp, "bench.ckpt"))
+        checkpoints.start()
+        session = Session("bench", 0, 0, Shoe(), token=os.urandom(16))
+        checkpoints.begin(session)
+        saved = _time_session_rounds(args.rounds, session)
+        checkpoints.end(session)
+        checkpoints.close()
+    print(f"session rounds, {args.rounds} rounds ({DEFAULT_SHOE_DECKS}-deck shoe)")
+    print(f"  no checkpoints:   {plain * 1e6 / args.rounds:7.2f} us/round")
+    print(f"  checkpointed:     {saved * 1e6 / args.rounds:7.2f} us/round  (+{(saved - plain) * 1e6 / args.rounds:.2f})")
+    print(f"  {checkpoints.describe()}")
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process so far (Linux /proc only)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _start_server(engine: str, *options: str):
+    """A server.py process on a free local port, accepting: (Popen, port)."""
+    import socket
+    import subprocess
+    import sys
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"),
+         "--port", str(port), "--engine", engine, "--log", "off", *options],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10.0
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return server, port
+        except OSError:
+            if time.monotonic() > deadline or server.poll() is not None:
+                server.kill()
+                raise
+            time.sleep(0.05)
+
+
+def _stop_server(server) -> None:
+    if server.poll() is None:
+        server.kill()
+        server.wait()
+
+
+def bench_shutdown(args: argparse.Namespace) -> None:
+    """A server holding --sessions players idle at their first decision: its CPU use while
+    they think, and how long SIGINT takes to close every connection and exit.
+    """
+    import selectors
+    import signal
+    import socket
+
+    from common import WIRE_V2
+
+    server, port = _start_server(args.engine, "--max-clients", str(args.sessions))
+    conns: List[socket.socket] = []
+    try:
+        # In batches (the listen backlog is small): connect, request, wait for the deal.
+        request = WIRE_V2.request(1, "bench")
+        start = time.perf_counter()
+        for first in range(0, args.sessions, 100):
+            batch = [socket.create_connection(("127.0.0.1", port)) for _ in range(first, min(first + 100, args.sessions))]
+            for conn in batch:
+                conn.sendall(request)
+            for conn in batch:
+                conn.recv(4096)
+            conns.extend(batch)
+        setup = time.perf_counter() - start
+
+        idle_cpu = None
+        before = _cpu_seconds(server.pid)
+        time.sleep(2.0)
+        after = _cpu_seconds(server.pid)
+        if before is not None and after is not None:
+            idle_cpu = (after - before) / 2.0
+
+        sel = selectors.DefaultSelector()
+        for conn in conns:
+            conn.setblocking(False)
+            sel.register(conn, selectors.EVENT_READ)
+        open_conns = len(conns)
+        start = time.perf_counter()
+        server.send_signal(signal.SIGINT)
+        while open_conns:
+            for key, _ in sel.select(timeout=30.0) or [(None, None)]:
+                if key is None:
+                    raise TimeoutError(f"{open_conns} connections still open 30 s after SIGINT")
+                try:
+                    data = key.fileobj.recv(4096)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    data = b""
+                if not data:
+                    sel.unregister(key.fileobj)
+                    open_conns -= 1
+        closed = time.perf_counter() - start
+        server.wait(timeout=30.0)
+        exited = time.perf_counter() - start
+    finally:
+        _stop_server(server)
+        for conn in conns:
+            conn.close()
+
+    print(f"{args.engine} server, {args.sessions} sessions waiting for a decision (set up in {setup:.1f} s)")
+    if idle_cpu is not None:
+        print(f"  CPU while idle:       {idle_cpu * 1e3:7.1f} ms/s")
+    print(f"  SIGINT -> all closed: {closed * 1e3:7.1f} ms")
+    print(f"  SIGINT -> exited:     {exited * 1e3:7.1f} ms")
+
+
+# Admission limits of the overload benchmark's server (against one without any).
+OVERLOAD_MAX_CLIENTS = 32
+OVERLOAD_QUEUE = 256
+
+
+def _overload_run(engine: str, sessions: int, request: bytes, *options: str) -> Dict[str, List[float]]:
+    """Connect `sessions` clients at once, each sending `request` and reading to EOF.
+
+    Returns the latencies of the served sessions ("service": welcome to last result;
+    "total": connect to last result) and of the rejected ones ("busy").
+    """
+    import selectors
+    import socket
+
+    from common import FRAME_HEADER, MSG_BUSY
+
+    server, port = _start_server(engine, *options)
+    sel = selectors.DefaultSelector()
+    # socket -> [connect time, first reply time, first reply type]
+    state: Dict[socket.socket, list] = {}
+    out: Dict[str, List[float]] = {"service": [], "total": [], "busy": []}
+    try:
+        for _ in range(sessions):
+            conn = socket.socket()
+            conn.setblocking(False)
+            conn.connect_ex(("127.0.0.1", port))
+            state[conn] = [time.perf_counter(), 0.0, None]
+            sel.register(conn, selectors.EVENT_WRITE)
+        while state:
+            for key, events in sel.select(timeout=60.0) or [(None, 0)]:
+                if key is None:
+                    raise TimeoutError(f"{len(state)} sessions unfinished after 60 s idle")
+                conn = key.fileobj
+                st = state[conn]
+                if events & selectors.EVENT_WRITE:
+                    conn.send(request)
+                    sel.modify(conn, selectors.EVENT_READ)
+                    continue
+                try:
+                    data = conn.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    data = b""
+                now = time.perf_counter()
+                if data and st[2] is None:
+                    st[1], st[2] = now, FRAME_HEADER.unpack_from(data)[2] if len(data) >= FRAME_HEADER.size else -1
+                if not data:
+                    if st[2] == MSG_BUSY:
+                        out["busy"].append(now - st[0])
+                    elif st[2] is not None:
+                        out["service"].append(now - st[1])
+                        out["total"].append(now - st[0])
+                    sel.unregister(conn)
+                    conn.close()
+                    del state[conn]
+    finally:
+        _stop_server(server)
+        for conn in state:
+            conn.close()
+    return out
+
+
+def bench_overload(args: argparse.Namespace) -> None:
+    """--sessions autoplay sessions connecting at once: how long the served ones take, with
+    a small admission limit (the rest are turned away busy) and with a slot for everyone.
+    """
+    from common import MSG_REQUEST_AUTOPLAY, WIRE_V2
+
+    request = WIRE_V2.request(args.rounds, "bench", MSG_REQUEST_AUTOPLAY)
+    request += WIRE_V2.decision_table(lambda total, soft, up: total < 17)
+    print(f"{args.engine} server, {args.sessions} autoplay sessions of {args.rounds} rounds connecting at once")
+    runs = (
+        (args.sessions, 0),
+        (OVERLOAD_MAX_CLIENTS, OVERLOAD_QUEUE),
+    )
+    for max_clients, queue in runs:
+        start = time.perf_counter()
+        lat = _overload_run(
+            args.engine, args.sessions, request, "--max-clients", str(max_clients), "--admission-queue", str(queue)
+        )
+        wall = time.perf_counter() - start
+        print(f"  --max-clients {max_clients} --admission-queue {queue}: "
+              f"{len(lat['service'])} served, {len(lat['busy'])} busy ({wall:.1f} s)")
+        for kind in ("service", "total", "busy"):
+            values = sorted(lat[kind])
+            if values:
+                print(
+                    f"    {kind:8s} p50 {_percentile(values, 0.5) * 1e3:8.1f} ms"
+                    f"  p99 {_percentile(values, 0.99) * 1e3:8.1f} ms  max {values[-1] * 1e3:8.1f} ms"
+                )
+
+
+BENCHMARKS: dict[str, Callable[[argparse.Namespace], None]] = {
+    "hand": bench_hand,
+    "ev": bench_ev,
+    "checkpoint": bench_checkpoint,
+    "shutdown": bench_shutdown,
+    "overload": bench_overload,
+}
+# --rounds default per benchmark
+DEFAULT_ROUNDS = {"hand": 200_000, "ev": 2_000, "checkpoint": 100_000, "overload": 100}
+# --sessions default per benchmark
+DEFAULT_SESSIONS = {"shutdown": 10_000, "overload": 2_000}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    p.add_argument("--rounds", type=int, default=None)
+    p.add_argument("--sessions", type=int, default=None, help="shutdown, overload: client sessions")
+    p.add_argument("--think", type=float, default=0.5, help="ev: seconds per round in the --hint pass")
+    p.add_argument(
+        "--engine", choices=("threads", "asyncio"), default="threads", help="shutdown, overload: server engine"
+    )
+    args = p.parse_args()
+    if args.rounds is None:
+        args.rounds = DEFAULT_ROUNDS.get(args.benchmark, 0)
+    if args.sessions is None:
+        args.sessions = DEFAULT_SESSIONS.get(args.benchmark, 0)
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 """blackjack.py
 
 Core blackjack domain model (no networking):
-- Card / Deck / Hand / Player / Dealer
+- Card / Deck / Shoe / Hand / Player / Dealer
 - BlackJackGame provides round orchestration for the server
+- ev(): exact Stand / Hit expected values for a live decision (see strategy.EvOracle)
 
 Rules implemented:
 - Ace counts as 1 or 11 (best non-busting value)
@@ -11,7 +12,7 @@ Rules implemented:
 """
 
 import random
-from typing import Optional, List
+from typing import Optional, List, Sequence, Tuple
 
 # Simplified blackjack rules:
 # - Ace is 1 or 11 (real blackjack)
@@ -28,6 +29,19 @@ DEALER_MAX = 17
 ROYALTY_VALUE = 10
 ACE_VALUE = 11
 
+# Shoe defaults: one deck keeps the card odds of the classic one-deck-per-round game;
+# the cut card sits after 75% of the shoe.
+MIN_SHOE_DECKS = 1
+MAX_SHOE_DECKS = 8
+DEFAULT_SHOE_DECKS = 1
+DEFAULT_PENETRATION = 0.75
+
+# Decision tables (BlackJackGame.play_table): one bitmask per (soft, total), indexed
+# soft * TABLE_TOTALS + total, where bit (upcard points - MIN_UPCARD_POINTS) set = Hit.
+TABLE_TOTALS = BLACKJACK + 1
+TABLE_ROWS = 2 * TABLE_TOTALS
+MIN_UPCARD_POINTS = 2
+
 # Result codes (shared with protocol)
 RESULT_NOT_OVER = 0x0
 RESULT_TIE = 0x1
@@ -36,70 +50,206 @@ RESULT_WIN = 0x3
 
 
 class Card:
-    def __init__(self, value: str, suit: str):
-        if value not in VALUES:
-            raise ValueError(f"Invalid card value: {value}")
-        if suit not in SUITS:
-            raise ValueError(f"Invalid card suit: {suit}")
-        self.value = value
-        self.suit = suit
+    """Immutable playing card.
+
+    There are exactly 52 Card objects (see CARDS); Card(value, suit), Card.from_wire and
+    card_from_id all return the shared instance, so dealing and decoding allocate nothing.
+
+    - id:     0..51, suit-major in SUITS x VALUES order (suit_code * 13 + rank - 1)
+    - rank:   1..13 (A..K), as sent on the wire
+    - points: blackjack value with the Ace counted as ACE_VALUE
+    """
+
+    __slots__ = ("id", "value", "suit", "rank", "points")
+
+    def __new__(cls, value: str, suit: str) -> "Card":
+        try:
+            return _CARDS_BY_NAME[value, suit]
+        except KeyError:
+            if value not in VALUES:
+                raise ValueError(f"Invalid card value: {value}") from None
+            raise ValueError(f"Invalid card suit: {suit}") from None
+
+    @classmethod
+    def _build(cls, card_id: int) -> "Card":
+        card = object.__new__(cls)
+        suit_code, rank_idx = divmod(card_id, len(VALUES))
+        value = VALUES[rank_idx]
+        if value == "A":
+            points = ACE_VALUE
+        elif value in ("J", "Q", "K"):
+            points = ROYALTY_VALUE
+        else:
+            points = int(value)
+        for name, v in (("id", card_id), ("value", value), ("suit", SUITS[suit_code]),
+                        ("rank", rank_idx + 1), ("points", points)):
+            object.__setattr__(card, name, v)
+        return card
 
     @staticmethod
     def from_wire(rank: int, suit_code: int) -> "Card":
         # rank: 1..13 (A..K), suit_code: 0..3 (Hearts, Diamonds, Clubs, Spades)
-        if rank == 1:
-            value = "A"
-        elif rank == 11:
-            value = "J"
-        elif rank == 12:
-            value = "Q"
-        elif rank == 13:
-            value = "K"
-        else:
-            value = str(rank)
-        suit = SUITS[suit_code] if 0 <= suit_code < len(SUITS) else "Hearts"
-        return Card(value, suit)
+        if not 1 <= rank <= len(VALUES):
+            raise ValueError(f"Invalid card rank: {rank}")
+        if not 0 <= suit_code < len(SUITS):
+            suit_code = 0  # unknown suit -> Hearts
+        return CARDS[suit_code * len(VALUES) + rank - 1]
+
+    def __setattr__(self, name, value):  # type: ignore[no-untyped-def]
+        raise AttributeError("Card is immutable")
+
+    def __delattr__(self, name):  # type: ignore[no-untyped-def]
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):  # type: ignore[no-untyped-def]
+        # Unpickling (e.g. across processes) yields the interned instance again.
+        return card_from_id, (self.id,)
 
     def __repr__(self) -> str:
         return f"Card({self.value!r}, {self.suit!r})"
 
 
+# The 52 interned cards, indexed by Card.id.
+CARDS = tuple(Card._build(i) for i in range(len(SUITS) * len(VALUES)))
+_CARDS_BY_NAME = {(c.value, c.suit): c for c in CARDS}
+
+
+def card_from_id(card_id: int) -> Card:
+    return CARDS[card_id]
+
+
 class Deck:
-    def __init__(self):
-        self.cards = [Card(value, suit) for suit in SUITS for value in VALUES]
-        random.shuffle(self.cards)
+    def __init__(self, rng: Optional[random.Random] = None):
+        self.cards = list(CARDS)
+        (rng or random).shuffle(self.cards)
+
+    def deal_card(self) -> Card:
+        # One round never gets through 52 cards: a fresh deck cannot run out.
+        return self.cards.pop()
+
+
+class Shoe:
+    """Multi-deck shoe with a cut card, reused across the rounds of a session.
+
+    Like Deck it is dealt from with deal_card(); it is only reshuffled at the start of a
+    round (BlackJackGame) once the cut card has come out, i.e. after `penetration` of the
+    cards were dealt. rank_counts[rank - 1] tracks the undealt cards per rank in O(1).
+    Should a round still run it dry (a very deep cut in a small shoe), only the discards
+    are shuffled back in: the cards on the table (`in_play`) never appear twice.
+
+    Shuffles use `rng` (default: a private random.Random, not the shared global state), or
+    take a ready order from `pool` (see shuffle.ShufflePool) when one is given.
+    """
+
+    def __init__(
+        self,
+        decks: int = DEFAULT_SHOE_DECKS,
+        penetration: float = DEFAULT_PENETRATION,
+        rng: Optional[random.Random] = None,
+        pool=None,
+    ):
+        if not MIN_SHOE_DECKS <= decks <= MAX_SHOE_DECKS:
+            raise ValueError(f"Shoe must hold {MIN_SHOE_DECKS}..{MAX_SHOE_DECKS} decks, got {decks}")
+        if not 0.0 < penetration < 1.0:
+            raise ValueError(f"Penetration must be within (0, 1), got {penetration}")
+        self.decks = decks
+        self.penetration = penetration
+        self.size = decks * len(CARDS)
+        self.cut_index = int(self.size * penetration)
+        self.rng = rng or random.Random()
+        if pool is not None and pool.decks != decks:
+            raise ValueError(f"Shuffle pool is for {pool.decks}-deck shoes, not {decks}")
+        self.pool = pool
+        self.shuffles = 0
+        # Hands of the round being dealt (set by BlackJackGame), kept out of a mid-round reshuffle.
+        self.in_play: Sequence[List[Card]] = ()
+        self.shuffle()
+
+    def shuffle(self) -> None:
+        if self.pool is not None:
+            self.cards: List[Card] = self.pool.take(self.rng)
+        else:
+            self.cards = list(CARDS) * self.decks
+            self.rng.shuffle(self.cards)
+        self.rank_counts: List[int] = [len(SUITS) * self.decks] * len(VALUES)
+        self.shuffles += 1
+
+    def restore(self, cards: List[Card]) -> None:
+        """Continue from a saved dealing order (e.g. a checkpoint) instead of this shuffle."""
+        self.cards = list(cards)
+        self.rank_counts = [0] * len(VALUES)
+        for card in self.cards:
+            self.rank_counts[card.rank - 1] += 1
+
+    @property
+    def dealt(self) -> int:
+        return self.size - len(self.cards)
+
+    @property
+    def cut_card_reached(self) -> bool:
+        return self.dealt >= self.cut_index
+
+    def reshuffle_discards(self) -> None:
+        """Shuffle every card but those in play back into the (empty) shoe."""
+        copies = dict.fromkeys(CARDS, self.decks)
+        for hand in self.in_play:
+            for card in hand:
+                copies[card] -= 1
+        self.cards = [card for card, n in copies.items() for _ in range(n)]
+        self.rng.shuffle(self.cards)
+        self.rank_counts = [0] * len(VALUES)
+        for card in self.cards:
+            self.rank_counts[card.rank - 1] += 1
+        self.shuffles += 1
 
-    def deal_card(self) -> Optional[Card]:
-        return self.cards.pop() if self.cards else None
+    def deal_card(self) -> Card:
+        """The next card; never None, the discards are dealt on if the shoe runs dry."""
+        if not self.cards:
+            # Only possible with a very deep cut in a small shoe: rather than stall the
+            # round, deal on from its discards.
+            self.reshuffle_discards()
+        card = self.cards.pop()
+        self.rank_counts[card.rank - 1] -= 1
+        return card
 
 
 class Hand:
+    """Cards plus a running total, so every value query is O(1).
+
+    add_card keeps the hard total (every Ace counted as 1) and the Ace count up to date; at
+    most one Ace can ever count as ACE_VALUE without busting, which gives the soft total.
+    """
+
     def __init__(self, cards: Optional[List[Card]] = None):
-        # copy to avoid aliasing
-        self.cards: List[Card] = list(cards) if cards is not None else []
+        self.cards: List[Card] = []
+        self._hard = 0
+        self._aces = 0
+        self.value = 0
+        self.is_soft = False
+        for card in cards or ():
+            self.add_card(card)
 
     def add_card(self, card: Card) -> None:
         self.cards.append(card)
+        if card.rank == 1:
+            self._aces += 1
+            self._hard += ACE_VALUE - ROYALTY_VALUE
+        else:
+            self._hard += card.points
+        # Soft: one Ace can still count as 11 without busting.
+        self.is_soft = self._aces > 0 and self._hard + ROYALTY_VALUE <= BLACKJACK
+        self.value = self._hard + ROYALTY_VALUE if self.is_soft else self._hard
 
     def calculate_value(self) -> int:
-        total = 0
-        aces = 0
+        return self.value
 
-        for card in self.cards:
-            if card.value in ("J", "Q", "K"):
-                total += ROYALTY_VALUE
-            elif card.value == "A":
-                total += ACE_VALUE
-                aces += 1
-            else:
-                total += int(card.value)
-
-        # Convert Aces from 11 -> 1 as needed
-        while total > BLACKJACK and aces > 0:
-            total -= ROYALTY_VALUE
-            aces -= 1
+    @property
+    def is_busted(self) -> bool:
+        return self.value > BLACKJACK
 
-        return total
+    @property
+    def is_blackjack(self) -> bool:
+        return self.value == BLACKJACK and len(self.cards) == 2
 
 
 class Player:
@@ -111,10 +261,10 @@ class Player:
         self.hand.add_card(card)
 
     def get_hand_value(self) -> int:
-        return self.hand.calculate_value()
+        return self.hand.value
 
     def is_busted(self) -> bool:
-        return self.get_hand_value() > BLACKJACK
+        return self.hand.value > BLACKJACK
 
 
 class Dealer(Player):
@@ -122,16 +272,39 @@ class Dealer(Player):
         super().__init__("Dealer")
 
     def should_hit(self) -> bool:
-        return self.get_hand_value() < DEALER_MAX
+        return self.hand.value < DEALER_MAX
 
 
 class BlackJackGame:
     """Single source of truth for a round."""
 
-    def __init__(self, player_name: str):
-        self.deck = Deck()
+    def __init__(self, player_name: str, shoe: Optional[Shoe] = None):
+        # With a session shoe, the round deals from it (reshuffled once the cut card came
+        # out in an earlier round); otherwise it gets a fresh Deck as before.
+        if shoe is None:
+            self.deck = Deck()
+        else:
+            if shoe.cut_card_reached:
+                shoe.shuffle()
+            self.deck = shoe
         self.dealer = Dealer()
         self.player = Player(player_name)
+        if shoe is not None:
+            shoe.in_play = (self.player.hand.cards, self.dealer.hand.cards)
+
+    @classmethod
+    def restore(cls, player_name: str, shoe: Shoe, player_cards: List[Card], dealer_cards: List[Card]) -> "BlackJackGame":
+        """A round already in progress (e.g. from a checkpoint): no reshuffle, hands as given."""
+        game = cls.__new__(cls)
+        game.deck = shoe
+        game.dealer = Dealer()
+        game.player = Player(player_name)
+        for card in player_cards:
+            game.player.draw_card(card)
+        for card in dealer_cards:
+            game.dealer.draw_card(card)
+        shoe.in_play = (game.player.hand.cards, game.dealer.hand.cards)
+        return game
 
     def get_player_hand(self) -> Hand:
         return self.player.hand
@@ -152,8 +325,6 @@ class BlackJackGame:
 
     def player_hit(self):
         card = self.deck.deal_card()
-        if card is None:
-            return None, RESULT_NOT_OVER
         self.player.draw_card(card)
         return card, (RESULT_LOSS if self.player.is_busted() else RESULT_NOT_OVER)
 
@@ -166,15 +337,31 @@ class BlackJackGame:
 
     def dealer_hit(self):
         card = self.deck.deal_card()
-        if card is None:
-            return None, RESULT_NOT_OVER
         self.dealer.draw_card(card)
         return card, (RESULT_WIN if self.dealer.is_busted() else RESULT_NOT_OVER)
 
+    def play_table(self, table: Sequence[int]) -> int:
+        """Play the rest of the round (after start_game) with the player's moves from `table`.
+
+        Tight path for autoplay sessions: no per-decision I/O, but the same draws and
+        result rules as the interactive flow. Returns the RESULT_* code.
+        """
+        hand = self.player.hand
+        up_bit = 1 << (self.dealer.hand.cards[0].points - MIN_UPCARD_POINTS)
+        while table[hand.is_soft * TABLE_TOTALS + hand.value] & up_bit:
+            _, state = self.player_hit()
+            if state == RESULT_LOSS:
+                return state
+        while self.dealer_should_hit():
+            _, state = self.dealer_hit()
+            if state == RESULT_WIN:
+                return state
+        return self.final_result()
+
     # resolution
     def final_result(self) -> int:
-        p = self.player.get_hand_value()
-        d = self.dealer.get_hand_value()
+        p = self.player.hand.value
+        d = self.dealer.hand.value
 
         if p > BLACKJACK:
             return RESULT_LOSS
@@ -185,3 +372,18 @@ class BlackJackGame:
         if d > p:
             return RESULT_LOSS
         return RESULT_TIE
+
+
+def ev(player_hand: Hand, dealer_upcard: Card, remaining_counts: Sequence[int]) -> Tuple[float, float]:
+    """Exact (Stand EV, Hit EV) per unit bet for the player's next decision.
+
+    remaining_counts[rank - 1] is the number of cards of each rank the player has not seen
+    (Shoe.rank_counts layout; the dealer's hole card still counts as unseen). Hit EV
+    assumes perfect play afterwards. Results are memoized in a process-wide LRU cache:
+    the decisions after a hit are cache hits, while a round's first decision is computed
+    cold and can take tens of ms (strategy.EvOracle.ev_within gives up on a budget instead).
+    """
+    # strategy imports this module, so it is only loaded on first use.
+    from strategy import default_oracle
+
+    return default_oracle().ev(player_hand, dealer_upcard, remaining_counts)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""blackjack_sim.py
+
+Vectorized Monte Carlo simulator for the rules in blackjack.py (requires NumPy).
+
+Instead of stepping BlackJackGame objects, whole batches of rounds are dealt at once:
+- each row of an integer matrix is one shuffled deck (one round, like BlackJackGame()),
+- hand totals are kept as (hard total, ace count) arrays exactly like Hand,
+- the player follows a policy lookup table, the dealer draws while below DEALER_MAX,
+- outcomes are counted with the same comparisons as BlackJackGame.final_result.
+
+A policy is a boolean array indexed [player_total, soft, dealer_upcard_points] -> hit,
+with totals 0..21, soft 0/1 and upcard points 2..11 (Ace = ACE_VALUE).
+
+    python blackjack_sim.py --rounds 1000000 --policy dealer --seed 1 --validate 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - depends on the environment
+    raise ImportError("blackjack_sim requires NumPy (pip install numpy)") from exc
+
+from blackjack import (
+    ACE_VALUE,
+    BLACKJACK,
+    CARDS,
+    DEALER_MAX,
+    RESULT_LOSS,
+    RESULT_TIE,
+    RESULT_WIN,
+    ROYALTY_VALUE,
+    BlackJackGame,
+    Deck,
+)
+
+# Rows dealt per vectorized batch (bounds memory: BATCH x 52*decks bytes of cards).
+DEFAULT_BATCH = 200_000
+# z for two-sided 95% confidence intervals
+Z_95 = 1.959964
+
+# Hard points per card id (Ace = 1); the soft Ace is handled via the ace count like Hand.
+_HARD_POINTS = np.array([1 if c.rank == 1 else c.points for c in CARDS], dtype=np.int8)
+
+POLICY_SHAPE = (BLACKJACK + 1, 2, ACE_VALUE + 1)
+
+
+def threshold_policy(stand_on: int) -> np.ndarray:
+    """Hit while the player total is below `stand_on` (soft or hard)."""
+    policy = np.zeros(POLICY_SHAPE, dtype=bool)
+    policy[:stand_on, :, :] = True
+    return policy
+
+
+POLICIES: Dict[str, np.ndarray] = {
+    "dealer": threshold_policy(DEALER_MAX),   # mimic the dealer
+    "never-bust": threshold_policy(12),       # only hit when a bust is impossible
+    "stand": threshold_policy(0),             # never hit
+}
+
+
+def strategy_policy(decks: int = 1) -> np.ndarray:
+    """The exact chart from strategy.py (cached on disk) as a policy table."""
+    from strategy import load_or_compute
+
+    strategy = load_or_compute(decks)
+    policy = np.zeros(POLICY_SHAPE, dtype=bool)
+    for total in range(POLICY_SHAPE[0]):
+        for soft in (0, 1):
+            for up in range(2, ACE_VALUE + 1):
+                policy[total, soft, up] = strategy.should_hit(total, bool(soft), up)
+    return policy
+
+
+def _value(hard: np.ndarray, aces: np.ndarray):
+    """(total, soft) arrays from hard totals and ace counts; same rule as Hand.add_card."""
+    soft = (aces > 0) & (hard + ROYALTY_VALUE <= BLACKJACK)
+    return np.where(soft, hard + ROYALTY_VALUE, hard), soft
+
+
+def deal_batch(rng: np.random.Generator, rounds: int, decks: int = 1) -> np.ndarray:
+    """rounds x (52*decks) matrix of card ids; row i is the dealing order of round i."""
+    base = np.tile(np.arange(len(CARDS), dtype=np.int8), decks)
+    return rng.permuted(np.tile(base, (rounds, 1)), axis=1)
+
+
+def play_batch(cards: np.ndarray, policy: np.ndarray) -> np.ndarray:
+    """Play one round per row of `cards`; returns RESULT_* codes per round.
+
+    Dealing order per row: player, dealer, player, dealer (as BlackJackGame.start_game),
+    then the player's hits, then the dealer's draws.
+    """
+    rows = np.arange(cards.shape[0])
+    pts = _HARD_POINTS[cards]
+
+    p_hard = (pts[:, 0] + pts[:, 2]).astype(np.int16)
+    p_aces = (pts[:, 0] == 1).astype(np.int8) + (pts[:, 2] == 1)
+    d_hard = (pts[:, 1] + pts[:, 3]).astype(np.int16)
+    d_aces = (pts[:, 1] == 1).astype(np.int8) + (pts[:, 3] == 1)
+    upcard = np.where(pts[:, 1] == 1, ACE_VALUE, pts[:, 1])
+    nxt = np.full(cards.shape[0], 4, dtype=np.int16)
+
+    # Player: keep asking the policy until it stands or busts.
+    deciding = np.ones(cards.shape[0], dtype=bool)
+    while True:
+        total, soft = _value(p_hard, p_aces)
+        hit = deciding & (total <= BLACKJACK)
+        hit[hit] = policy[total[hit], soft[hit].astype(np.int8), upcard[hit]]
+        if not hit.any():
+            break
+        c = pts[rows[hit], nxt[hit]]
+        p_hard[hit] += c
+        p_aces[hit] += c == 1
+        nxt[hit] += 1
+        deciding = hit
+    p_total, _ = _value(p_hard, p_aces)
+    p_bust = p_total > BLACKJACK
+
+    # Dealer draws only when the player did not bust (play_one_round returns early).
+    while True:
+        d_total, _ = _value(d_hard, d_aces)
+        draw = ~p_bust & (d_total < DEALER_MAX)
+        if not draw.any():
+            break
+        c = pts[rows[draw], nxt[draw]]
+        d_hard[draw] += c
+        d_aces[draw] += c == 1
+        nxt[draw] += 1
+    d_total, _ = _value(d_hard, d_aces)
+
+    result = np.full(cards.shape[0], RESULT_TIE, dtype=np.int8)
+    result[p_total > d_total] = RESULT_WIN
+    result[p_total < d_total] = RESULT_LOSS
+    result[d_total > BLACKJACK] = RESULT_WIN
+    result[p_bust] = RESULT_LOSS
+    return result
+
+
+@dataclass
+class SimResult:
+    rounds: int
+    wins: int
+    losses: int
+    ties: int
+    seconds: float
+
+    def rate(self, count: int):
+        """(rate, 95% CI half-width) for a count out of `rounds`."""
+        p = count / self.rounds
+        return p, Z_95 * math.sqrt(p * (1 - p) / self.rounds)
+
+    @property
+    def ev(self) -> float:
+        """Player expected value per unit bet (win +1, loss -1, tie 0)."""
+        return (self.wins - self.losses) / self.rounds
+
+    @property
+    def variance(self) -> float:
+        return (self.wins + self.losses) / self.rounds - self.ev ** 2
+
+    def format(self) -> str:
+        lines = [f"{self.rounds} rounds in {self.seconds:.2f}s ({self.rounds / self.seconds:,.0f} rounds/s)"]
+        for name, count in (("win", self.wins), ("loss", self.losses), ("tie", self.ties)):
+            p, hw = self.rate(count)
+            lines.append(f"  {name:5s} {p * 100:7.3f}% +/- {hw * 100:.3f}")
+        ev_hw = Z_95 * math.sqrt(self.variance / self.rounds)
+        lines.append(f"  house edge {-self.ev * 100:.3f}% +/- {ev_hw * 100:.3f} (variance {self.variance:.4f})")
+        return "\n".join(lines)
+
+
+def simulate(
+    rounds: int,
+    policy: np.ndarray,
+    seed: Optional[int] = None,
+    decks: int = 1,
+    batch: int = DEFAULT_BATCH,
+) -> SimResult:
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(RESULT_WIN + 1, dtype=np.int64)
+    start = time.perf_counter()
+    done = 0
+    while done < rounds:
+        n = min(batch, rounds - done)
+        counts += np.bincount(play_batch(deal_batch(rng, n, decks), policy), minlength=RESULT_WIN + 1)
+        done += n
+    return SimResult(
+        rounds=rounds,
+        wins=int(counts[RESULT_WIN]),
+        losses=int(counts[RESULT_LOSS]),
+        ties=int(counts[RESULT_TIE]),
+        seconds=time.perf_counter() - start,
+    )
+
+
+def play_with_model(order, policy: np.ndarray) -> int:
+    """Play one round with BlackJackGame, dealing card ids in `order`, following `policy`."""
+    game = BlackJackGame("sim")
+    # Deck.deal_card pops from the end, so store the dealing order reversed.
+    game.deck = Deck()
+    game.deck.cards = [CARDS[i] for i in reversed(order)]
+    game.start_game()
+    player, dealer = game.get_player_hand(), game.get_dealer_hand()
+    upcard = dealer.cards[0].points
+    while policy[player.value, int(player.is_soft), upcard]:
+        _, state = game.player_hit()
+        if state == RESULT_LOSS:
+            return RESULT_LOSS
+    while game.dealer_should_hit():
+        _, state = game.dealer_hit()
+        if state == RESULT_WIN:
+            return RESULT_WIN
+    return game.final_result()
+
+
+def validate(rounds: int, policy: np.ndarray, seed: Optional[int] = None, decks: int = 1) -> int:
+    """Replay a seeded sample through the object model; returns the number of mismatches."""
+    cards = deal_batch(np.random.default_rng(seed), rounds, decks)
+    fast = play_batch(cards, policy)
+    return sum(1 for i in range(rounds) if play_with_model(cards[i], policy) != fast[i])
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--rounds", type=int, default=1_000_000)
+    p.add_argument("--policy", choices=sorted(POLICIES) + ["basic"], default="dealer",
+                   help="basic = the exact chart computed by strategy.py")
+    p.add_argument("--decks", type=int, default=1, help="decks shuffled per round (default 1, like BlackJackGame)")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    p.add_argument("--validate", type=int, default=0, metavar="N",
+                   help="first replay N seeded rounds through BlackJackGame and compare outcomes")
+    args = p.parse_args()
+
+    policy = strategy_policy(args.decks) if args.policy == "basic" else POLICIES[args.policy]
+    if args.validate:
+        bad = validate(args.validate, policy, args.seed, args.decks)
+        print(f"validation: {args.validate - bad}/{args.validate} rounds match the object model")
+        if bad:
+            raise SystemExit(1)
+    print(f"policy '{args.policy}':")
+    print(simulate(args.rounds, policy, args.seed, args.decks, args.batch).format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""checkpoint.py
+
+Crash-safe checkpoints of resumable sessions (see sessions.py), so a server restart can
+re-open them for their reconnecting clients.
+
+- Append-only file of small binary records, each framed as (crc32, length, body); a torn
+  or corrupt tail left by a crash is detected by the CRC and ignored on recovery.
+- Per session: one SESSION record (name, rounds, flags, shoe size), a SHOE record with the
+  remaining dealing order whenever the shoe was (re)shuffled, and a STATE record after
+  every step of a round (round index, hands, cards left in the shoe). The shoe order is
+  only written once per shuffle; a STATE record is a few dozen bytes.
+- Game threads only encode a record and enqueue it. A writer thread appends whatever is
+  queued and fsyncs at most every `fsync_interval` seconds (group commit): a crash loses
+  at most that much progress, and one fsync covers every session's checkpoints.
+- The writer keeps the latest records of every live session; once the file has grown past
+  `compact_bytes` it is rewritten with just those (tmp file + fsync + rename). Recovery
+  does the same, so the file never holds finished sessions for long.
+- The same records carry a parked session to a new server process (encode_session /
+  decode_session, see handoff.py), which takes the file over after release().
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from blackjack import CARDS, BlackJackGame, Shoe
+from common import TOKEN_SIZE, decode_name, pad_name
+from sessions import Session
+from shuffle import ShoeFactory
+
+# Longest time a checkpoint waits in memory before it is on disk.
+DEFAULT_FSYNC_INTERVAL_SEC = 0.05
+# Rewrite the file with only the live sessions once it has grown past this size.
+DEFAULT_COMPACT_BYTES = 8 * 1024 * 1024
+
+REC_SESSION = 1
+REC_SHOE = 2
+REC_STATE = 3
+REC_END = 4
+
+RECORD_HEAD = struct.Struct("!IH")                       # crc32 of the body, body length
+REC_KEY = struct.Struct(f"!B{TOKEN_SIZE}s")               # kind, session token (starts every body)
+SESSION_BODY = struct.Struct("!32sIBBd")                  # client_name, rounds, flags, decks, penetration
+STATE_BODY = struct.Struct("!IIHB")                       # saved at (unix s), round_idx, shoe cards left, player card count
+# STATE: then the player's card ids, then the dealer's (none between rounds).
+
+
+def _record(kind: int, token: bytes, body: bytes = b"") -> bytes:
+    data = REC_KEY.pack(kind, token) + body
+    return RECORD_HEAD.pack(zlib.crc32(data), len(data)) + data
+
+
+def _session_record(session: Session) -> bytes:
+    body = SESSION_BODY.pack(
+        pad_name(session.client_name), session.rounds, session.flags,
+        session.shoe.decks, session.shoe.penetration,
+    )
+    return _record(REC_SESSION, session.token, body)
+
+
+def _shoe_record(session: Session) -> bytes:
+    return _record(REC_SHOE, session.token, bytes(c.id for c in session.shoe.cards))
+
+
+def _state_record(session: Session) -> bytes:
+    game = session.game
+    cards = b""
+    player_count = 0
+    if game is not None:
+        player = game.get_player_cards()
+        player_count = len(player)
+        cards = bytes(c.id for c in player + game.get_dealer_cards())
+    body = STATE_BODY.pack(int(time.time()), session.round_idx, len(session.shoe.cards), player_count)
+    return _record(REC_STATE, session.token, body + cards)
+
+
+def encode_session(session: Session) -> bytes:
+    """The records that restore `session` (decode_session); used to pass it between processes."""
+    return _session_record(session) + _shoe_record(session) + _state_record(session)
+
+
+def decode_session(data: bytes, shoes: ShoeFactory) -> Optional[Session]:
+    """The session encoded by encode_session; None if the records are incomplete or corrupt."""
+    records = read_records(data)
+    if not records:
+        return None
+    return _restore(records[0][1], {kind: body for kind, _, body in records}, shoes, 0.0)
+
+
+def _restore(token: bytes, recs: Dict[int, memoryview], shoes: ShoeFactory, oldest: float) -> Optional[Session]:
+    """Rebuild a session from its latest records (None if incomplete, invalid or saved before `oldest`)."""
+    if not {REC_SESSION, REC_SHOE, REC_STATE} <= recs.keys():
+        return None
+    name_raw, rounds, flags, decks, penetration = SESSION_BODY.unpack_from(recs[REC_SESSION])
+    state = recs[REC_STATE]
+    saved_at, round_idx, left, player_count = STATE_BODY.unpack_from(state)
+    order = bytes(recs[REC_SHOE])
+    hands = bytes(state[STATE_BODY.size:])
+    if saved_at < oldest or left > len(order) or any(i >= len(CARDS) for i in order + hands):
+        return None
+
+    # Cards are dealt from the end of the saved order: what is left is its prefix.
+    shoe = Shoe(decks, penetration, rng=shoes.rngs.new_stream())
+    shoe.restore([CARDS[i] for i in order[:left]])
+    if shoes.pool is not None and shoes.pool.decks == decks:
+        shoe.pool = shoes.pool
+    client_name = decode_name(name_raw)
+    session = Session(client_name, rounds, flags, shoe, token=token, round_idx=round_idx)
+    if player_count:
+        session.game = BlackJackGame.restore(
+            client_name, shoe,
+            [CARDS[i] for i in hands[:player_count]], [CARDS[i] for i in hands[player_count:]],
+        )
+    return session
+
+
+def read_records(data: bytes) -> List[Tuple[int, bytes, memoryview]]:
+    """(kind, token, body) of every intact record, up to the first torn or corrupt one."""
+    records = []
+    view = memoryview(data)
+    pos = 0
+    while pos + RECORD_HEAD.size <= len(data):
+        crc, length = RECORD_HEAD.unpack_from(data, pos)
+        start = pos + RECORD_HEAD.size
+        body = view[start:start + length]
+        if length < REC_KEY.size or len(body) < length or zlib.crc32(body) != crc:
+            break
+        kind, token = REC_KEY.unpack_from(body)
+        records.append((kind, token, body[REC_KEY.size:]))
+        pos = start + length
+    return records
+
+
+class Checkpointer:
+    """Writes session checkpoints to `path` and recovers them on startup."""
+
+    def __init__(
+        self,
+        path: str,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL_SEC,
+        compact_bytes: int = DEFAULT_COMPACT_BYTES,
+    ):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self._queue: "queue.SimpleQueue[Optional[Tuple[int, bytes, bytes]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._fd = -1
+        # Writer side: latest SESSION / SHOE / STATE record per live session, for compaction.
+        self._live: Dict[bytes, Dict[int, bytes]] = {}
+        self._size = 0
+        # Game side: shoe shuffle count at the last SHOE record, per session.
+        self._shuffles: Dict[bytes, int] = {}
+        self._released = False  # see release()
+        self._stats_lock = threading.Lock()
+        self.records = 0
+        self.rounds = 0
+        self.path_ns = 0   # time spent checkpointing on game threads
+        self.bytes = 0
+        self.fsyncs = 0
+        self.fsync_ns = 0
+        self.compactions = 0
+
+    # ---- game side ----
+
+    def begin(self, session: Session) -> None:
+        """Start checkpointing a new resumable session (and every later Session.update)."""
+        if self._released:
+            return
+        t0 = time.perf_counter_ns()
+        self._queue.put((REC_SESSION, session.token, _session_record(session)))
+        session.on_update = self.save
+        self._add_path_time(t0, 1, 0)
+        self.save(session)
+
+    def save(self, session: Session) -> None:
+        """Checkpoint the session's current step (Session.on_update)."""
+        if self._released:
+            return
+        t0 = time.perf_counter_ns()
+        shoe, token = session.shoe, session.token
+        records = 1
+        if self._shuffles.get(token) != shoe.shuffles:
+            self._shuffles[token] = shoe.shuffles
+            self._queue.put((REC_SHOE, token, _shoe_record(session)))
+            records += 1
+        self._queue.put((REC_STATE, token, _state_record(session)))
+        # A STATE without a game after round 1+ marks a decided round (for the per-round cost).
+        self._add_path_time(t0, records, 1 if session.game is None and session.round_idx else 0)
+
+    def end(self, session: Session) -> None:
+        """The session is over (finished, or given up on): drop it from the checkpoints."""
+        session.on_update = None
+        if self._released:
+            return
+        t0 = time.perf_counter_ns()
+        self._shuffles.pop(session.token, None)
+        self._queue.put((REC_END, session.token, _record(REC_END, session.token)))
+        self._add_path_time(t0, 1, 0)
+
+    def release(self) -> None:
+        """Hand the file to the next server process (see handoff.py) and stop checkpointing.
+
+        Every session is ended here: the ones the next process takes over are checkpointed
+        again by it, the ones still draining here are no longer crash-safe.
+        """
+        self._released = True
+        for token in list(self._shuffles):
+            self._queue.put((REC_END, token, _record(REC_END, token)))
+        self._shuffles.clear()
+        self.close()
+
+    def _add_path_time(self, t0: int, records: int, rounds: int) -> None:
+        with self._stats_lock:
+            self.path_ns += time.perf_counter_ns() - t0
+            self.records += records
+            self.rounds += rounds
+
+    # ---- recovery ----
+
+    def recover(self, shoes: ShoeFactory, max_age: float) -> List[Session]:
+        """Sessions checkpointed by the previous run, skipping those idle over `max_age` s.
+
+        Call before start(); the file is then rewritten with just these sessions.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+
+        latest: Dict[bytes, Dict[int, memoryview]] = {}
+        for kind, token, body in read_records(data):
+            if kind == REC_END:
+                latest.pop(token, None)
+            else:
+                latest.setdefault(token, {})[kind] = body
+
+        sessions: List[Session] = []
+        now = time.time()
+        for token, recs in latest.items():
+            session = _restore(token, recs, shoes, now - max_age)
+            if session is None:
+                continue
+            session.on_update = self.save
+            sessions.append(session)
+            self._shuffles[token] = session.shoe.shuffles
+            self._live[token] = {kind: _record(kind, token, bytes(body)) for kind, body in recs.items()}
+        self._rewrite()
+        return sessions
+
+    # ---- writer side ----
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._size = os.fstat(self._fd).st_size
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Write and fsync everything queued so far and stop the writer thread."""
+        th = self._thread
+        if th is None:
+            return
+        self._queue.put(None)
+        th.join()
+        self._thread = None
+        os.close(self._fd)
+        self._fd = -1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            # Group commit: collect what arrives within fsync_interval, then one write + fsync.
+            deadline = time.monotonic() + self.fsync_interval
+            batch: List[bytes] = []
+            while item is not None:
+                kind, token, record = item
+                batch.append(record)
+                if kind == REC_END:
+                    self._live.pop(token, None)
+                else:
+                    self._live.setdefault(token, {})[kind] = record
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            self._append(b"".join(batch))
+            if item is None:
+                return
+            if self._size > self.compact_bytes:
+                self._rewrite()
+
+    def _append(self, data: bytes) -> None:
+        if data:
+            os.write(self._fd, data)
+            self._size += len(data)
+            with self._stats_lock:
+                self.bytes += len(data)
+        t0 = time.perf_counter_ns()
+        os.fsync(self._fd)
+        with self._stats_lock:
+            self.fsyncs += 1
+            self.fsync_ns += time.perf_counter_ns() - t0
+
+    def _rewrite(self) -> None:
+        """Replace the file with the latest records of the live sessions."""
+        data = b"".join(rec for recs in self._live.values() for rec in recs.values())
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        # Make the rename itself durable.
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        self._size = len(data)
+        self.compactions += 1
+
+    def describe(self) -> str:
+        """One-line checkpoint metrics."""
+        per_round = self.path_ns / self.rounds / 1e3 if self.rounds else 0.0
+        fsync_ms = self.fsync_ns / self.fsyncs / 1e6 if self.fsyncs else 0.0
+        return (
+            f"checkpoints: {self.records} records, {self.bytes / 1024:.0f} KB in {self.fsyncs} fsyncs "
+            f"(avg {fsync_ms:.2f} ms), {per_round:.1f} us per round on the game path, "
+            f"{self.compactions} compactions"
+        )
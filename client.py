@@ -7,39 +7,112 @@
 - Prints the FULL state every time it changes (pretty format via py)
 - Ctrl+C exits cleanly (no traceback)
 - If server disconnects, prints a friendly message and returns to listening
+- `--hint` shows the basic-strategy move and exact EVs; `--auto` uploads the chart and lets
+  the server play the whole session (one round trip instead of one per decision)
+- `--compact` receives the dealer's turn after Stand as one message (protocol v2)
+- "Play again" with the same server reuses the TCP connection when the server keeps it alive
+- A dropped connection mid-session is resumed with the session token (server permitting)
+- A server at capacity answers MSG_BUSY instead of a welcome: reported, nothing is played
+- Offers show each server's load; `--least-loaded` picks the server itself, by that load and
+  an RTT probe (UDP pings to the offer socket, so the probe is never admitted), instead of asking
 """
 
 from __future__ import annotations
 import argparse
+import random
 
 import socket
 import signal
 import threading
-from typing import Optional, Tuple
-
-from blackjack import Hand, RESULT_LOSS, RESULT_NOT_OVER, RESULT_TIE, RESULT_WIN
+from typing import List, Optional, Tuple
+
+from blackjack import (
+    Card,
+    DEFAULT_PENETRATION,
+    DEFAULT_SHOE_DECKS,
+    MAX_SHOE_DECKS,
+    MIN_SHOE_DECKS,
+    SUITS,
+    VALUES,
+    Hand,
+    RESULT_LOSS,
+    RESULT_NOT_OVER,
+    RESULT_TIE,
+    RESULT_WIN,
+)
+from strategy import Strategy, default_oracle, load_cached, load_or_compute
 from common import (
     MAGIC_COOKIE,
-    MSG_OFFER,
     MSG_REQUEST,
+    MSG_REQUEST_AUTOPLAY,
     MSG_PAYLOAD,
+    MSG_ROUND_RESULT,
+    MSG_WELCOME,
+    MSG_BUSY,
+    MSG_DEALER_TRANSCRIPT,
+    FLAG_DEALER_TRANSCRIPT,
+    FLAG_KEEP_ALIVE,
+    FLAG_RESUMABLE,
+    MSG_ROUND_STATE,
+    MSG_PING,
+    NO_TOKEN,
     UDP_PORT_OFFERS,
-    OFFER_STRUCT,
-    REQUEST_STRUCT,
-    CLIENT_PAYLOAD_STRUCT,
     SERVER_PAYLOAD_STRUCT,
+    ROUND_RESULT_STRUCT,
+    PING_STRUCT,
+    WELCOME_STRUCT,
+    CARD_BODY,
+    ROUND_RESULT_BODY,
+    WELCOME_BODY,
+    ROUNDS_UNLIMITED,
+    V2_MAX_ROUNDS,
     SOCKET_TIMEOUT_SEC,
-    pad_name,
-    decode_name,
-    recv_exact,
+    WIRE_V1,
+    WIRE_V2,
+    decode_dealer_transcript,
+    decode_round_state,
+    FramedReader,
     Offer,
+    Wire,
     print_game_state,
     card_from_wire,
+    unpack_offer,
 )
 _running = True
 _stop_evt = threading.Event()
 _shutdown_printed = False
 _active_tcp: Optional[socket.socket] = None
+# Basic-strategy chart for --hint (strategy.py, loaded from its disk cache).
+_strategy: Optional[Strategy] = None
+# Shoe size the server is assumed to deal from (--decks), for the --hint EVs.
+_hint_decks = DEFAULT_SHOE_DECKS
+# How long a --hint spends on the exact EVs; past that it shows the chart's move alone
+# (EvOracle.ev_within finishes the piece of work it is in, up to ~0.5 ms).
+HINT_EV_BUDGET_SEC = 0.0005
+# --compact: ask for the dealer's turn as one MSG_DEALER_TRANSCRIPT frame (protocol v2).
+_compact = False
+# Reconnect attempts for a dropped resumable session; the first waits about this long,
+# and each further attempt twice as long as the one before.
+RESUME_ATTEMPTS = 6
+RESUME_BACKOFF_SEC = 0.25
+# Connection left open by the last keep-alive session: (server address, socket, reader).
+_kept: Optional[Tuple[Tuple[str, int], socket.socket, FramedReader]] = None
+# --least-loaded: pings timed per offered server (the fastest counts), and how long each
+# may take before the server is considered unreachable.
+PROBE_COUNT = 3
+PROBE_TIMEOUT_SEC = 0.5
+# A v1-only server closes on a v2 request as soon as it reads it, without a byte of answer;
+# only a connection closed like that, within this long, is retried in v1.
+V1_FALLBACK_WINDOW_SEC = 1.0
+_OUTCOME_TEXT = {RESULT_WIN: "WIN", RESULT_LOSS: "LOSS", RESULT_TIE: "TIE"}
+
+
+class ServerBusy(ConnectionError):
+    """The server turned the session away (MSG_BUSY): it is at capacity."""
+
+
+class NoWelcome(ConnectionError):
+    """A v2 request was neither welcomed nor turned away the way a v1-only server does."""
 
 
 def _sigint_handler(signum, frame):
@@ -66,7 +139,68 @@ def _sigint_handler(signum, frame):
 signal.signal(signal.SIGINT, _sigint_handler)
 
 
-def listen_for_offer() -> Optional[Offer]:
+def probe_rtt(offer: Offer) -> Optional[float]:
+    """Fastest of PROBE_COUNT MSG_PING round trips to the offer socket, in seconds; None if
+    none is answered.
+
+    Not a TCP connect: the server would count that against --conn-rate and give it a slot.
+    """
+    import time
+    if not offer.offer_port:
+        return None
+    best = None
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+        udp.settimeout(PROBE_TIMEOUT_SEC)
+        for seq in range(PROBE_COUNT):
+            ping = PING_STRUCT.pack(MAGIC_COOKIE, MSG_PING, seq)
+            start = time.perf_counter()
+            try:
+                udp.sendto(ping, (offer.server_ip, offer.offer_port))
+                while udp.recvfrom(PING_STRUCT.size)[0] != ping:
+                    pass  # the late echo of an earlier ping
+            except OSError:
+                continue
+            rtt = time.perf_counter() - start
+            best = rtt if best is None else min(best, rtt)
+    return best
+
+
+def describe_load(offer: Offer) -> str:
+    load = offer.load
+    if load is None:
+        return "load unknown"
+    capacity = load.capacity or "unlimited"
+    return f"{load.active}/{capacity} connections, p99 queue wait {load.p99_queue_wait * 1e3:.1f} ms"
+
+
+def pick_least_loaded(offers: List[Offer]) -> Optional[Offer]:
+    """The server likely to serve us soonest; None if none can be reached.
+
+    Servers with a free slot come first, then those that send no load, then full ones;
+    within each, the lowest ping RTT plus p99 admission-queue wait wins, then the
+    smallest share of capacity in use.
+    """
+    ranked = []
+    for offer in offers:
+        where = f"{offer.server_name} at {offer.server_ip}:{offer.server_port}"
+        rtt = probe_rtt(offer)
+        if rtt is None:
+            print(f"  {where}: unreachable")
+            continue
+        print(f"  {where}: RTT {rtt * 1e3:.2f} ms, {describe_load(offer)}")
+        load = offer.load
+        if load is None:
+            key = (1, rtt, 0.0)
+        else:
+            share = load.active / load.capacity if load.capacity else 0.0
+            key = (2 if load.full else 0, rtt + load.p99_queue_wait, share)
+        ranked.append((key, offer))
+    if not ranked:
+        return None
+    return min(ranked, key=lambda entry: entry[0])[1]
+
+
+def listen_for_offer(least_loaded: bool = False) -> Optional[Offer]:
     import time
     udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
@@ -80,33 +214,37 @@ def listen_for_offer() -> Optional[Offer]:
         DISCOVERY_TIME = 4  # seconds to listen for offers
         while _running and (time.time() - start < DISCOVERY_TIME):
             try:
-                data, (ip, _) = udp.recvfrom(1024)
+                data, (ip, port) = udp.recvfrom(1024)
             except socket.timeout:
                 continue
             except OSError:
                 break
 
-            if len(data) < OFFER_STRUCT.size:
-                continue
-
-            cookie, msg_type, tcp_port, name_raw = OFFER_STRUCT.unpack(data[: OFFER_STRUCT.size])
-            if cookie != MAGIC_COOKIE or msg_type != MSG_OFFER:
+            offer = unpack_offer(data, ip, port)
+            if offer is None:
                 continue
 
-            name = decode_name(name_raw)
-            key = (ip, int(tcp_port))
+            key = (ip, offer.server_port)
             if key not in offers:
-                offers[key] = Offer(server_ip=ip, server_port=int(tcp_port), server_name=name)
-                print(f"Discovered server: {ip}:{tcp_port} ({name})")
+                print(f"Discovered server: {ip}:{offer.server_port} ({offer.server_name})")
+            # Keep the latest offer: its load is the most recent.
+            offers[key] = offer
 
         if not offers:
             print("No servers found.")
             return None
 
-        print("\nAvailable servers:")
         offer_list = list(offers.values())
+        if least_loaded:
+            print("\nProbing servers:")
+            offer = pick_least_loaded(offer_list)
+            if offer is not None:
+                print(f"Selected {offer.server_name} at {offer.server_ip}:{offer.server_port}")
+            return offer
+
+        print("\nAvailable servers:")
         for idx, offer in enumerate(offer_list, 1):
-            print(f"  {idx}. {offer.server_name} at {offer.server_ip}:{offer.server_port}")
+            print(f"  {idx}. {offer.server_name} at {offer.server_ip}:{offer.server_port} ({describe_load(offer)})")
 
         while True:
             try:
@@ -131,12 +269,15 @@ def listen_for_offer() -> Optional[Offer]:
 
 
 def ask_rounds() -> int:
+    """Rounds to request; ROUNDS_UNLIMITED for 0, 0 when the user quits."""
     while _running:
         try:
-            v = int(input("How many rounds do you want to play? "))
-            if 1 <= v <= 255:
+            v = int(input("How many rounds do you want to play? (0 = until Ctrl+C) "))
+            if v == 0:
+                return ROUNDS_UNLIMITED
+            if 1 <= v <= V2_MAX_ROUNDS:
                 return v
-            print("Please enter 1..255")
+            print(f"Please enter 0..{V2_MAX_ROUNDS}")
         except ValueError:
             print("Please enter an integer.")
         except (EOFError, KeyboardInterrupt):
@@ -160,12 +301,66 @@ def ask_decision() -> str:
     return "Stand"
 
 
-def recv_payload(tcp: socket.socket) -> Optional[Tuple[int, int, int]]:
-    raw = recv_exact(tcp, SERVER_PAYLOAD_STRUCT.size, stop_event=_stop_evt)
-    if not raw:
+class SeenCards:
+    """Per-rank counts of the cards not seen yet in the server's shoe (blackjack.ev input).
+
+    Mirrors blackjack.Shoe: the server reshuffles at the start of a round once the cut card
+    came out. The dealer's hole card is dealt every round but only shown when the player
+    stands; until then it stays in the counts, since to the player it is still unknown.
+    """
+
+    def __init__(self, decks: int = DEFAULT_SHOE_DECKS, penetration: float = DEFAULT_PENETRATION):
+        self.decks = decks
+        self.cut_index = int(decks * len(SUITS) * len(VALUES) * penetration)
+        self.reset()
+
+    def reset(self) -> None:
+        self.rank_counts = fresh_shoe_counts(self.decks)
+        self.dealt = 0
+
+    def new_round(self) -> None:
+        if self.dealt >= self.cut_index:
+            self.reset()
+
+    def saw(self, card: Card) -> None:
+        if self.rank_counts[card.rank - 1] == 0:
+            # More of this rank than the shoe holds: the server reshuffled when we did not
+            # expect it (e.g. a different --decks); start counting again.
+            self.reset()
+        self.rank_counts[card.rank - 1] -= 1
+        self._dealt_one()
+
+    def hole_card_unseen(self) -> None:
+        """The round ended (player bust) without the hole card being shown."""
+        self._dealt_one()
+
+    def _dealt_one(self) -> None:
+        self.dealt += 1
+        if self.dealt == self.cut_index and _strategy is not None:
+            # The server reshuffles before the next round: get its first decisions ready.
+            default_oracle().warm(fresh_shoe_counts(self.decks))
+
+
+def fresh_shoe_counts(decks: int) -> List[int]:
+    return [len(SUITS) * decks] * len(VALUES)
+
+
+def strategy_hint(player_hand: Hand, dealer_hand: Hand, seen: SeenCards) -> str:
+    up = dealer_hand.cards[0]
+    move = "Hit" if _strategy.should_hit(player_hand.value, player_hand.is_soft, up.points) else "Stand"
+    evs = default_oracle().ev_within(player_hand, up, seen.rank_counts, HINT_EV_BUDGET_SEC)
+    if evs is None:
+        return f"Hint: basic strategy says {move} (EV for the cards seen still being computed)"
+    stand_ev, hit_ev = evs
+    return f"Hint: basic strategy says {move}; EV for the cards seen: Stand {stand_ev:+.3f}, Hit {hit_ev:+.3f}"
+
+
+def recv_payload(reader: FramedReader, wire: Wire) -> Optional[Tuple[int, int, int]]:
+    msg = wire.read(reader, SERVER_PAYLOAD_STRUCT, CARD_BODY, (MSG_PAYLOAD,), stop_event=_stop_evt)
+    if not msg:
         return None
 
-    cookie, msg_type, result, rank, suit = SERVER_PAYLOAD_STRUCT.unpack(raw)
+    cookie, msg_type, result, rank, suit = msg
 
     # Validate payload header; ignore unexpected messages instead of crashing.
     if cookie != MAGIC_COOKIE or msg_type != MSG_PAYLOAD:
@@ -174,124 +369,420 @@ def recv_payload(tcp: socket.socket) -> Optional[Tuple[int, int, int]]:
     return result, rank, suit
 
 
-def play_session(offer: Offer, rounds: int, client_name: str) -> None:
+def recv_payloads(reader: FramedReader, wire: Wire) -> Optional[List[Tuple[int, int, int]]]:
+    """Wait for one payload, then also return the payloads that arrived with it.
+
+    The dealer's draws are sent back-to-back, so they usually land in a single recv.
+    Stops after the first final result so the next round's cards stay buffered.
+    """
+    first = recv_payload(reader, wire)
+    if first is None:
+        return None
+    pkts = [first]
+    if first[0] != RESULT_NOT_OVER:
+        return pkts
+    for cookie, msg_type, result, rank, suit in wire.iter_buffered(reader, SERVER_PAYLOAD_STRUCT, CARD_BODY, (MSG_PAYLOAD,)):
+        if cookie != MAGIC_COOKIE or msg_type != MSG_PAYLOAD:
+            return None
+        pkts.append((result, rank, suit))
+        if result != RESULT_NOT_OVER:
+            break
+    return pkts
+
+
+def _connect(
+    offer: Offer, wire: Wire, rounds: int, client_name: str, msg_type: int, flags: int
+) -> Tuple[socket.socket, FramedReader]:
     global _active_tcp
     tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     _active_tcp = tcp
     try:
         tcp.settimeout(SOCKET_TIMEOUT_SEC)
         tcp.connect((offer.server_ip, offer.server_port))
-        tcp.sendall(REQUEST_STRUCT.pack(MAGIC_COOKIE, MSG_REQUEST, rounds, pad_name(client_name)))
+        tcp.sendall(_request(wire, rounds, client_name, msg_type, flags))
+    except OSError:
+        tcp.close()
+        raise
+    return tcp, FramedReader(tcp)
+
+
+def _request(wire: Wire, rounds: int, client_name: str, msg_type: int, flags: int) -> bytes:
+    request = wire.request(rounds, client_name, msg_type, flags)
+    if msg_type == MSG_REQUEST_AUTOPLAY:
+        request += wire.decision_table(_strategy.should_hit)
+    return request
+
+
+def _reuse_kept(
+    offer: Offer, rounds: int, client_name: str, msg_type: int, flags: int
+) -> Optional[Tuple[socket.socket, FramedReader, Wire, int, int, bytes]]:
+    """Send the request on the kept-alive connection to this server, if there is one.
+
+    None if there is none or the server has closed it meanwhile (idle timeout, restart);
+    the caller then connects afresh.
+    """
+    global _kept, _active_tcp
+    if _kept is None:
+        return None
+    addr, tcp, reader = _kept
+    _kept = None
+    if addr != (offer.server_ip, offer.server_port):
+        tcp.close()
+        return None
+    _active_tcp = tcp
+    try:
+        tcp.sendall(_request(WIRE_V2, rounds, client_name, msg_type, flags))
+        welcome = WIRE_V2.read(reader, WELCOME_STRUCT, WELCOME_BODY, (MSG_WELCOME,), stop_event=_stop_evt)
+    except OSError:
+        welcome = None
+    if welcome is None:
+        tcp.close()
+        _active_tcp = None
+        return None
+    return tcp, reader, WIRE_V2, rounds, welcome[3] & flags, welcome[4]
 
-        wins = 0
-        played = 0
 
-        for r in range(1, rounds + 1):
-            if not _running:
-                return
+def close_kept_connection() -> None:
+    global _kept
+    if _kept is not None:
+        try:
+            _kept[1].close()
+        except OSError:
+            pass
+        _kept = None
+
+
+def _end_session(offer: Offer, tcp: Optional[socket.socket], reader: Optional[FramedReader], keep: bool) -> None:
+    """Close the session's connection, or keep it for the next session with this server."""
+    global _kept, _active_tcp
+    _active_tcp = None
+    if tcp is None:
+        return
+    if keep and _running:
+        _kept = ((offer.server_ip, offer.server_port), tcp, reader)
+        return
+    try:
+        tcp.close()
+    except OSError:
+        pass
+
+
+def open_session(
+    offer: Offer, rounds: int, client_name: str, msg_type: int = MSG_REQUEST, flags: int = 0
+) -> Tuple[socket.socket, FramedReader, Wire, int, int, bytes]:
+    """Send the request on a kept connection if there is one, else connect, preferring v2.
+
+    A connection kept alive after the last session (keep-alive is always requested) is
+    reused if it goes to the same server and still answers. Otherwise the request goes out
+    in protocol v2; a v1-only server closes the connection at once without answering, and
+    the request is repeated in v1, with the round count capped to what v1 can carry and no
+    flags. A busy server raises ServerBusy; any other missing welcome raises NoWelcome.
+
+    Returns (socket, reader, wire, rounds requested, flags the server accepted, session
+    token - NO_TOKEN unless the session is resumable).
+    """
+    flags |= FLAG_KEEP_ALIVE
+    reused = _reuse_kept(offer, rounds, client_name, msg_type, flags)
+    if reused is not None:
+        return reused
+    import time
+    sent = time.monotonic()
+    tcp, reader = _connect(offer, WIRE_V2, rounds, client_name, msg_type, flags)
+    welcome = WIRE_V2.read(reader, WELCOME_STRUCT, WELCOME_BODY, (MSG_WELCOME, MSG_BUSY), stop_event=_stop_evt)
+    if welcome is not None and welcome[1] == MSG_BUSY:
+        tcp.close()
+        raise ServerBusy("server busy")
+    if welcome is not None:
+        return tcp, reader, WIRE_V2, rounds, welcome[3] & flags, welcome[4]
+    if not _running:
+        return tcp, reader, WIRE_V2, rounds, 0, NO_TOKEN
+    tcp.close()
+    if reader.received:
+        raise NoWelcome("Server sent something other than a welcome")
+    if time.monotonic() - sent > V1_FALLBACK_WINDOW_SEC:
+        raise NoWelcome("Server closed the connection without answering")
+
+    capped = min(rounds, WIRE_V1.max_rounds)
+    if capped != rounds:
+        print(f"Server only speaks protocol v1: playing {capped} rounds.")
+    tcp, reader = _connect(offer, WIRE_V1, capped, client_name, msg_type, 0)
+    return tcp, reader, WIRE_V1, capped, 0, NO_TOKEN
+
+
+def _round_title(r: int, rounds: int) -> str:
+    return f"Round {r}" if rounds == ROUNDS_UNLIMITED else f"Round {r}/{rounds}"
+
+
+def _deal(reader: FramedReader, wire: Wire, seen: SeenCards, player_hand: Hand, dealer_hand: Hand) -> None:
+    """Receive the initial 3 payloads: player, player, dealer-up."""
+    for i in range(3):
+        pkt = recv_payload(reader, wire)
+        if pkt is None:
+            raise ConnectionError("server disconnected")
+        result, rank, suit = pkt
+        card = card_from_wire(rank, suit)
+        if card is None:
+            continue
+        seen.saw(card)
+        if i < 2:
+            player_hand.add_card(card)
+        else:
+            dealer_hand.add_card(card)
+
+
+def _play_decisions(
+    tcp: socket.socket,
+    reader: FramedReader,
+    wire: Wire,
+    transcript: bool,
+    seen: SeenCards,
+    player_hand: Hand,
+    dealer_hand: Hand,
+) -> Optional[int]:
+    """Ask for decisions until the round ends; its RESULT_*, or None if the player quit."""
+    while _running:
+        if _strategy is not None:
+            print(strategy_hint(player_hand, dealer_hand, seen))
+        decision = ask_decision()
+        if not _running or not decision:
+            return None
+        tcp.sendall(wire.decision(decision))
+
+        if transcript and decision != "Hittt":
+            # Stand: the whole dealer turn arrives as one frame; render it in one step.
+            got = wire.read_body(reader, (MSG_DEALER_TRANSCRIPT,), stop_event=_stop_evt)
+            dealer_turn = decode_dealer_transcript(got[1]) if got is not None else None
+            if dealer_turn is None:
+                raise ConnectionError("server disconnected")
+            result, cards = dealer_turn
+            for c in cards:
+                dealer_hand.add_card(c)
+                seen.saw(c)
+            print_game_state(None, player_hand, dealer_hand, hide_dealer=False)
+            return result
+
+        pkt = recv_payload(reader, wire)
+        if pkt is None:
+            raise ConnectionError("server disconnected")
+
+        result, rank, suit = pkt
+
+        if decision == "Hittt":
+            c = card_from_wire(rank, suit)
+            if c is not None:
+                player_hand.add_card(c)
+                seen.saw(c)
+
+            print_game_state(None, player_hand, dealer_hand, hide_dealer=True)
 
-            print(f"\n=== Round {r}/{rounds} ===")
+            if result != RESULT_NOT_OVER:
+                seen.hole_card_unseen()
+                return result
 
-            player_hand = Hand()
-            dealer_hand = Hand()
+        else:
+            # Stand: first payload may be dealer hidden card
+            c = card_from_wire(rank, suit)
+            if c is not None:
+                dealer_hand.add_card(c)
+                seen.saw(c)
 
-            # initial 3 payloads: player, player, dealer-up
-            for i in range(3):
-                pkt = recv_payload(tcp)
-                if pkt is None:
+            print_game_state(None, player_hand, dealer_hand, hide_dealer=False)
+
+            # Read dealer draws until final result
+            while _running and result == RESULT_NOT_OVER:
+                pkts = recv_payloads(reader, wire)
+                if pkts is None:
                     raise ConnectionError("server disconnected")
-                result, rank, suit = pkt
-                card = card_from_wire(rank, suit)
-                if card is None:
-                    continue
-                if i < 2:
-                    player_hand.add_card(card)
-                else:
-                    dealer_hand.add_card(card)
+                for result, rank, suit in pkts:
+                    c = card_from_wire(rank, suit)
+                    if c is not None:
+                        dealer_hand.add_card(c)
+                        seen.saw(c)
+                        print_game_state(None, player_hand, dealer_hand, hide_dealer=False)
+            return result
+    return None
 
-            # Print full state (dealer hidden card not known yet)
-            print_game_state(None, player_hand, dealer_hand, hide_dealer=True)
 
-            # Player loop
-            while _running:
-                decision = ask_decision()
-                if not _running or not decision:
-                    return
-                tcp.sendall(CLIENT_PAYLOAD_STRUCT.pack(MAGIC_COOKIE, MSG_PAYLOAD, decision.encode("utf-8")))
+def resume_session(offer: Offer, token: bytes) -> Optional[Tuple[socket.socket, FramedReader, int, List[Card]]]:
+    """Reconnect and continue a dropped session: (socket, reader, round, cards of that round).
 
-                pkt = recv_payload(tcp)
-                if pkt is None:
-                    raise ConnectionError("server disconnected")
+    None if the server no longer has the session. Attempts are spread out with jittered
+    backoff, so a server blip does not bring all of its clients back in one burst (and the
+    server gets a moment to notice the drop and park the session).
+    """
+    global _active_tcp
+    print("\nConnection lost; trying to resume the session...")
+    delay = RESUME_BACKOFF_SEC
+    for _ in range(RESUME_ATTEMPTS):
+        if _stop_evt.wait(delay * random.uniform(0.5, 1.5)):
+            return None
+        delay *= 2
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        _active_tcp = tcp
+        try:
+            tcp.settimeout(SOCKET_TIMEOUT_SEC)
+            tcp.connect((offer.server_ip, offer.server_port))
+            tcp.sendall(WIRE_V2.resume(token))
+            reader = FramedReader(tcp)
+            welcome = WIRE_V2.read(reader, WELCOME_STRUCT, WELCOME_BODY, (MSG_WELCOME,), stop_event=_stop_evt)
+            if welcome is not None and welcome[4] == token:
+                got = WIRE_V2.read_body(reader, (MSG_ROUND_STATE,), stop_event=_stop_evt)
+                state = decode_round_state(got[1]) if got is not None else None
+                if state is not None:
+                    print(f"Session resumed at round {state[0]}.")
+                    return (tcp, reader) + state
+        except OSError:
+            pass
+        tcp.close()
+    _active_tcp = None
+    return None
 
-                result, rank, suit = pkt
 
-                if decision == "Hittt":
-                    c = card_from_wire(rank, suit)
-                    if c is not None:
-                        player_hand.add_card(c)
+def play_session(offer: Offer, rounds: int, client_name: str) -> None:
+    tcp = reader = None
+    keep = False
+    try:
+        tcp, reader, wire, rounds, flags, token = open_session(
+            offer, rounds, client_name, flags=FLAG_RESUMABLE | (FLAG_DEALER_TRANSCRIPT if _compact else 0)
+        )
+        transcript = bool(flags & FLAG_DEALER_TRANSCRIPT)
 
-                    print_game_state(None, player_hand, dealer_hand, hide_dealer=True)
+        wins = 0
+        played = 0
+        seen = SeenCards(_hint_decks)
+        player_hand = Hand()
+        # Cards of the round in progress when a resumed session continues mid-round.
+        resumed_cards: List[Card] = []
 
-                    if result != RESULT_NOT_OVER:
-                        outcome = {RESULT_WIN: "WIN", RESULT_LOSS: "LOSS", RESULT_TIE: "TIE"}.get(result, "?")
-                        print("Result: " + outcome)
-                        played += 1
-                        if result == RESULT_WIN:
-                            wins += 1
-                        break
+        r = 1
+        while rounds == ROUNDS_UNLIMITED or r <= rounds:
+            if not _running:
+                return
 
+            print(f"\n=== {_round_title(r, rounds)} ===")
+            try:
+                if resumed_cards:
+                    # Count only the cards that were lost in flight before the drop.
+                    for c in resumed_cards[len(player_hand.cards):-1]:
+                        seen.saw(c)
+                    player_hand, dealer_hand = Hand(resumed_cards[:-1]), Hand(resumed_cards[-1:])
+                    resumed_cards = []
                 else:
-                    # Stand: first payload may be dealer hidden card
-                    c = card_from_wire(rank, suit)
-                    if c is not None:
-                        dealer_hand.add_card(c)
-
-                    print_game_state(None, player_hand, dealer_hand, hide_dealer=False)
-
-                    # Read dealer draws until final result
-                    while _running and result == RESULT_NOT_OVER:
-                        pktd = recv_payload(tcp)
-                        if pktd is None:
-                            raise ConnectionError("server disconnected")
-                        result, rank, suit = pktd
-                        c = card_from_wire(rank, suit)
-                        if c is not None:
-                            dealer_hand.add_card(c)
-                            print_game_state(None, player_hand, dealer_hand, hide_dealer=False)
-
-                    outcome = {RESULT_WIN: "WIN", RESULT_LOSS: "LOSS", RESULT_TIE: "TIE"}.get(result, "?")
-                    print("Result: " + outcome)
-                    played += 1
-                    if result == RESULT_WIN:
-                        wins += 1
-                    break
+                    seen.new_round()
+                    player_hand, dealer_hand = Hand(), Hand()
+                    _deal(reader, wire, seen, player_hand, dealer_hand)
+
+                # Print full state (dealer hidden card not known yet)
+                print_game_state(None, player_hand, dealer_hand, hide_dealer=True)
+                result = _play_decisions(tcp, reader, wire, transcript, seen, player_hand, dealer_hand)
+            except (ConnectionError, OSError):
+                if not _running or token == NO_TOKEN:
+                    raise
+                tcp.close()
+                resumed = resume_session(offer, token)
+                if resumed is None:
+                    raise
+                tcp, reader, r, resumed_cards = resumed
+                continue
 
+            if result is None:
+                return
+            print("Result: " + _OUTCOME_TEXT.get(result, "?"))
+            played += 1
+            if result == RESULT_WIN:
+                wins += 1
+            r += 1
 
         # Session stats (after all rounds complete)
         if played > 0:
             win_rate = wins / played * 100
             print(f"Finished playing {played} rounds, win rate: {win_rate:.2f}%")
+        keep = bool(flags & FLAG_KEEP_ALIVE)
 
+    except ServerBusy:
+        print("\nServer is busy; try again in a moment.\n")
+    except NoWelcome as exc:
+        print(f"\n{exc}. Returning to listening mode...\n")
     except (ConnectionError, OSError):
         if _running:
             print("\nServer disconnected. Returning to listening mode...\n")
     finally:
-        try:
-            tcp.close()
-        except OSError:
-            pass
-        _active_tcp = None
+        _end_session(offer, tcp, reader, keep)
+
+
+def play_autoplay_session(offer: Offer, rounds: int, client_name: str) -> None:
+    """Upload the chart once; the server plays all rounds and streams one result per round."""
+    tcp = reader = None
+    keep = False
+    wins = played = 0
+    try:
+        tcp, reader, wire, rounds, flags, _ = open_session(offer, rounds, client_name, MSG_REQUEST_AUTOPLAY)
+
+        while _running and (rounds == ROUNDS_UNLIMITED or played < rounds):
+            msg = wire.read(reader, ROUND_RESULT_STRUCT, ROUND_RESULT_BODY, (MSG_ROUND_RESULT,), stop_event=_stop_evt)
+            if msg is None:
+                if not _running:
+                    break
+                if played == 0:
+                    print("\nServer closed the connection (it may not support --auto).")
+                    return
+                raise ConnectionError("server disconnected")
+            cookie, msg_type, result, p_total, d_total = msg
+            if cookie != MAGIC_COOKIE or msg_type != MSG_ROUND_RESULT:
+                raise ConnectionError("unexpected message")
+            played += 1
+            if result == RESULT_WIN:
+                wins += 1
+            print(f"{_round_title(played, rounds)}: player {p_total} vs dealer {d_total} -> {_OUTCOME_TEXT.get(result, '?')}")
+
+        if played > 0:
+            print(f"Finished playing {played} rounds, win rate: {wins / played * 100:.2f}%")
+        keep = played == rounds and bool(flags & FLAG_KEEP_ALIVE)
+
+    except ServerBusy:
+        print("\nServer is busy; try again in a moment.\n")
+    except NoWelcome as exc:
+        print(f"\n{exc}. Returning to listening mode...\n")
+    except (ConnectionError, OSError):
+        if _running:
+            print("\nServer disconnected. Returning to listening mode...\n")
+    finally:
+        _end_session(offer, tcp, reader, keep)
 
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--name", default="Team Joker")
+    p.add_argument("--hint", action="store_true",
+                   help="show the basic-strategy move and the exact Stand/Hit EVs before each decision")
+    p.add_argument("--decks", type=int, default=DEFAULT_SHOE_DECKS,
+                   help="decks in the server's shoe, for the --hint EVs (default %(default)s)")
+    p.add_argument("--auto", action="store_true",
+                   help="upload the basic-strategy chart and let the server play every round")
+    p.add_argument("--compact", action="store_true",
+                   help="receive the dealer's turn as one message instead of one per card (protocol v2)")
+    p.add_argument("--least-loaded", action="store_true",
+                   help="join the least-loaded server (by its offered load and a UDP ping RTT) instead of asking")
     args = p.parse_args()
+    if not MIN_SHOE_DECKS <= args.decks <= MAX_SHOE_DECKS:
+        p.error(f"--decks must be within {MIN_SHOE_DECKS}..{MAX_SHOE_DECKS}")
+
+    global _strategy, _hint_decks, _compact
+    _compact = args.compact
+    if args.hint or args.auto:
+        _hint_decks = args.decks
+        _strategy = load_cached(args.decks)
+        if _strategy is None:
+            print("Computing basic strategy (one-time; cached for next start)...")
+            _strategy = load_or_compute(args.decks)
+    if args.hint and not args.auto:
+        # First decisions of a fresh shoe, computed while the player picks a server.
+        default_oracle().warm(fresh_shoe_counts(args.decks))
 
     offer = None
     while _running:
         if offer is None:
-            offer = listen_for_offer()
+            offer = listen_for_offer(args.least_loaded)
             if not offer:
                 if _running:
                     print("No offers received; retrying...")
@@ -301,17 +792,22 @@ def main():
         if rounds <= 0 or not _running:
             break
 
-        play_session(offer, rounds, args.name)
+        if args.auto:
+            play_autoplay_session(offer, rounds, args.name)
+        else:
+            play_session(offer, rounds, args.name)
 
         # After a session, ask if user wants to select a different server
         try:
             again = input("\nPlay again with the same server? (y = yes, n = choose new server, Enter = quit): ").strip().lower()
             if again == "n":
                 offer = None
+                close_kept_connection()
             elif again == "":
                 break
         except (EOFError, KeyboardInterrupt):
             break
+    close_kept_connection()
 
 
 if __name__ == "__main__":
@@ -5,26 +5,104 @@ from __future__ import annotations
 Shared protocol constants, struct formats, helpers, and shared pretty-printing.
 
 The printing helpers operate on blackjack.py objects (Card/Hand) rather than tuples.
+
+Protocol versions (see Wire):
+- v1: the fixed-size structs below (REQUEST_STRUCT etc.).
+- v2: every message is a frame - FRAME_HEADER (cookie, FRAME_FLAG | version, type, body
+  length) plus a body. The request carries a u32 round count (ROUNDS_UNLIMITED = play until
+  the client leaves) and the server confirms with MSG_WELCOME. Frames of unknown types are
+  skipped, so new message types can be added without breaking older peers. The byte after
+  the cookie tells the versions apart: v1 message types never have FRAME_FLAG set.
+- v2 request flags (echoed in the welcome when accepted): FLAG_DEALER_TRANSCRIPT asks for
+  the dealer's turn as one MSG_DEALER_TRANSCRIPT frame (result, then card ids) after Stand;
+  FLAG_KEEP_ALIVE keeps the connection open for further requests once the session ends;
+  FLAG_RESUMABLE gets a session token in the welcome, which MSG_RESUME presents on a new
+  connection to continue a dropped session.
+
+Offers may carry OFFER_LOAD_STRUCT after OFFER_STRUCT (see pack_offer): the server's active
+connections, capacity and recent p99 admission wait. Older clients read only the first
+OFFER_STRUCT.size bytes, so they ignore it. The socket the offers come from echoes
+MSG_PING datagrams (PING_STRUCT), for the client's RTT probe.
 """
 
+import os
+import select
 import socket
 import struct
+import sys
+import threading
+import time
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from blackjack import Card, Hand
+from blackjack import (
+    Card,
+    Hand,
+    CARDS,
+    MIN_UPCARD_POINTS,
+    SUITS,
+    TABLE_ROWS,
+    TABLE_TOTALS,
+    VALUES,
+    RESULT_NOT_OVER,
+    RESULT_TIE,
+    RESULT_LOSS,
+    RESULT_WIN,
+)
 
 # ---- Protocol constants ----
 MAGIC_COOKIE = 0xABCDDCBA
 MSG_OFFER = 0x2
 MSG_REQUEST = 0x3
 MSG_PAYLOAD = 0x4
+# Autoplay extension: a request with this type is followed by a DECISION_TABLE message;
+# the server then plays every round itself and answers with one ROUND_RESULT per round.
+MSG_REQUEST_AUTOPLAY = 0x5
+MSG_DECISION_TABLE = 0x6
+MSG_ROUND_RESULT = 0x7
+# v2 only: the server's answer to a v2 request (body: negotiated version, accepted flags).
+MSG_WELCOME = 0x8
+# v2 only, opt-in with FLAG_DEALER_TRANSCRIPT: the answer to a Stand - the hidden card, the
+# dealer's draws and the round result in one frame (body: result, then one card id per card).
+MSG_DEALER_TRANSCRIPT = 0x9
+# v2 only: continue a resumable session after its connection dropped (body: session token).
+MSG_RESUME = 0xA
+# v2 only: sent after the welcome of a resumed session - where it stands (body: u32 round
+# index, then the card ids of the player's hand and the dealer's upcard; no cards = that
+# round is dealt next, as usual).
+MSG_ROUND_STATE = 0xB
+# v2 frame, sent in place of the welcome when the server is at capacity (see admission.py);
+# the connection is then closed. No body. Sent before the request is read, so a v1 client
+# just sees the connection close.
+MSG_BUSY = 0xC
+# UDP only: sent to the socket the offers come from, which echoes it back unchanged; the
+# client's RTT probe (a TCP connect would be admitted and rate-limited as a session).
+MSG_PING = 0xD
+
+# v2 request flags
+FLAG_DEALER_TRANSCRIPT = 0x01
+# Keep the connection open after the session: the server then waits (up to its idle
+# timeout) for the next request on the same connection instead of closing it.
+FLAG_KEEP_ALIVE = 0x02
+# Ask for a session token in the welcome; with it a dropped session can be resumed.
+FLAG_RESUMABLE = 0x04
+SUPPORTED_FLAGS = FLAG_DEALER_TRANSCRIPT | FLAG_KEEP_ALIVE | FLAG_RESUMABLE
+
+# Session tokens are random; all zeros = no token (not resumable).
+TOKEN_SIZE = 16
+NO_TOKEN = bytes(TOKEN_SIZE)
 
 UDP_PORT_OFFERS = 13122
 OFFER_INTERVAL_SEC = 1.0
 
-# Default socket timeout used by client/server loops (keeps Ctrl+C responsive without busy-waiting)
+# Default socket timeout used by client/server loops (keeps Ctrl+C responsive without busy-waiting).
+# Reads stopped by a WakeupEvent wait without it (see SocketWaiter).
 SOCKET_TIMEOUT_SEC = 1.0
+# How long a kept-alive connection may sit between sessions before the server closes it.
+KEEPALIVE_IDLE_SEC = 30.0
+
+# Per-connection receive buffer for FramedReader; every protocol message is far smaller.
+RECV_BUFFER_SIZE = 4096
 
 # Suit encoding per spec "HDCS" (must match blackjack.SUITS order)
 SUIT_TO_CODE = {"Hearts": 0, "Diamonds": 1, "Clubs": 2, "Spades": 3}
@@ -32,9 +110,105 @@ CODE_TO_SUIT = {v: k for k, v in SUIT_TO_CODE.items()}
 
 # ---- Binary layouts (network byte order, big-endian) ----
 OFFER_STRUCT = struct.Struct("!IBH32s")         # cookie, type, tcp_port, server_name[32]
+OFFER_LOAD_STRUCT = struct.Struct("!III")       # offer trailer: active, capacity, p99 queue wait (us)
+PING_STRUCT = struct.Struct("!IBI")             # cookie, type, sequence number
 REQUEST_STRUCT = struct.Struct("!IBB32s")       # cookie, type, rounds, client_name[32]
 CLIENT_PAYLOAD_STRUCT = struct.Struct("!IB5s")  # cookie, type, decision[5] ("Hittt"/"Stand")
 SERVER_PAYLOAD_STRUCT = struct.Struct("!IBBHB") # cookie, type, result, rank(u16), suit(u8)
+# cookie, type, TABLE_ROWS u16 hit masks (see blackjack.TABLE_ROWS); 93 bytes
+DECISION_TABLE_STRUCT = struct.Struct(f"!IB{TABLE_ROWS}H")
+ROUND_RESULT_STRUCT = struct.Struct("!IBBBB")   # cookie, type, result, player_total, dealer_total
+# v2-only messages, decoded v1-shaped (cookie, type, body fields):
+WELCOME_STRUCT = struct.Struct(f"!IBBB{TOKEN_SIZE}s")  # cookie, type, version, flags, token
+RESUME_STRUCT = struct.Struct(f"!IB{TOKEN_SIZE}s")     # cookie, type, token
+
+# Upcards 2..11 -> 10 mask bits per table row.
+UPCARD_COUNT = 10
+
+# ---- Protocol v2 framing ----
+PROTO_V1 = 1
+PROTO_V2 = 2
+PROTO_VERSION = PROTO_V2  # newest version this code speaks
+FRAME_FLAG = 0x80
+FRAME_HEADER = struct.Struct("!IBBH")           # cookie, FRAME_FLAG | version, type, body length
+PREAMBLE_STRUCT = struct.Struct("!IB")          # first 5 bytes of any message: cookie, type/version
+V1_MAX_ROUNDS = 0xFF
+ROUNDS_UNLIMITED = 0xFFFFFFFF                   # v2 request: play until the client disconnects
+V2_MAX_ROUNDS = ROUNDS_UNLIMITED - 1
+
+# v2 frame bodies (same fields as the v1 structs, minus cookie and type)
+REQUEST_BODY = struct.Struct("!I32sB")          # rounds(u32), client_name[32], flags (FLAG_*)
+WELCOME_BODY = struct.Struct(f"!BB{TOKEN_SIZE}s")  # negotiated version, accepted flags, token
+RESUME_BODY = struct.Struct(f"!{TOKEN_SIZE}s")     # token from the session's welcome
+ROUND_STATE_HEAD = struct.Struct("!I")            # round index; card ids follow
+DECISION_BODY = struct.Struct("!5s")            # "Hittt"/"Stand"
+CARD_BODY = struct.Struct("!BHB")               # result, rank(u16), suit(u8)
+ROUND_RESULT_BODY = struct.Struct("!BBB")       # result, player_total, dealer_total
+DECISION_TABLE_BODY = struct.Struct(f"!{TABLE_ROWS}H")
+# Largest frame body a FramedReader accepts (a frame must fit in its buffer).
+MAX_FRAME_BODY = RECV_BUFFER_SIZE - FRAME_HEADER.size
+
+
+# ---- Precomputed server payloads ----
+# Indexed by Card.id (0..51, suit_code * 13 + rank - 1); NO_CARD_ID is the extra slot for
+# the rank=0/suit=0 "no card" payload (final results).
+NO_CARD_ID = len(CARDS)
+
+
+def _build_server_payloads() -> Tuple[Tuple[bytes, ...], ...]:
+    table = []
+    for result in (RESULT_NOT_OVER, RESULT_TIE, RESULT_LOSS, RESULT_WIN):
+        row = [
+            SERVER_PAYLOAD_STRUCT.pack(MAGIC_COOKIE, MSG_PAYLOAD, result, rank, suit_code)
+            for suit_code in range(len(SUITS))
+            for rank in range(1, len(VALUES) + 1)
+        ]
+        row.append(SERVER_PAYLOAD_STRUCT.pack(MAGIC_COOKIE, MSG_PAYLOAD, result, 0, 0))
+        table.append(tuple(row))
+    return tuple(table)
+
+
+# SERVER_PAYLOADS[result][card_id] -> the ready-made 9-byte SERVER_PAYLOAD message.
+SERVER_PAYLOADS = _build_server_payloads()
+
+
+def frame(msg_type: int, body: bytes, version: int = PROTO_V2) -> bytes:
+    """One v2 message: header plus body."""
+    return FRAME_HEADER.pack(MAGIC_COOKIE, FRAME_FLAG | version, msg_type, len(body)) + body
+
+
+# Same table for v2: the 9-byte v1 message minus cookie/type, framed (12 bytes).
+SERVER_PAYLOADS_V2 = tuple(
+    tuple(frame(MSG_PAYLOAD, msg[PREAMBLE_STRUCT.size:]) for msg in row) for row in SERVER_PAYLOADS
+)
+
+
+def server_payload(result: int, card: Optional[Card]) -> bytes:
+    """Wire bytes for (result, card); card=None gives the "no card" payload."""
+    return SERVER_PAYLOADS[result][NO_CARD_ID if card is None else card.id]
+
+
+def decision_table_masks(should_hit: Callable[[int, bool, int], bool]) -> List[int]:
+    """Hit masks (blackjack.TABLE_ROWS) from should_hit(total, soft, upcard_points)."""
+    masks = []
+    for soft in (False, True):
+        for total in range(TABLE_TOTALS):
+            mask = 0
+            for bit in range(UPCARD_COUNT):
+                if should_hit(total, soft, MIN_UPCARD_POINTS + bit):
+                    mask |= 1 << bit
+            masks.append(mask)
+    return masks
+
+
+def unpack_decision_table(fields: tuple) -> Optional[Tuple[int, ...]]:
+    """Hit masks from a decoded DECISION_TABLE message; None if it is not one."""
+    cookie, msg_type, *masks = fields
+    if cookie != MAGIC_COOKIE or msg_type != MSG_DECISION_TABLE:
+        return None
+    # Ignore bits for upcards that do not exist.
+    valid = (1 << UPCARD_COUNT) - 1
+    return tuple(m & valid for m in masks)
 
 
 def pad_name(name: str, length: int = 32) -> bytes:
@@ -46,11 +220,96 @@ def decode_name(raw32: bytes) -> str:
     return raw32.split(b"\x00", 1)[0].decode("utf-8", errors="ignore")
 
 
-def recv_exact(sock: socket.socket, n: int, stop_event=None) -> Optional[bytes]:
+class WakeupEvent(threading.Event):
+    """A threading.Event that also has a file descriptor, readable once the event is set.
+
+    Threads blocked in poll() on a socket plus this fd (SocketWaiter) wake up as soon as the
+    event is set, instead of checking it once per SOCKET_TIMEOUT_SEC: idle connections cost
+    no wakeups, and shutdown does not wait for their timeouts.
+    """
+
+    def __init__(self):
+        super().__init__()
+        if hasattr(os, "eventfd"):
+            self._rfd = self._wfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            self._rfd, self._wfd = os.pipe()
+            os.set_blocking(self._rfd, False)
+            os.set_blocking(self._wfd, False)
+
+    def fileno(self) -> int:
+        return self._rfd
+
+    def set(self, wake: bool = True) -> None:
+        """Set the event; with wake=False the fd stays quiet until wake() (is_set() is True at once)."""
+        super().set()
+        if wake:
+            self.wake()
+
+    def wake(self) -> None:
+        """Make the fd readable: wakes every thread polling it."""
+        try:
+            # 8 bytes: what an eventfd expects (a pipe takes any size).
+            os.write(self._wfd, (1).to_bytes(8, sys.byteorder))
+        except OSError:
+            pass  # already readable (pipe full / counter saturated) or closed
+
+    def clear(self) -> None:
+        super().clear()
+        try:
+            while os.read(self._rfd, 4096):
+                pass
+        except OSError:
+            pass
+
+    def __del__(self):
+        for fd in {self._rfd, self._wfd}:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class SocketWaiter:
+    """Waits for one socket to become readable, or for a stop event.
+
+    With a WakeupEvent the wait is a single poll() on both fds, woken by whichever comes
+    first. A plain threading.Event is checked every SOCKET_TIMEOUT_SEC, and without poll()
+    (Windows) the wait returns at once and the socket's own timeout paces the caller.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self._sock_fd = sock.fileno()
+        self._poll = select.poll() if hasattr(select, "poll") else None
+        if self._poll is not None:
+            self._poll.register(self._sock_fd, select.POLLIN)
+        self._stop_fd = -1  # WakeupEvent fd currently registered
+
+    def wait(self, stop_event=None, deadline: Optional[float] = None) -> bool:
+        """True once the socket is readable (or closed); False on stop_event, deadline or a poll interval."""
+        if self._poll is None:
+            return True
+        stop_fd = stop_event.fileno() if isinstance(stop_event, WakeupEvent) else -1
+        if stop_fd != self._stop_fd:
+            if self._stop_fd >= 0:
+                self._poll.unregister(self._stop_fd)
+            if stop_fd >= 0:
+                self._poll.register(stop_fd, select.POLLIN)
+            self._stop_fd = stop_fd
+        timeout = SOCKET_TIMEOUT_SEC if stop_event is not None and stop_fd < 0 else None
+        if deadline is not None:
+            left = max(0.0, deadline - time.monotonic())
+            timeout = left if timeout is None else min(timeout, left)
+        events = self._poll.poll(None if timeout is None else timeout * 1000)
+        return any(fd == self._sock_fd for fd, _ in events)
+
+
+def recv_exact(sock: socket.socket, n: int, stop_event=None, deadline: Optional[float] = None) -> Optional[bytes]:
     """Receive exactly n bytes over TCP.
 
     Returns None if the connection closes before n bytes arrive.
-    - If the socket times out, the function keeps waiting (not busy-waiting).
+    - If the socket times out, the function keeps waiting (not busy-waiting), until
+      `deadline` (a time.monotonic() value) if given.
     - If stop_event is provided and set, the function returns None to allow graceful shutdown.
     """
     data = bytearray()
@@ -59,7 +318,10 @@ def recv_exact(sock: socket.socket, n: int, stop_event=None) -> Optional[bytes]:
             return None
         try:
             chunk = sock.recv(n - len(data))
-        except socket.timeout:
+        except socket.timeout as exc:
+            # errno set = ETIMEDOUT from the kernel: the peer is gone.
+            if exc.errno is not None or (deadline is not None and time.monotonic() >= deadline):
+                return None
             continue
         except OSError:
             return None
@@ -69,39 +331,341 @@ def recv_exact(sock: socket.socket, n: int, stop_event=None) -> Optional[bytes]:
     return bytes(data)
 
 
+class FramedReader:
+    """Buffered reader for the fixed-size TCP messages of one connection.
+
+    recv_exact allocates and issues a recv per message; this reader instead recv_into()s a
+    preallocated buffer and decodes straight out of it with Struct.unpack_from. A single
+    syscall often brings in several messages (e.g. the dealer's reveal plus every dealer hit),
+    which are then served from the buffer without touching the socket.
+
+    Timeout / stop_event / disconnect semantics match recv_exact; a WakeupEvent as
+    stop_event ends a blocked read at once (SocketWaiter). After a failed read, `timed_out`
+    and `peer_gone` tell a deadline and a peer the kernel gave up on from a close.
+    """
+
+    def __init__(self, sock: socket.socket, bufsize: int = RECV_BUFFER_SIZE):
+        self.sock = sock
+        self.timed_out = False
+        self.peer_gone = False  # ETIMEDOUT: heartbeats (or unacknowledged sends) went unanswered
+        self._waiter = SocketWaiter(sock)
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        self._start = 0  # first unread byte
+        self._end = 0    # one past the last received byte
+        self.received = 0  # bytes received over the connection's lifetime
+
+    def buffered(self) -> int:
+        """Number of received bytes not yet handed out."""
+        return self._end - self._start
+
+    def _fill(self, n: int, stop_event=None, deadline: Optional[float] = None) -> bool:
+        """Block until at least n bytes are buffered. Returns False on close/stop/deadline.
+
+        `deadline` is a time.monotonic() value.
+        """
+        self.timed_out = self.peer_gone = False
+        if n > len(self._buf):
+            raise ValueError(f"message of {n} bytes exceeds reader buffer ({len(self._buf)})")
+        # Move the unread tail to the front when there is no room for the rest of the message.
+        if len(self._buf) - self._start < n:
+            pending = self._end - self._start
+            self._buf[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        while self._end - self._start < n:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            if not self._waiter.wait(stop_event, deadline):
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.timed_out = True
+                    return False
+                continue
+            try:
+                got = self.sock.recv_into(self._view[self._end:])
+            except socket.timeout as exc:
+                if exc.errno is not None:
+                    # ETIMEDOUT from the kernel rather than the socket timeout.
+                    self.peer_gone = True
+                    return False
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.timed_out = True
+                    return False
+                continue
+            except OSError:
+                return False
+            if not got:
+                return False
+            self._end += got
+            self.received += got
+        return True
+
+    def read_exact(self, n: int, stop_event=None) -> Optional[memoryview]:
+        """Return the next n bytes as a view into the buffer (valid until the next read)."""
+        if self._end - self._start < n and not self._fill(n, stop_event):
+            return None
+        view = self._view[self._start:self._start + n]
+        self._advance(n)
+        return view
+
+    def read_struct(self, layout: struct.Struct, stop_event=None) -> Optional[tuple]:
+        """Read and decode one message; None if the connection closes first."""
+        if self._end - self._start < layout.size and not self._fill(layout.size, stop_event):
+            return None
+        fields = layout.unpack_from(self._buf, self._start)
+        self._advance(layout.size)
+        return fields
+
+    def peek(self, n: int, stop_event=None, deadline: Optional[float] = None) -> Optional[memoryview]:
+        """Like read_exact, but the bytes stay buffered for the next read (None after `deadline`)."""
+        if self._end - self._start < n and not self._fill(n, stop_event, deadline):
+            return None
+        return self._view[self._start:self._start + n]
+
+    def peek_frame_type(self, stop_event=None) -> Optional[int]:
+        """Message type of the next v2 frame, left buffered; None if the connection closes."""
+        header = self.peek(FRAME_HEADER.size, stop_event)
+        return None if header is None else FRAME_HEADER.unpack(header)[2]
+
+    def read_frame(self, stop_event=None) -> Optional[Tuple[int, memoryview]]:
+        """Read one v2 frame -> (type, body view valid until the next read).
+
+        None if the connection closes, or if the stream is not framed (bad cookie / flag,
+        body larger than the buffer): there is no way to resynchronise after that.
+        """
+        header = self.read_struct(FRAME_HEADER, stop_event)
+        if header is None:
+            return None
+        cookie, marker, msg_type, length = header
+        if cookie != MAGIC_COOKIE or not marker & FRAME_FLAG or length > MAX_FRAME_BODY:
+            return None
+        body = self.read_exact(length, stop_event)
+        if body is None:
+            return None
+        return msg_type, body
+
+    def iter_buffered_frames(self) -> Iterator[Tuple[int, memoryview]]:
+        """The complete v2 frames already in the buffer (no syscall); see iter_buffered."""
+        while self._end - self._start >= FRAME_HEADER.size:
+            cookie, marker, msg_type, length = FRAME_HEADER.unpack_from(self._buf, self._start)
+            if cookie != MAGIC_COOKIE or not marker & FRAME_FLAG:
+                return  # garbled: leave it for read_frame to reject
+            if self._end - self._start < FRAME_HEADER.size + length:
+                return
+            body = self._view[self._start + FRAME_HEADER.size:self._start + FRAME_HEADER.size + length]
+            self._advance(FRAME_HEADER.size + length)
+            yield msg_type, body
+
+    def iter_buffered(self, layout: struct.Struct) -> Iterator[tuple]:
+        """Decode the complete messages already in the buffer (no syscall).
+
+        Messages are consumed as they are yielded; stopping early leaves the rest buffered.
+        """
+        while self._end - self._start >= layout.size:
+            fields = layout.unpack_from(self._buf, self._start)
+            self._advance(layout.size)
+            yield fields
+
+    def _advance(self, n: int) -> None:
+        self._start += n
+        if self._start == self._end:
+            # Empty: rewind so the next recv_into gets the whole buffer.
+            self._start = self._end = 0
+
+
+class Wire:
+    """Message encoding for one negotiated protocol version (WIRE_V1 / WIRE_V2).
+
+    Decoded messages have the v1 shape (cookie, type, *fields) in both versions, so the
+    game code does not care which one the peer speaks.
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self.framed = version >= PROTO_V2
+        self.max_rounds = V2_MAX_ROUNDS if self.framed else V1_MAX_ROUNDS
+        self._payloads = SERVER_PAYLOADS_V2 if self.framed else SERVER_PAYLOADS
+
+    # ---- encoders ----
+
+    def request(self, rounds: int, client_name: str, msg_type: int = MSG_REQUEST, flags: int = 0) -> bytes:
+        """The session request; `flags` (FLAG_*) need v2 and are dropped in v1."""
+        if self.framed:
+            return frame(msg_type, REQUEST_BODY.pack(rounds, pad_name(client_name), flags), self.version)
+        return REQUEST_STRUCT.pack(MAGIC_COOKIE, msg_type, rounds, pad_name(client_name))
+
+    def welcome(self, flags: int = 0, token: bytes = NO_TOKEN) -> bytes:
+        return frame(MSG_WELCOME, WELCOME_BODY.pack(self.version, flags, token), self.version)
+
+    def resume(self, token: bytes) -> bytes:
+        """MSG_RESUME frame (v2 only)."""
+        return frame(MSG_RESUME, RESUME_BODY.pack(token), self.version)
+
+    def busy(self) -> bytes:
+        """MSG_BUSY frame (v2 only)."""
+        return frame(MSG_BUSY, b"", self.version)
+
+    def round_state(self, round_idx: int, cards: List[Card]) -> bytes:
+        """MSG_ROUND_STATE frame (v2 only): player's cards, then the dealer's upcard."""
+        return frame(MSG_ROUND_STATE, ROUND_STATE_HEAD.pack(round_idx) + bytes(c.id for c in cards), self.version)
+
+    def dealer_transcript(self, result: int, cards: List[Card]) -> bytes:
+        """MSG_DEALER_TRANSCRIPT frame (v2 only)."""
+        return frame(MSG_DEALER_TRANSCRIPT, bytes([result, *(c.id for c in cards)]), self.version)
+
+    def decision(self, decision: str) -> bytes:
+        raw = decision.encode("utf-8")
+        if self.framed:
+            return frame(MSG_PAYLOAD, DECISION_BODY.pack(raw), self.version)
+        return CLIENT_PAYLOAD_STRUCT.pack(MAGIC_COOKIE, MSG_PAYLOAD, raw)
+
+    def decision_table(self, should_hit: Callable[[int, bool, int], bool]) -> bytes:
+        masks = decision_table_masks(should_hit)
+        if self.framed:
+            return frame(MSG_DECISION_TABLE, DECISION_TABLE_BODY.pack(*masks), self.version)
+        return DECISION_TABLE_STRUCT.pack(MAGIC_COOKIE, MSG_DECISION_TABLE, *masks)
+
+    def server_payload(self, result: int, card: Optional[Card]) -> bytes:
+        return self._payloads[result][NO_CARD_ID if card is None else card.id]
+
+    def round_result(self, result: int, player_total: int, dealer_total: int) -> bytes:
+        if self.framed:
+            return frame(MSG_ROUND_RESULT, ROUND_RESULT_BODY.pack(result, player_total, dealer_total), self.version)
+        return ROUND_RESULT_STRUCT.pack(MAGIC_COOKIE, MSG_ROUND_RESULT, result, player_total, dealer_total)
+
+    # ---- decoders ----
+
+    def decode_frame(self, msg_type: int, body, layout: struct.Struct, types: Tuple[int, ...]) -> Optional[tuple]:
+        """v1-shaped fields of a v2 frame, or None if it is not one of `types` (skip it).
+
+        Bodies may differ in length from `layout`: fields appended by a newer peer are
+        ignored, and fields an older peer does not send yet read as 0.
+        """
+        if msg_type not in types:
+            return None
+        if len(body) < layout.size:
+            body = bytes(body) + bytes(layout.size - len(body))
+        return (MAGIC_COOKIE, msg_type) + layout.unpack_from(body)
+
+    def read_body(self, reader: FramedReader, types: Tuple[int, ...], stop_event=None) -> Optional[Tuple[int, bytes]]:
+        """(type, raw body) of the next v2 frame of one of `types`, for variable-length messages."""
+        while True:
+            got = reader.read_frame(stop_event=stop_event)
+            if got is None:
+                return None
+            if got[0] in types:
+                return got[0], bytes(got[1])
+
+    def read(
+        self,
+        reader: FramedReader,
+        v1_layout: struct.Struct,
+        body: struct.Struct,
+        types: Tuple[int, ...],
+        stop_event=None,
+    ) -> Optional[tuple]:
+        """Next message of one of `types`; None if the connection closes (or is garbled)."""
+        if not self.framed:
+            return reader.read_struct(v1_layout, stop_event=stop_event)
+        while True:
+            got = reader.read_frame(stop_event=stop_event)
+            if got is None:
+                return None
+            fields = self.decode_frame(got[0], got[1], body, types)
+            if fields is not None:
+                return fields
+
+    def iter_buffered(
+        self, reader: FramedReader, v1_layout: struct.Struct, body: struct.Struct, types: Tuple[int, ...]
+    ) -> Iterator[tuple]:
+        """Like FramedReader.iter_buffered, for either version."""
+        if not self.framed:
+            yield from reader.iter_buffered(v1_layout)
+            return
+        for msg_type, view in reader.iter_buffered_frames():
+            fields = self.decode_frame(msg_type, view, body, types)
+            if fields is not None:
+                yield fields
+
+
+WIRE_V1 = Wire(PROTO_V1)
+WIRE_V2 = Wire(PROTO_V2)
+
+
+def decode_round_state(body: bytes) -> Optional[Tuple[int, List[Card]]]:
+    """(round index, cards) from a MSG_ROUND_STATE body; None if malformed."""
+    if len(body) < ROUND_STATE_HEAD.size or any(i >= len(CARDS) for i in body[ROUND_STATE_HEAD.size:]):
+        return None
+    (round_idx,) = ROUND_STATE_HEAD.unpack_from(body)
+    return round_idx, [CARDS[i] for i in body[ROUND_STATE_HEAD.size:]]
+
+
+def decode_dealer_transcript(body: bytes) -> Optional[Tuple[int, List[Card]]]:
+    """(result, dealer cards) from a MSG_DEALER_TRANSCRIPT body; None if malformed."""
+    if not body or any(i >= len(CARDS) for i in body[1:]):
+        return None
+    return body[0], [CARDS[i] for i in body[1:]]
+
+
+def wire_for(marker: int) -> Optional[Wire]:
+    """Wire for the byte after the cookie of a connection's first message (None = unknown)."""
+    if not marker & FRAME_FLAG:
+        return WIRE_V1
+    # A newer peer is answered in our newest version; the welcome tells it which one.
+    return WIRE_V2 if marker & ~FRAME_FLAG >= PROTO_V2 else None
+
+
+class OutputBatcher:
+    """Per-connection write buffer for small server messages.
+
+    Messages are queued with add() and sent by flush() in one sendmsg (writev) call, so a
+    burst like the initial deal goes out as one segment instead of three. Callers flush at
+    decision points: before waiting for the peer and when a round ends.
+
+    `messages` and `syscalls` count what was queued vs. how many send calls it took.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._pending: List[bytes] = []
+        self.messages = 0
+        self.syscalls = 0
+
+    def add(self, msg: bytes) -> None:
+        self._pending.append(msg)
+        self.messages += 1
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        data, self._pending = self._pending, []
+        if not hasattr(self.sock, "sendmsg"):
+            # No scatter/gather send on this platform (Windows): join and send once.
+            self.sock.sendall(b"".join(data))
+            self.syscalls += 1
+            return
+        sent = self.sock.sendmsg(data)
+        self.syscalls += 1
+        total = sum(len(m) for m in data)
+        if sent < total:
+            # Short write (full socket buffer): push the rest the simple way.
+            self.sock.sendall(b"".join(data)[sent:])
+            self.syscalls += 1
+
+    @property
+    def syscalls_saved(self) -> int:
+        return self.messages - self.syscalls
+
+
 def card_to_wire(card: Card) -> Tuple[int, int]:
     """Convert Card(value,suit) -> (rank_1_13, suit_0_3)."""
-    val = card.value
-    if val == "A":
-        rank = 1
-    elif val == "J":
-        rank = 11
-    elif val == "Q":
-        rank = 12
-    elif val == "K":
-        rank = 13
-    else:
-        rank = int(val)
-    suit_code = SUIT_TO_CODE.get(card.suit, 0)
-    return rank, suit_code
+    return card.rank, card.id // len(VALUES)
 
 
 def card_from_wire(rank: int, suit_code: int) -> Optional[Card]:
     """Convert (rank,suit) from the network into a Card object. Returns None for 0/0."""
     if rank == 0:
         return None
-    suit = CODE_TO_SUIT.get(suit_code, "Hearts")
-    if rank == 1:
-        value = "A"
-    elif rank == 11:
-        value = "J"
-    elif rank == 12:
-        value = "Q"
-    elif rank == 13:
-        value = "K"
-    else:
-        value = str(rank)
-    return Card(value, suit)
+    return Card.from_wire(rank, suit_code)
 
 
 def card_text(card: Card) -> str:
@@ -158,4 +722,41 @@ def print_game_state(player_name: Optional[str], player_hand: Hand, dealer_hand:
 class Offer:
     server_ip: str
     server_port: int
-    server_name: str
\ No newline at end of file
+    server_name: str
+    load: Optional[OfferLoad] = None  # None = the server sends no load (older servers)
+    offer_port: int = 0  # UDP port the offers come from, which answers MSG_PING; 0 = unknown
+
+
+@dataclass
+class OfferLoad:
+    active: int             # connections being served or waiting for a slot
+    capacity: int           # served at once (--max-clients, summed over --workers); 0 = no limit
+    p99_queue_wait: float   # recent p99 time a connection spent in the admission queue, seconds
+
+    @property
+    def full(self) -> bool:
+        return 0 < self.capacity <= self.active
+
+
+def pack_offer(tcp_port: int, server_name: str, load: Optional[OfferLoad] = None) -> bytes:
+    payload = OFFER_STRUCT.pack(MAGIC_COOKIE, MSG_OFFER, tcp_port, pad_name(server_name))
+    if load is None:
+        return payload
+    p99_us = min(0xFFFFFFFF, int(load.p99_queue_wait * 1e6))
+    return payload + OFFER_LOAD_STRUCT.pack(min(load.active, 0xFFFFFFFF), min(load.capacity, 0xFFFFFFFF), p99_us)
+
+
+def unpack_offer(data: bytes, server_ip: str, offer_port: int = 0) -> Optional[Offer]:
+    """Decode an offer datagram (load included when present); None if it is not an offer."""
+    if len(data) < OFFER_STRUCT.size:
+        return None
+    cookie, msg_type, tcp_port, name_raw = OFFER_STRUCT.unpack_from(data)
+    if cookie != MAGIC_COOKIE or msg_type != MSG_OFFER:
+        return None
+    load = None
+    if len(data) >= OFFER_STRUCT.size + OFFER_LOAD_STRUCT.size:
+        active, capacity, p99_us = OFFER_LOAD_STRUCT.unpack_from(data, OFFER_STRUCT.size)
+        load = OfferLoad(active, capacity, p99_us / 1e6)
+    return Offer(
+        server_ip=server_ip, server_port=tcp_port, server_name=decode_name(name_raw), load=load, offer_port=offer_port
+    )
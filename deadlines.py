@@ -0,0 +1,128 @@
+"""deadlines.py
+
+- Per-connection phase deadlines: the request (`--request-timeout`), each decision
+  (`--decision-timeout`) and the whole session (`--session-timeout`).
+- Heartbeats (`--heartbeat`): TCP keepalive probes, so a vanished peer fails the next read.
+- A connection past a deadline is reaped: closed, its session parked, counted in ReapStats.
+"""
+
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_REQUEST_TIMEOUT_SEC = 10.0
+DEFAULT_DECISION_TIMEOUT_SEC = 300.0
+DEFAULT_SESSION_TIMEOUT_SEC = 0.0  # no limit
+DEFAULT_HEARTBEAT_SEC = 0.0        # off
+# Unanswered keepalive probes before the kernel gives the peer up.
+HEARTBEAT_PROBES = 3
+
+# Reap reasons (PhaseDeadlines.expired, ReapStats)
+REAP_REQUEST = "request timeout"
+REAP_DECISION = "decision timeout"
+REAP_SESSION = "session timeout"
+REAP_DEAD_PEER = "dead peer"
+REAP_REASONS = (REAP_REQUEST, REAP_DECISION, REAP_SESSION, REAP_DEAD_PEER)
+
+
+def _after(seconds: float, now: float) -> Optional[float]:
+    return now + seconds if seconds > 0 else None
+
+
+def enable_heartbeat(sock, interval: float) -> None:
+    """Probe a quiet connection every `interval` s; HEARTBEAT_PROBES unanswered ones fail it."""
+    if interval <= 0:
+        return
+    secs = max(1, int(interval))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in (
+        ("TCP_KEEPIDLE", secs),
+        ("TCP_KEEPINTVL", secs),
+        ("TCP_KEEPCNT", HEARTBEAT_PROBES),
+        ("TCP_USER_TIMEOUT", secs * (HEARTBEAT_PROBES + 1) * 1000),
+    ):
+        opt = getattr(socket, name, None)
+        if opt is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, opt, value)
+            except OSError:
+                pass
+
+
+class PhaseDeadlines:
+    """The deadline of one connection's current phase (`at`, time.monotonic(); None = no limit).
+
+    A read past `at` calls expire(), which sets `expired` to the reap reason. Timeouts of 0 = off.
+    """
+
+    __slots__ = ("request_timeout", "decision_timeout", "session_timeout", "at", "reason", "expired", "_session_end")
+
+    def __init__(self, request_timeout: float = 0.0, decision_timeout: float = 0.0, session_timeout: float = 0.0):
+        self.request_timeout = request_timeout
+        self.decision_timeout = decision_timeout
+        self.session_timeout = session_timeout
+        self.at: Optional[float] = None
+        self.reason = ""
+        self.expired = ""  # reap reason; "" = not reaped
+        self._session_end: Optional[float] = None
+
+    def request(self) -> None:
+        """Waiting for a request (or MSG_RESUME)."""
+        self._session_end = None
+        self.at, self.reason = _after(self.request_timeout, time.monotonic()), REAP_REQUEST
+
+    def start_session(self) -> None:
+        """The request is in: the session clock starts."""
+        self._session_end = _after(self.session_timeout, time.monotonic())
+        self.at, self.reason = self._session_end, REAP_SESSION
+
+    def decision(self) -> None:
+        """Waiting for a player decision: its own deadline, capped by the session's."""
+        at = _after(self.decision_timeout, time.monotonic())
+        if self._session_end is not None and (at is None or self._session_end <= at):
+            self.at, self.reason = self._session_end, REAP_SESSION
+        else:
+            self.at, self.reason = at, REAP_DECISION
+
+    def idle(self) -> None:
+        """Between sessions: the keep-alive idle timeout applies instead."""
+        self._session_end = None
+        self.at, self.reason = None, ""
+
+    def left(self) -> Optional[float]:
+        """Seconds until the current deadline (0 once past); None = no limit."""
+        return None if self.at is None else max(0.0, self.at - time.monotonic())
+
+    def check(self) -> bool:
+        """False (and expired) once the current deadline has passed; for work without reads."""
+        if self.at is not None and time.monotonic() >= self.at:
+            self.expire()
+            return False
+        return True
+
+    def expire(self, reason: str = "") -> None:
+        self.expired = reason or self.reason
+
+
+class ReapStats:
+    """Reaped connections by reason."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = dict.fromkeys(REAP_REASONS, 0)
+
+    def count(self, reason: str) -> None:
+        with self._lock:
+            self.counts[reason] = self.counts.get(reason, 0) + 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def describe(self) -> str:
+        with self._lock:
+            parts = ", ".join(f"{n} {reason}" for reason, n in self.counts.items())
+        return f"reaped connections: {parts}"
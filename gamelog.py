@@ -0,0 +1,190 @@
+"""gamelog.py
+
+- Non-blocking server output: handlers enqueue event tuples, one writer thread formats and
+  writes them in batches.
+- Verbosity: full (every state change), summary (one line per round), off (no game output).
+- `sample_rate` logs only that fraction of rounds; events that find the queue full are dropped.
+"""
+
+from __future__ import annotations
+
+import queue
+import random
+import sys
+import threading
+from typing import List, Optional, TextIO
+
+from blackjack import Hand, RESULT_LOSS, RESULT_TIE, RESULT_WIN
+from common import format_state
+
+VERBOSITY_FULL = "full"
+VERBOSITY_SUMMARY = "summary"
+VERBOSITY_OFF = "off"
+VERBOSITY_LEVELS = (VERBOSITY_FULL, VERBOSITY_SUMMARY, VERBOSITY_OFF)
+
+DEFAULT_QUEUE_SIZE = 10000
+# Max events formatted into a single write by the writer thread.
+WRITE_BATCH = 256
+
+# Event kinds (first element of each queued tuple)
+EVT_INFO = 0        # (kind, text) - pre-formatted; used for rare lines only
+EVT_REGISTERED = 1  # (kind, peer, client_name, rounds)
+EVT_FINISHED = 2    # (kind, peer, rounds played, payloads, sends, kept) - payloads/sends may be None
+EVT_DISCONNECTED = 3  # (kind, peer)
+EVT_STATE = 4       # (kind, player_name, round_idx, rounds_total, player_cards, dealer_cards, hide_dealer)
+EVT_ROUND_END = 5   # (kind, player_name, round_idx, rounds_total, player_cards, dealer_cards, result)
+EVT_RESUMED = 6     # (kind, peer, client_name, round_idx)
+EVT_REAPED = 7      # (kind, peer, reason) - see deadlines.py
+EVT_THROTTLED = 8   # (kind, peer, reason) - see ratelimit.py
+
+_RESULT_TEXT = {RESULT_WIN: "WIN", RESULT_LOSS: "LOSS", RESULT_TIE: "TIE"}
+
+
+def _round_text(round_idx: int, rounds_total: int) -> str:
+    # rounds_total 0 = unlimited session (protocol v2)
+    return f"{round_idx}/{rounds_total}" if rounds_total else str(round_idx)
+
+
+def _format_event(evt: tuple) -> str:
+    kind = evt[0]
+    if kind == EVT_STATE:
+        _, name, round_idx, rounds_total, p_cards, d_cards, hide_dealer = evt
+        return (
+            f"========= {name} | Round {_round_text(round_idx, rounds_total)} =========\n"
+            f"{format_state(Hand(p_cards), Hand(d_cards), hide_dealer)}\n"
+            "=======================\n"
+        )
+    if kind == EVT_ROUND_END:
+        _, name, round_idx, rounds_total, p_cards, d_cards, result = evt
+        return (
+            f"[{name}] Round {_round_text(round_idx, rounds_total)}: player {Hand(p_cards).calculate_value()} "
+            f"vs dealer {Hand(d_cards).calculate_value()} -> {_RESULT_TEXT.get(result, '?')}\n"
+        )
+    if kind == EVT_REGISTERED:
+        _, peer, client_name, rounds = evt
+        return f"[{peer}] Client '{client_name}' registered for {rounds or 'unlimited'} rounds\n"
+    if kind == EVT_FINISHED:
+        _, peer, rounds, payloads, sends, kept = evt
+        # kept = keep-alive session: the connection stays open for the next request
+        action = "keeping the connection open" if kept else "closing"
+        if payloads is None or rounds <= 0:
+            return f"[{peer}] Finished; {action}\n"
+        return (
+            f"[{peer}] Finished; {action} ({payloads} payloads in {sends} sends, "
+            f"{(payloads - sends) / rounds:.1f} syscalls saved per round)\n"
+        )
+    if kind == EVT_RESUMED:
+        _, peer, client_name, round_idx = evt
+        return f"[{peer}] Client '{client_name}' resumed its session at round {round_idx}\n"
+    if kind == EVT_DISCONNECTED:
+        return f"[{evt[1]}] Client disconnected\n"
+    if kind == EVT_REAPED:
+        return f"[{evt[1]}] Connection reaped ({evt[2]})\n"
+    if kind == EVT_THROTTLED:
+        return f"[{evt[1]}] Connection throttled ({evt[2]})\n"
+    return f"{evt[1]}\n"
+
+
+class GameLog:
+    def __init__(
+        self,
+        verbosity: str = VERBOSITY_FULL,
+        sample_rate: float = 1.0,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        stream: Optional[TextIO] = None,
+    ):
+        self.configure(verbosity, sample_rate, queue_size)
+        self._stream = stream
+        self._rng = random.Random()
+        self._thread: Optional[threading.Thread] = None
+        self._drop_lock = threading.Lock()
+        self.dropped = 0
+
+    def configure(self, verbosity: str, sample_rate: float = 1.0, queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        """Change settings; only valid while the writer thread is not running."""
+        if verbosity not in VERBOSITY_LEVELS:
+            raise ValueError(f"Invalid verbosity: {verbosity}")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be within 0..1, got {sample_rate}")
+        self.verbosity = verbosity
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+
+    # ---- producer side (client threads / event loop) ----
+
+    def round_sampled(self) -> bool:
+        """Decide once per round whether its game events are logged."""
+        if self.verbosity == VERBOSITY_OFF:
+            return False
+        return self.sample_rate >= 1.0 or self._rng.random() < self.sample_rate
+
+    def state(self, player_name: str, round_idx: int, rounds_total: int, player_hand: Hand, dealer_hand: Hand, hide_dealer: bool) -> None:
+        if self.verbosity == VERBOSITY_FULL:
+            self._put((EVT_STATE, player_name, round_idx, rounds_total,
+                       tuple(player_hand.cards), tuple(dealer_hand.cards), hide_dealer))
+
+    def round_end(self, player_name: str, round_idx: int, rounds_total: int, player_hand: Hand, dealer_hand: Hand, result: int) -> None:
+        if self.verbosity == VERBOSITY_SUMMARY:
+            self._put((EVT_ROUND_END, player_name, round_idx, rounds_total,
+                       tuple(player_hand.cards), tuple(dealer_hand.cards), result))
+
+    def event(self, *evt) -> None:
+        """Enqueue one of the EVT_REGISTERED / EVT_FINISHED / EVT_DISCONNECTED / EVT_RESUMED /
+        EVT_REAPED / EVT_THROTTLED / EVT_INFO tuples."""
+        self._put(evt)
+
+    def _put(self, evt: tuple) -> None:
+        if self._thread is None:
+            # Writer not running (e.g. library use): write synchronously.
+            self._write([evt])
+            return
+        try:
+            self._queue.put_nowait(evt)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+    # ---- writer side ----
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="gamelog-writer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Write out everything queued so far and stop the writer thread."""
+        th = self._thread
+        if th is None:
+            return
+        self._queue.put(None)
+        th.join()
+        self._thread = None
+        if self.dropped:
+            self._write([(EVT_INFO, f"(game log dropped {self.dropped} events: queue full)")])
+
+    def _run(self) -> None:
+        while True:
+            evt = self._queue.get()
+            batch: List[tuple] = []
+            while evt is not None:
+                batch.append(evt)
+                if len(batch) >= WRITE_BATCH:
+                    break
+                try:
+                    evt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if evt is None:
+                return
+
+    def _write(self, batch: List[tuple]) -> None:
+        stream = self._stream or sys.stdout
+        try:
+            stream.write("".join(_format_event(evt) for evt in batch))
+            stream.flush()
+        except (OSError, ValueError):
+            # stdout closed (e.g. piped into a process that exited); nothing useful to do.
+            pass
@@ -0,0 +1,268 @@
+"""handoff.py
+
+Zero-downtime restarts: the running server hands its listening socket to a freshly started
+copy of itself, drains its own sessions and exits.
+
+- On SIGUSR2 the server starts `sys.executable` with its own command line (so a new build on
+  disk is picked up), connected to it by a Unix socketpair, and passes it the listening
+  socket with SCM_RIGHTS. Connections keep queueing on the shared socket meanwhile: there
+  is no accept gap.
+- Once the new process reports it is accepting, the old one stops accepting and passes it
+  idle keep-alive connections (SCM_RIGHTS again) and its parked resumable sessions (as
+  checkpoint records), including those dropped while it drains.
+- Active sessions finish in the old process (up to `--drain-timeout` seconds), which then
+  exits. With --checkpoint, it ends its checkpoints and releases the file first.
+- If the new process fails to start or is not ready in time, the old one keeps serving.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from checkpoint import decode_session, encode_session
+from sessions import Session, SessionTable
+from shuffle import ShoeFactory
+
+HANDOFF_SIGNAL = getattr(signal, "SIGUSR2", None)
+# Environment variable telling a new server process which fd is its handoff channel.
+HANDOFF_FD_ENV = "HOUSE_HANDOFF_FD"
+# How long the new process may take to start accepting (loading the strategy cache etc.).
+HANDOFF_READY_TIMEOUT_SEC = 60.0
+# How long the old process lets its active sessions finish (0 = no limit).
+DEFAULT_DRAIN_TIMEOUT_SEC = 600.0
+
+# Channel messages: CHANNEL_HEAD (kind, body length), then the body; fds ride on the header.
+KIND_LISTENER = 1     # old -> new, with the listening socket
+KIND_READY = 2        # new -> old: accepting connections
+KIND_CONNECTION = 3   # old -> new, with an idle keep-alive connection
+KIND_SESSION = 4      # old -> new: a parked session (checkpoint.encode_session)
+KIND_CHECKPOINTS = 5  # old -> new: the checkpoint file is released
+KIND_DONE = 6         # old -> new: drained, exiting
+
+CHANNEL_HEAD = struct.Struct("!BI")
+
+
+def handoff_supported() -> bool:
+    return HANDOFF_SIGNAL is not None and hasattr(socket, "send_fds")
+
+
+def _send(chan: socket.socket, kind: int, body: bytes = b"", fds: Sequence[int] = ()) -> None:
+    data = CHANNEL_HEAD.pack(kind, len(body)) + body
+    if fds:
+        # Messages with fds have no body: one sendmsg takes the whole header.
+        socket.send_fds(chan, [data], list(fds))
+    else:
+        chan.sendall(data)
+
+
+def _recv_exact(chan: socket.socket, data: bytes, n: int) -> Optional[bytes]:
+    while len(data) < n:
+        chunk = chan.recv(n - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _recv(chan: socket.socket) -> Optional[Tuple[int, bytes, List[int]]]:
+    """Next (kind, body, fds) on the channel; None once the other process has closed it."""
+    head, fds, _, _ = socket.recv_fds(chan, CHANNEL_HEAD.size, 4)
+    head = _recv_exact(chan, head, CHANNEL_HEAD.size) if head else None
+    if head is None:
+        for fd in fds:
+            os.close(fd)
+        return None
+    kind, length = CHANNEL_HEAD.unpack(head)
+    body = _recv_exact(chan, b"", length)
+    return (kind, body, fds) if body is not None else None
+
+
+class Handoff:
+    """Old-process side: starts the new server and passes it the listener, idle connections
+    and parked sessions.
+
+    `draining` is set once the new process accepts: the accept loop and keep-alive waits
+    of this one watch it.
+    """
+
+    def __init__(self, draining: threading.Event):
+        self.draining = draining
+        self.pid = 0
+        self._chan: Optional[socket.socket] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._starting = False
+        self.connections = 0
+        self.sessions = 0
+
+    @property
+    def active(self) -> bool:
+        """The new process has taken over; this one is draining."""
+        return self._chan is not None
+
+    def start(self, listener: socket.socket) -> bool:
+        """Start the new process and hand it `listener`; True once it accepts connections."""
+        with self._lock:
+            if self._starting or self.draining.is_set():
+                return False
+            self._starting = True
+        ours, theirs = socket.socketpair()
+        try:
+            env = dict(os.environ, **{HANDOFF_FD_ENV: str(theirs.fileno())})
+            proc = subprocess.Popen([sys.executable, *sys.argv], env=env, pass_fds=(theirs.fileno(),))
+        except OSError:
+            ours.close()
+            self._starting = False
+            return False
+        finally:
+            theirs.close()
+
+        try:
+            _send(ours, KIND_LISTENER, fds=(listener.fileno(),))
+            ours.settimeout(HANDOFF_READY_TIMEOUT_SEC)
+            msg = _recv(ours)
+            ready = msg is not None and msg[0] == KIND_READY
+        except OSError:
+            ready = False
+        if not ready:
+            ours.close()
+            proc.kill()
+            proc.wait()
+            self._starting = False
+            return False
+
+        ours.settimeout(None)
+        self._proc, self.pid = proc, proc.pid
+        self._chan = ours
+        self.draining.set()
+        return True
+
+    def _send(self, kind: int, body: bytes = b"", fds: Sequence[int] = ()) -> bool:
+        with self._lock:
+            if self._chan is None:
+                return False
+            try:
+                _send(self._chan, kind, body, fds)
+            except OSError:
+                return False
+            if kind == KIND_CONNECTION:
+                self.connections += 1
+            elif kind == KIND_SESSION:
+                self.sessions += 1
+            return True
+
+    def send_connection(self, conn) -> bool:
+        """Pass an idle keep-alive connection over (the caller then closes its own copy)."""
+        return self._send(KIND_CONNECTION, fds=(conn.fileno(),))
+
+    def send_session(self, session: Session) -> None:
+        """Pass a parked resumable session over (SessionTable.forward)."""
+        self._send(KIND_SESSION, encode_session(session))
+
+    def release(self, sessions: SessionTable) -> None:
+        """Forward parked sessions from now on and hand the checkpoint file over."""
+        sessions.forward(self.send_session)
+        if sessions.checkpoints is not None:
+            sessions.checkpoints.release()
+        self._send(KIND_CHECKPOINTS)
+
+    def close(self) -> None:
+        """Drained: tell the new process and close the channel."""
+        self._send(KIND_DONE)
+        with self._lock:
+            chan, self._chan = self._chan, None
+        if chan is not None:
+            chan.close()
+
+    def describe(self) -> str:
+        """One-line handoff summary."""
+        return (
+            f"handoff: {self.connections} idle connections and {self.sessions} parked sessions "
+            f"passed to pid {self.pid}"
+        )
+
+
+class Takeover:
+    """New-process side of a handoff (started by Handoff.start)."""
+
+    def __init__(self, chan: socket.socket):
+        self._chan = chan
+        self.pid = os.getppid()
+        self.connections = 0
+        self.sessions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["Takeover"]:
+        """The handoff channel if this process was started by Handoff.start, else None."""
+        fd = os.environ.pop(HANDOFF_FD_ENV, None)
+        if fd is None or not handoff_supported():
+            return None
+        return cls(socket.socket(fileno=int(fd)))
+
+    def listener(self) -> socket.socket:
+        """The listening socket of the old process (first message on the channel)."""
+        msg = _recv(self._chan)
+        if msg is None or msg[0] != KIND_LISTENER or len(msg[2]) != 1:
+            raise ConnectionError("handoff: the old server process sent no listening socket")
+        return socket.socket(fileno=msg[2][0])
+
+    def ready(
+        self,
+        shoes: ShoeFactory,
+        sessions: SessionTable,
+        on_connection: Callable[[socket.socket], None],
+        log: Callable[[str], None],
+    ) -> None:
+        """Tell the old process this one accepts, then take over what it passes (in a thread)."""
+        _send(self._chan, KIND_READY)
+        th = threading.Thread(
+            target=self._run, args=(shoes, sessions, on_connection, log), name="handoff-receiver", daemon=True
+        )
+        th.start()
+
+    def _run(
+        self,
+        shoes: ShoeFactory,
+        sessions: SessionTable,
+        on_connection: Callable[[socket.socket], None],
+        log: Callable[[str], None],
+    ) -> None:
+        released = False
+        try:
+            while True:
+                msg = _recv(self._chan)
+                if msg is None or msg[0] == KIND_DONE:
+                    break
+                kind, body, fds = msg
+                if kind == KIND_CONNECTION and fds:
+                    on_connection(socket.socket(fileno=fds.pop(0)))
+                    self.connections += 1
+                elif kind == KIND_SESSION:
+                    session = decode_session(body, shoes)
+                    if session is not None:
+                        sessions.adopt(session)
+                        self.sessions += 1
+                elif kind == KIND_CHECKPOINTS:
+                    released = True
+                    if sessions.checkpoints is not None:
+                        sessions.checkpoints.start()
+                for fd in fds:
+                    os.close(fd)
+        except OSError:
+            pass
+        finally:
+            self._chan.close()
+            # The old process is gone either way: the checkpoint file is ours now.
+            if not released and sessions.checkpoints is not None:
+                sessions.checkpoints.start()
+        log(
+            f"Took over {self.connections} idle connections and {self.sessions} parked sessions "
+            f"from pid {self.pid}"
+        )
@@ -0,0 +1,125 @@
+"""ratelimit.py
+
+- Per-IP token buckets: `--conn-rate` connections and `--decision-rate` decisions (and
+  session requests) per second, with a burst of BURST_SEC seconds' worth.
+- At most `--rate-peers` buckets per limit (LRU); an evicted peer starts over with a full one.
+- Over the connection rate: refused in the accept loop with MSG_BUSY. Over the decision
+  rate: closed (Throttled), its session parked as on any drop.
+- Limits are per server process (`--workers N` allows up to N times the rate).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_CONN_RATE = 0.0      # per second and IP; 0 = no limit
+DEFAULT_DECISION_RATE = 0.0  # per second and IP; 0 = no limit
+DEFAULT_RATE_PEERS = 65536   # buckets kept per limit
+# A bucket holds this many seconds' worth of tokens (at least one): the burst allowed.
+BURST_SEC = 2.0
+
+LIMIT_CONNECTIONS = "connections"
+LIMIT_DECISIONS = "decisions"
+
+
+class Throttled(ConnectionError):
+    """The peer went over its decision rate; the connection is closed."""
+
+
+class _Bucket:
+    __slots__ = ("tokens", "stamp", "throttled")
+
+    def __init__(self, tokens: float, stamp: float):
+        self.tokens = tokens
+        self.stamp = stamp
+        self.throttled = False  # refused since it last had a token
+
+
+class RateLimiter:
+    """Token buckets of `rate` tokens per second per IP, at most `capacity` of them (LRU)."""
+
+    def __init__(self, what: str, rate: float, capacity: int = DEFAULT_RATE_PEERS):
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"rate and capacity must be positive, got {rate} and {capacity}")
+        self.what = what
+        self.rate = rate
+        self.burst = max(1.0, rate * BURST_SEC)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self.refused = 0
+        self.throttled_peers = 0  # peers that ran dry (again after slowing down)
+
+    def allow(self, ip: str) -> bool:
+        """Take a token from `ip`'s bucket; False if it is empty (the peer is over the rate)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(ip)
+            if bucket is None:
+                bucket = self._buckets[ip] = _Bucket(self.burst, now)
+                if len(self._buckets) > self.capacity:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(ip)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.stamp) * self.rate)
+                bucket.stamp = now
+            if bucket.tokens >= 1.0:
+                bucket.tokens -= 1.0
+                bucket.throttled = False
+                return True
+            self.refused += 1
+            if not bucket.throttled:
+                bucket.throttled = True
+                self.throttled_peers += 1
+            return False
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def describe(self) -> str:
+        return (
+            f"{self.refused} {self.what} over {self.rate:g}/s refused "
+            f"({self.throttled_peers} throttling episodes, {len(self)} peers tracked)"
+        )
+
+
+class PeerQuota:
+    """One connection's view of the decision limit (no limit by default)."""
+
+    __slots__ = ("_limiter", "_ip")
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, ip: str = ""):
+        self._limiter = limiter
+        self._ip = ip
+
+    def decision(self) -> None:
+        """Charge a decision or session request; raises Throttled over the rate."""
+        if self._limiter is not None and not self._limiter.allow(self._ip):
+            raise Throttled(f"over {self._limiter.rate:g} {LIMIT_DECISIONS}/s")
+
+
+class PeerLimits:
+    """The server's per-IP limits; a rate of 0 disables the corresponding one."""
+
+    def __init__(self, conn_rate: float = 0.0, decision_rate: float = 0.0, capacity: int = DEFAULT_RATE_PEERS):
+        self.connections = RateLimiter(LIMIT_CONNECTIONS, conn_rate, capacity) if conn_rate > 0 else None
+        self.decisions = RateLimiter(LIMIT_DECISIONS, decision_rate, capacity) if decision_rate > 0 else None
+
+    def connect(self, ip: str) -> bool:
+        """False if `ip` is over its connection rate (refuse the connection)."""
+        return self.connections is None or self.connections.allow(ip)
+
+    def quota(self, ip: str) -> PeerQuota:
+        """The decision quota of a new connection from `ip`."""
+        return PeerQuota(self.decisions, ip)
+
+    @property
+    def refused(self) -> int:
+        return sum(limiter.refused for limiter in (self.connections, self.decisions) if limiter is not None)
+
+    def describe(self) -> str:
+        parts = [limiter.describe() for limiter in (self.connections, self.decisions) if limiter is not None]
+        return "rate limits: " + "; ".join(parts)
@@ -1,24 +1,55 @@
 #!/usr/bin/env python3
 """server.py
 
-- Broadcasts UDP offers once per second.
+- Broadcasts UDP offers once per second, with the server's current load (see common.OfferLoad),
+  and echoes MSG_PING datagrams sent to the offer socket (the client's RTT probe).
 - Accepts TCP connections and plays N rounds per client.
-- Prints game state on every change (per PDF requirement), including the current round.
+- Prints game state on every change (per PDF requirement), including the current round,
+  through the queued writer in gamelog.py (`--log summary|off`, `--log-sample` to reduce it).
 - Ctrl+C shuts down cleanly: prints a single shutdown message, closes sockets, and avoids noisy tracebacks.
+- `--engine asyncio` runs the same game over asyncio streams instead (see async_server.py).
+- `--workers N` runs N server processes on the same port (SO_REUSEPORT) under one supervisor,
+  whose offers carry the workers' combined load (admission.WorkerLoads).
+- Autoplay requests (MSG_REQUEST_AUTOPLAY + a decision table) are played out locally and
+  answered with a stream of per-round results: one round trip per session.
+- Speaks protocol v1 and v2 (common.Wire), chosen per connection by the client's first message.
+- v2 clients may ask for keep-alive (FLAG_KEEP_ALIVE): after the session the connection
+  waits up to `--keepalive-idle` seconds for another request instead of closing.
+- Resumable sessions (FLAG_RESUMABLE, see sessions.py) survive a dropped connection for
+  `--resume-ttl` seconds; the client continues them with MSG_RESUME and its token.
+  With `--checkpoint FILE` they are also checkpointed to disk and recovered on startup.
+- SIGUSR2 restarts the server without downtime (see handoff.py): a new process takes over
+  the listening socket, idle connections and parked sessions; this one drains and exits.
+- Clients are served by a fixed pool of `--max-clients` threads; up to `--admission-queue`
+  more connections wait for one, the rest are turned away with MSG_BUSY (see admission.py).
+- Connections that miss the request, decision or session deadline, or whose peer stops
+  answering heartbeats, are reaped (see deadlines.py).
+- Per-IP token buckets (`--conn-rate`, `--decision-rate`) refuse connections in the accept
+  loop and close connections that play too fast (see ratelimit.py).
 """
 
 from __future__ import annotations
 
 import argparse
+import dataclasses
+import itertools
+import multiprocessing
+import os
 import signal
 import socket
 import threading
+import time
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 
 from blackjack import (
     BlackJackGame,
     Card,
+    Shoe,
+    DEFAULT_PENETRATION,
+    DEFAULT_SHOE_DECKS,
+    MAX_SHOE_DECKS,
+    MIN_SHOE_DECKS,
     RESULT_LOSS,
     RESULT_NOT_OVER,
     RESULT_WIN,
@@ -26,32 +57,150 @@ from blackjack import (
 
 from common import (
     MAGIC_COOKIE,
-    MSG_OFFER,
     MSG_REQUEST,
+    MSG_REQUEST_AUTOPLAY,
     MSG_PAYLOAD,
+    MSG_DECISION_TABLE,
+    MSG_PING,
     UDP_PORT_OFFERS,
     OFFER_INTERVAL_SEC,
-    OFFER_STRUCT,
+    PING_STRUCT,
+    PREAMBLE_STRUCT,
+    RECV_BUFFER_SIZE,
     REQUEST_STRUCT,
+    REQUEST_BODY,
     CLIENT_PAYLOAD_STRUCT,
-    SERVER_PAYLOAD_STRUCT,
+    DECISION_BODY,
+    DECISION_TABLE_STRUCT,
+    DECISION_TABLE_BODY,
+    FLAG_DEALER_TRANSCRIPT,
+    FLAG_KEEP_ALIVE,
+    FLAG_RESUMABLE,
+    MSG_RESUME,
+    RESUME_STRUCT,
+    RESUME_BODY,
+    SUPPORTED_FLAGS,
+    KEEPALIVE_IDLE_SEC,
+    ROUNDS_UNLIMITED,
     SOCKET_TIMEOUT_SEC,
-    pad_name,
+    pack_offer,
     decode_name,
-    recv_exact,
-    card_to_wire,
-    print_game_state,
+    unpack_decision_table,
+    wire_for,
+    FramedReader,
+    OfferLoad,
+    OutputBatcher,
+    SocketWaiter,
+    WakeupEvent,
+    Wire,
 )
+from gamelog import (
+    GameLog,
+    EVT_INFO,
+    EVT_REGISTERED,
+    EVT_FINISHED,
+    EVT_DISCONNECTED,
+    EVT_RESUMED,
+    EVT_REAPED,
+    EVT_THROTTLED,
+    VERBOSITY_FULL,
+    VERBOSITY_LEVELS,
+)
+
+from admission import (
+    DEFAULT_ADMISSION_QUEUE,
+    DEFAULT_ASYNC_MAX_CLIENTS,
+    DEFAULT_MAX_CLIENTS,
+    ClientPool,
+    WorkerLoad,
+    WorkerLoads,
+    reject,
+)
+from checkpoint import DEFAULT_FSYNC_INTERVAL_SEC, Checkpointer
+from deadlines import (
+    DEFAULT_DECISION_TIMEOUT_SEC,
+    DEFAULT_HEARTBEAT_SEC,
+    DEFAULT_REQUEST_TIMEOUT_SEC,
+    DEFAULT_SESSION_TIMEOUT_SEC,
+    REAP_DEAD_PEER,
+    PhaseDeadlines,
+    ReapStats,
+    enable_heartbeat,
+)
+from handoff import DEFAULT_DRAIN_TIMEOUT_SEC, HANDOFF_SIGNAL, Handoff, Takeover, handoff_supported
+from ratelimit import DEFAULT_CONN_RATE, DEFAULT_DECISION_RATE, DEFAULT_RATE_PEERS, PeerLimits, PeerQuota, Throttled
+from sessions import DEFAULT_RESUME_CAPACITY, DEFAULT_RESUME_TTL_SEC, Session, SessionTable
+from shuffle import DEFAULT_POOL_DEPTH, ShoeFactory
+from strategy import load_cached
 
 # Using a TEST-NET address for local IP discovery. UDP 'connect' does not send traffic,
 # but allows us to learn the preferred outbound interface/IP without hard-coding a real server IP.
 IP_PROBE_TARGET = ("192.0.2.1", 80)  # RFC 5737 TEST-NET-1
 
+# Autoplay sessions: ROUND_RESULT messages sent per write (results stream in chunks).
+AUTOPLAY_FLUSH_ROUNDS = 32
+
+# Listen backlog: connect bursts queue in the kernel instead of being dropped.
+LISTEN_BACKLOG = socket.SOMAXCONN
+
+# Shutdown waits at most this long in total for the client threads to exit.
+SHUTDOWN_JOIN_SEC = 1.0
+
+# All per-client output goes through this queue-backed logger (configured by run_server).
+GAME_LOG = GameLog()
+
 
 @dataclass
 class ServerConfig:
     server_name: str = "The House Always ACKs"
     tcp_port: int = 0  # 0 = auto
+    engine: str = "threads"  # "threads" or "asyncio"
+    workers: int = 1  # > 1 = run_supervisor with SO_REUSEPORT workers
+    log_verbosity: str = VERBOSITY_FULL
+    log_sample_rate: float = 1.0
+    # Per-session shoe (see blackjack.Shoe)
+    decks: int = DEFAULT_SHOE_DECKS
+    penetration: float = DEFAULT_PENETRATION
+    # Shuffling (see shuffle.py): seed for reproducible runs, OS CSPRNG, pre-shuffled pool size
+    seed: Optional[int] = None
+    secure_rng: bool = False
+    shuffle_pool: int = DEFAULT_POOL_DEPTH  # 0 = shuffle on the request path
+    # Seconds a keep-alive connection may wait for its next request (0 = no keep-alive)
+    keepalive_idle: float = KEEPALIVE_IDLE_SEC
+    # Resumable sessions (see sessions.py): parked sessions kept, seconds each (0 = off)
+    resume_capacity: int = DEFAULT_RESUME_CAPACITY
+    resume_ttl: float = DEFAULT_RESUME_TTL_SEC
+    # Checkpoint file for resumable sessions (see checkpoint.py; None = no checkpoints)
+    checkpoint_path: Optional[str] = None
+    checkpoint_fsync: float = DEFAULT_FSYNC_INTERVAL_SEC
+    # Seconds active sessions may take to finish after a handoff (0 = no limit)
+    drain_timeout: float = DEFAULT_DRAIN_TIMEOUT_SEC
+    # Admission control (admission.py): sessions at once (None = client_slots()) and queue
+    max_clients: Optional[int] = None
+    admission_queue: int = DEFAULT_ADMISSION_QUEUE
+    # Phase deadlines (see deadlines.py; 0 = no limit) and TCP keepalive heartbeats (0 = off)
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SEC
+    decision_timeout: float = DEFAULT_DECISION_TIMEOUT_SEC
+    session_timeout: float = DEFAULT_SESSION_TIMEOUT_SEC
+    heartbeat: float = DEFAULT_HEARTBEAT_SEC
+    # Per-IP rate limits (see ratelimit.py; 0 = no limit) and the peers tracked for them
+    conn_rate: float = DEFAULT_CONN_RATE
+    decision_rate: float = DEFAULT_DECISION_RATE
+    rate_peers: int = DEFAULT_RATE_PEERS
+
+    def phase_deadlines(self) -> PhaseDeadlines:
+        """Deadlines for one new connection."""
+        return PhaseDeadlines(self.request_timeout, self.decision_timeout, self.session_timeout)
+
+    def client_slots(self) -> int:
+        """Sessions served at once, 0 = no limit (asyncio only)."""
+        if self.max_clients is not None:
+            return self.max_clients
+        return DEFAULT_ASYNC_MAX_CLIENTS if self.engine == "asyncio" else DEFAULT_MAX_CLIENTS
+
+    def peer_limits(self) -> PeerLimits:
+        """The per-IP limits of one server process."""
+        return PeerLimits(self.conn_rate, self.decision_rate, self.rate_peers)
 
 
 def get_local_ip() -> str:
@@ -69,18 +218,29 @@ def get_local_ip() -> str:
             pass
 
 
-def broadcast_offers(stop_evt: threading.Event, server_name: str, tcp_port: int) -> None:
+def broadcast_offers(
+    stop_evt: threading.Event, server_name: str, tcp_port: int, load: Optional[Callable[[], OfferLoad]] = None
+) -> None:
+    # load: called before each offer for its load trailer (common.pack_offer); None = plain offers
     udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     try:
         udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        payload = OFFER_STRUCT.pack(MAGIC_COOKIE, MSG_OFFER, tcp_port, pad_name(server_name))
+        udp.settimeout(SOCKET_TIMEOUT_SEC)  # paces the loop where SocketWaiter cannot poll
+        payload = pack_offer(tcp_port, server_name)
+        waiter = SocketWaiter(udp)
         while not stop_evt.is_set():
+            if load is not None:
+                payload = pack_offer(tcp_port, server_name, load())
             try:
                 udp.sendto(payload, ("<broadcast>", UDP_PORT_OFFERS))
             except OSError:
                 # Socket could be closing during shutdown; ignore.
                 pass
-            stop_evt.wait(OFFER_INTERVAL_SEC)
+            # Between offers, answer pings on the same socket (the port the client saw).
+            deadline = time.monotonic() + OFFER_INTERVAL_SEC
+            while not stop_evt.is_set() and time.monotonic() < deadline:
+                if waiter.wait(stop_evt, deadline):
+                    answer_ping(udp)
     finally:
         try:
             udp.close()
@@ -88,16 +248,69 @@ def broadcast_offers(stop_evt: threading.Event, server_name: str, tcp_port: int)
             pass
 
 
-def send_server_payload(sock: socket.socket, result: int, card: Optional[Card]) -> None:
-    if card is None:
-        rank, suit = 0, 0
+def answer_ping(udp: socket.socket) -> None:
+    """Echo one MSG_PING datagram back to its sender; anything else is dropped."""
+    try:
+        data, addr = udp.recvfrom(RECV_BUFFER_SIZE)
+        if len(data) == PING_STRUCT.size and PING_STRUCT.unpack(data)[:2] == (MAGIC_COOKIE, MSG_PING):
+            udp.sendto(data, addr)
+    except OSError:
+        pass
+
+
+def publish_load(stop_evt: threading.Event, slot: WorkerLoad, load: Callable[[], OfferLoad]) -> None:
+    # --workers: a worker's share of the supervisor's offers, refreshed as often as they go out.
+    while not stop_evt.is_set():
+        slot.publish(load())
+        stop_evt.wait(OFFER_INTERVAL_SEC)
+
+
+class PhaseReader(FramedReader):
+    """FramedReader whose reads give up at the phase deadline, recording the reap reason."""
+
+    def __init__(self, sock: socket.socket, deadlines: PhaseDeadlines):
+        super().__init__(sock)
+        self.deadlines = deadlines
+
+    def _fill(self, n: int, stop_event=None, deadline: Optional[float] = None) -> bool:
+        # A read with a deadline of its own (keep-alive waits) is not part of a phase.
+        phase = deadline is None
+        if super()._fill(n, stop_event, self.deadlines.at if phase else deadline):
+            return True
+        if self.peer_gone:
+            self.deadlines.expire(REAP_DEAD_PEER)
+        elif self.timed_out and phase:
+            self.deadlines.expire()
+        return False
+
+
+def send_server_payload(out: OutputBatcher, wire: Wire, result: int, card: Optional[Card]) -> None:
+    # Queued only; the batcher is flushed when we next wait for the client or the round ends.
+    out.add(wire.server_payload(result, card))
+
+
+def send_dealer_card(
+    out: OutputBatcher, wire: Wire, dealer_cards: Optional[List[Card]], result: int, card: Card
+) -> None:
+    """Send a dealer card now, or collect it for the transcript (dealer_cards not None)."""
+    if dealer_cards is None:
+        send_server_payload(out, wire, result, card)
     else:
-        rank, suit = card_to_wire(card)
-    msg = SERVER_PAYLOAD_STRUCT.pack(MAGIC_COOKIE, MSG_PAYLOAD, result, rank, suit)
-    sock.sendall(msg)
+        dealer_cards.append(card)
 
 
-def _print_state_with_round(
+def session_rounds(rounds: int, start: int = 1) -> Iterator[int]:
+    """Round numbers of a session from `start` (1, 2, ...; endless for ROUNDS_UNLIMITED)."""
+    return itertools.count(start) if rounds == ROUNDS_UNLIMITED else iter(range(start, rounds + 1))
+
+
+def rounds_label(rounds: int) -> int:
+    """rounds_total for the game log: 0 = unlimited."""
+    return 0 if rounds == ROUNDS_UNLIMITED else rounds
+
+
+def _log_state(
+    sampled: bool,
     round_idx: int,
     rounds_total: int,
     player_name: str,
@@ -106,42 +319,68 @@ def _print_state_with_round(
     *,
     hide_dealer: bool,
 ) -> None:
-    print_game_state(player_name + f" | Round {round_idx}/{rounds_total}", player_hand, dealer_hand, hide_dealer=hide_dealer)
+    # Enqueue only; formatting and printing happen on the GAME_LOG writer thread.
+    if sampled:
+        GAME_LOG.state(player_name, round_idx, rounds_total, player_hand, dealer_hand, hide_dealer)
+
+
+def _log_round_end(sampled: bool, round_idx: int, rounds_total: int, game: BlackJackGame, result: int) -> int:
+    if sampled:
+        GAME_LOG.round_end(
+            game.player.name, round_idx, rounds_total, game.get_player_hand(), game.get_dealer_hand(), result
+        )
+    return result
 
 
 def play_one_round(
-    conn: socket.socket,
+    out: OutputBatcher,
+    reader: PhaseReader,
+    wire: Wire,
     server_name: str,
     round_idx: int,
     rounds_total: int,
     player_name: str,
     stop_evt: threading.Event,
-) -> None:
-    game = BlackJackGame(player_name)
-    game.start_game()
+    shoe: Optional[Shoe] = None,
+    transcript: bool = False,
+    session: Optional[Session] = None,
+    quota: Optional[PeerQuota] = None,
+) -> int:
+    # A resumed session continues its parked game; the client got its cards in MSG_ROUND_STATE.
+    game = session.game if session is not None else None
+    sampled = GAME_LOG.round_sampled()
+    if game is None:
+        game = BlackJackGame(player_name, shoe)
+        game.start_game()
+
+        # Initial reveal: player 2 cards; dealer shows only first.
+        p_cards = game.get_player_cards()
+        d_cards = game.get_dealer_cards()
+
+        send_server_payload(out, wire, RESULT_NOT_OVER, p_cards[0])
+        send_server_payload(out, wire, RESULT_NOT_OVER, p_cards[1])
+        send_server_payload(out, wire, RESULT_NOT_OVER, d_cards[0])
+        if session is not None:
+            session.update(game)
 
     player_hand = game.get_player_hand()
     dealer_hand = game.get_dealer_hand()
 
-    # Initial reveal: player 2 cards; dealer shows only first.
-    p_cards = game.get_player_cards()
-    d_cards = game.get_dealer_cards()
-
-    send_server_payload(conn, RESULT_NOT_OVER, p_cards[0])
-    send_server_payload(conn, RESULT_NOT_OVER, p_cards[1])
-    send_server_payload(conn, RESULT_NOT_OVER, d_cards[0])
-
-    _print_state_with_round(
-        round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=True
+    _log_state(
+        sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=True
     )
 
     # Player decisions loop
     while not stop_evt.is_set():
-        raw = recv_exact(conn, CLIENT_PAYLOAD_STRUCT.size, stop_event=stop_evt)
-        if not raw:
+        out.flush()
+        reader.deadlines.decision()
+        msg = wire.read(reader, CLIENT_PAYLOAD_STRUCT, DECISION_BODY, (MSG_PAYLOAD,), stop_event=stop_evt)
+        if not msg:
             raise ConnectionError("client disconnected")
+        if quota is not None:
+            quota.decision()
 
-        cookie, msg_type, decision_raw = CLIENT_PAYLOAD_STRUCT.unpack(raw)
+        cookie, msg_type, decision_raw = msg
         if cookie != MAGIC_COOKIE or msg_type != MSG_PAYLOAD:
             continue
 
@@ -153,42 +392,243 @@ def play_one_round(
             break
 
         card, state = game.player_hit()
-        if card is None:
-            break
-
-        send_server_payload(conn, state, card)
-        _print_state_with_round(
-            round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=True
+        send_server_payload(out, wire, state, card)
+        _log_state(
+            sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=True
         )
 
         if state == RESULT_LOSS:
             # Bust: state already printed with the bust card (avoid printing the same final state twice).
-            return
-
-    # Dealer reveals hidden card then hits while < 17
+            if session is not None:
+                session.update(None)
+            return _log_round_end(sampled, round_idx, rounds_total, game, state)
+        if session is not None:
+            session.update(game)
+
+    # The outcome no longer depends on the player: a drop from here on resumes at the next round.
+    if session is not None:
+        session.decide()
+
+    # Dealer reveals hidden card then hits while < 17 (collected for a transcript if asked).
+    dealer_cards: Optional[List[Card]] = [] if transcript else None
     hidden = game.reveal_dealer_hidden()
     if hidden is not None:
-        send_server_payload(conn, RESULT_NOT_OVER, hidden)
+        send_dealer_card(out, wire, dealer_cards, RESULT_NOT_OVER, hidden)
 
-    _print_state_with_round(
-        round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False
+    _log_state(
+        sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False
     )
 
     while not stop_evt.is_set() and game.dealer_should_hit():
         card, state = game.dealer_hit()
-        if card is None:
-            break
-
-        send_server_payload(conn, state, card)
-        _print_state_with_round(
-            round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False
+        send_dealer_card(out, wire, dealer_cards, state, card)
+        _log_state(
+            sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False
         )
 
         if state == RESULT_WIN:
             # Dealer bust: state already printed with the bust card (avoid printing the same final state twice).
-            return
+            if dealer_cards is not None:
+                out.add(wire.dealer_transcript(state, dealer_cards))
+            if session is not None:
+                session.update(None)  # checkpoint the shoe past the dealer's cards
+            return _log_round_end(sampled, round_idx, rounds_total, game, state)
     result = game.final_result()
-    send_server_payload(conn, result, None)
+    if dealer_cards is None:
+        send_server_payload(out, wire, result, None)
+    else:
+        out.add(wire.dealer_transcript(result, dealer_cards))
+    if session is not None:
+        session.update(None)  # checkpoint the shoe past the dealer's cards
+    return _log_round_end(sampled, round_idx, rounds_total, game, result)
+
+def play_table_round(
+    wire: Wire,
+    round_idx: int,
+    rounds_total: int,
+    player_name: str,
+    shoe: Optional[Shoe],
+    table: Tuple[int, ...],
+) -> bytes:
+    """Play one autoplay round locally; returns its ROUND_RESULT message."""
+    game = BlackJackGame(player_name, shoe)
+    game.start_game()
+    sampled = GAME_LOG.round_sampled()
+    result = game.play_table(table)
+    player_hand, dealer_hand = game.get_player_hand(), game.get_dealer_hand()
+    _log_state(sampled, round_idx, rounds_total, player_name, player_hand, dealer_hand, hide_dealer=False)
+    _log_round_end(sampled, round_idx, rounds_total, game, result)
+    return wire.round_result(result, player_hand.value, dealer_hand.value)
+
+
+def accepted_flags(config: ServerConfig, sessions: SessionTable) -> int:
+    """Request flags this server honours (keep-alive and resumption can be switched off)."""
+    flags = SUPPORTED_FLAGS
+    if config.keepalive_idle <= 0:
+        flags &= ~FLAG_KEEP_ALIVE
+    if not sessions.enabled:
+        flags &= ~FLAG_RESUMABLE
+    return flags
+
+
+def session_from_request(
+    req: tuple, config: ServerConfig, shoes: ShoeFactory, sessions: SessionTable
+) -> Optional[Session]:
+    """Validate a decoded request; the new Session, or None to drop the connection."""
+    # v2 requests also carry flags (FLAG_*); unknown ones are not echoed in the welcome.
+    cookie, msg_type, rounds, client_name_raw, *options = req
+    flags = (options[0] if options else 0) & accepted_flags(config, sessions)
+
+    # Validate request header (cookie + message type) to protect against malformed/foreign traffic
+    if cookie != MAGIC_COOKIE or msg_type not in (MSG_REQUEST, MSG_REQUEST_AUTOPLAY):
+        return None
+
+    rounds = int(rounds) or 0
+    if rounds <= 0:
+        return None
+    if msg_type == MSG_REQUEST_AUTOPLAY:
+        # Nothing to resume: a dropped autoplay session is simply requested again.
+        flags &= ~FLAG_RESUMABLE
+
+    # One shoe per session, carried across its rounds.
+    session = Session(decode_name(client_name_raw), rounds, flags, shoes.new_shoe())
+    if flags & FLAG_RESUMABLE:
+        sessions.open(session)
+    return session
+
+
+def open_session_table(
+    config: ServerConfig, shoes: ShoeFactory, worker: bool = False, takeover: bool = False
+) -> SessionTable:
+    """The resumable-session table; with --checkpoint, recover the sessions of the last run."""
+    checkpoints = None
+    if config.checkpoint_path:
+        checkpoints = Checkpointer(config.checkpoint_path, config.checkpoint_fsync)
+    sessions = SessionTable(config.resume_capacity, config.resume_ttl, checkpoints)
+    if checkpoints is not None and not takeover:
+        recovered = checkpoints.recover(shoes, config.resume_ttl)
+        for session in recovered:
+            sessions.park(session)
+        checkpoints.start()
+        if not worker:
+            print(f"Recovered {len(recovered)} sessions from {config.checkpoint_path}")
+    return sessions
+
+
+def close_session_table(sessions: SessionTable) -> None:
+    """Flush the checkpoints (sessions still active stay recoverable) and log the metrics."""
+    if sessions.checkpoints is not None:
+        sessions.checkpoints.close()
+        GAME_LOG.event(EVT_INFO, sessions.checkpoints.describe())
+    if sessions.parked or sessions.forwarded:
+        GAME_LOG.event(EVT_INFO, sessions.describe())
+
+
+def resumed_welcome(wire: Wire, session: Session) -> bytes:
+    """Welcome + MSG_ROUND_STATE answering a successful MSG_RESUME."""
+    return wire.welcome(session.flags, session.token) + wire.round_state(
+        session.next_round, session.visible_cards()
+    )
+
+
+def play_session(
+    out: OutputBatcher,
+    reader: PhaseReader,
+    wire: Wire,
+    stop_evt: threading.Event,
+    config: ServerConfig,
+    session: Session,
+    quota: Optional[PeerQuota] = None,
+) -> bool:
+    """Play the (remaining) rounds of a session; False if stopped by shutdown."""
+    total = rounds_label(session.rounds)
+    if session.table is None:
+        for r in session_rounds(session.rounds, session.next_round):
+            session.round_idx = r
+            play_one_round(
+                out, reader, wire, config.server_name, r, total, session.client_name, stop_evt,
+                session.shoe, transcript=bool(session.flags & FLAG_DEALER_TRANSCRIPT), session=session,
+                quota=quota,
+            )
+            out.flush()
+        return True
+
+    # No decisions to wait for: play on and stream the results in chunks.
+    for r in session_rounds(session.rounds):
+        if stop_evt.is_set() or not reader.deadlines.check():
+            return False
+        out.add(play_table_round(wire, r, total, session.client_name, session.shoe, session.table))
+        if r % AUTOPLAY_FLUSH_ROUNDS == 0:
+            out.flush()
+    out.flush()
+    return True
+
+
+def serve_session(
+    reader: PhaseReader,
+    out: OutputBatcher,
+    wire: Wire,
+    peer: str,
+    stop_evt: threading.Event,
+    config: ServerConfig,
+    shoes: ShoeFactory,
+    sessions: SessionTable,
+    quota: Optional[PeerQuota] = None,
+) -> bool:
+    """Read one request (or MSG_RESUME) and play its session; True if the connection is kept for another."""
+    quota = quota or PeerQuota()
+    # Send counters are per session (a kept-alive connection plays several).
+    out.messages = out.syscalls = 0
+    if wire.framed and reader.peek_frame_type(stop_event=stop_evt) == MSG_RESUME:
+        msg = wire.read(reader, RESUME_STRUCT, RESUME_BODY, (MSG_RESUME,), stop_event=stop_evt)
+        if msg:
+            quota.decision()
+        session = sessions.claim(msg[2]) if msg else None
+        if session is None:
+            # Unknown or expired token: a welcome without a token tells the client so.
+            if msg:
+                out.add(wire.welcome())
+                out.flush()
+            return False
+        out.add(resumed_welcome(wire, session))
+        GAME_LOG.event(EVT_RESUMED, peer, session.client_name, session.next_round)
+        reader.deadlines.start_session()
+    else:
+        req_types = (MSG_REQUEST, MSG_REQUEST_AUTOPLAY)
+        req = wire.read(reader, REQUEST_STRUCT, REQUEST_BODY, req_types, stop_event=stop_evt)
+        if req:
+            # Charged before the session (and its shoe) is allocated.
+            quota.decision()
+        session = session_from_request(req, config, shoes, sessions) if req else None
+        if session is None:
+            return False
+        if req[1] == MSG_REQUEST_AUTOPLAY:
+            msg = wire.read(
+                reader, DECISION_TABLE_STRUCT, DECISION_TABLE_BODY, (MSG_DECISION_TABLE,), stop_event=stop_evt
+            )
+            session.table = unpack_decision_table(msg) if msg else None
+            if session.table is None:
+                return False
+        if wire.framed:
+            out.add(wire.welcome(session.flags, session.token))
+        GAME_LOG.event(EVT_REGISTERED, peer, session.client_name, rounds_label(session.rounds))
+        reader.deadlines.start_session()
+
+    start = session.next_round  # after a resume, earlier rounds were played elsewhere
+    try:
+        if not play_session(out, reader, wire, stop_evt, config, session, quota):
+            return False
+    except (ConnectionError, OSError):
+        # Keep a resumable session for its client to reconnect (not when shutting down).
+        if session.resumable and not stop_evt.is_set():
+            sessions.park(session)
+        raise
+    if session.resumable:
+        sessions.close(session)
+    keep = bool(session.flags & FLAG_KEEP_ALIVE)
+    GAME_LOG.event(EVT_FINISHED, peer, session.rounds - start + 1, out.messages, out.syscalls, keep)
+    return keep
+
 
 def handle_client(
     conn: socket.socket,
@@ -196,38 +636,69 @@ def handle_client(
     stop_evt: threading.Event,
     sockets_set: set,
     sockets_lock: threading.Lock,
-    server_name: str,
+    config: ServerConfig,
+    shoes: ShoeFactory,
+    sessions: SessionTable,
+    handoff: Optional[Handoff] = None,
+    idle: bool = False,
+    admission: Optional[ClientPool] = None,
+    reaped: Optional[ReapStats] = None,
+    limits: Optional[PeerLimits] = None,
 ) -> None:
+    # idle = a keep-alive connection taken over from the previous server process (handoff.py)
     peer = f"{addr[0]}:{addr[1]}"
+    deadlines = config.phase_deadlines()
+    quota = limits.quota(addr[0]) if limits is not None else PeerQuota()
     try:
         conn.settimeout(SOCKET_TIMEOUT_SEC)
-
-        req_raw = recv_exact(conn, REQUEST_STRUCT.size, stop_event=stop_evt)
-        if not req_raw:
+        # Small request/response messages: never let Nagle hold a payload back for an ACK.
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        enable_heartbeat(conn, config.heartbeat)
+
+        reader = PhaseReader(conn, deadlines)
+        out = OutputBatcher(conn)
+        # v1 or v2 is decided by the byte after the cookie of the first message.
+        deadline = time.monotonic() + config.keepalive_idle if idle else None
+        deadlines.request()
+        head = reader.peek(PREAMBLE_STRUCT.size, stop_event=stop_evt, deadline=deadline)
+        if not head:
             return
-
-        cookie, msg_type, rounds, client_name_raw = REQUEST_STRUCT.unpack(req_raw)
-
-        # Validate request header (cookie + message type) to protect against malformed/foreign traffic
-        if cookie != MAGIC_COOKIE or msg_type != MSG_REQUEST:
+        cookie, marker = PREAMBLE_STRUCT.unpack(head)
+        wire = wire_for(marker)
+        if cookie != MAGIC_COOKIE or wire is None:
             return
 
-        client_name = decode_name(client_name_raw)
-        rounds = int(rounds) or 0
-        if rounds <= 0:
-            return
-
-        print(f"[{peer}] Client '{client_name}' registered for {rounds} rounds")
-        for r in range(1, rounds + 1):
-            play_one_round(conn, server_name, r, rounds, client_name, stop_evt)
-        print(f"[{peer}] Finished; closing")
-
+        # Keep-alive waits also end when a handoff starts draining this process.
+        idle_stop = handoff.draining if handoff is not None else stop_evt
+        while serve_session(reader, out, wire, peer, stop_evt, config, shoes, sessions, quota):
+            if admission is not None and admission.waiting and not reader.buffered():
+                # Others wait for a thread: this one is not kept idle for the next request.
+                return
+            # Keep-alive: wait for the next request; an idle or closed connection ends quietly.
+            deadlines.idle()
+            deadline = time.monotonic() + config.keepalive_idle
+            head = reader.peek(PREAMBLE_STRUCT.size, stop_event=idle_stop, deadline=deadline)
+            if head is None and handoff is not None and handoff.active and not stop_evt.is_set():
+                # Draining: an idle connection moves to the new process, a busy one is served here.
+                if not reader.buffered() and handoff.send_connection(conn):
+                    return
+                head = reader.peek(PREAMBLE_STRUCT.size, stop_event=stop_evt, deadline=deadline)
+            if head is None:
+                return
+            deadlines.request()
+
+    except Throttled as exc:
+        GAME_LOG.event(EVT_THROTTLED, peer, str(exc))
     except (ConnectionError, OSError):
         # Client may disconnect mid-round (e.g., Ctrl+C).
         # If the server itself is not shutting down, report it.
-        if not stop_evt.is_set():
-            print(f"[{peer}] Client disconnected")
+        if not stop_evt.is_set() and not deadlines.expired:
+            GAME_LOG.event(EVT_DISCONNECTED, peer)
     finally:
+        if deadlines.expired and not stop_evt.is_set():
+            GAME_LOG.event(EVT_REAPED, peer, deadlines.expired)
+            if reaped is not None:
+                reaped.count(deadlines.expired)
         with sockets_lock:
             sockets_set.discard(conn)
         try:
@@ -236,42 +707,98 @@ def handle_client(
             pass
 
 
-def run_server(server_name: str = "The House Always ACKs", tcp_port: int = 0) -> None:
-    ip = get_local_ip()
-    print(f"Server started, listening on IP address {ip}")
+def print_house_edge(config: ServerConfig) -> None:
+    """Print the exact house edge for these rules if strategy.py has it cached (no computing)."""
+    strategy = load_cached(config.decks)
+    if strategy is not None:
+        print(
+            f"House edge for {config.decks}-deck rules: {strategy.house_edge * 100:.2f}% "
+            f"with basic strategy, {strategy.optimal_house_edge * 100:.2f}% with perfect play"
+        )
+
 
-    tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    tcp.bind(("", tcp_port))
-    tcp.listen()
+def run_server(
+    config: Optional[ServerConfig] = None, *, worker: bool = False, load_slot: Optional[WorkerLoad] = None
+) -> None:
+    # worker=True (run_supervisor): SO_REUSEPORT, no offers or banners, load goes to `load_slot`.
+    config = config or ServerConfig()
+    server_name, tcp_port = config.server_name, config.tcp_port
+    GAME_LOG.configure(config.log_verbosity, config.log_sample_rate)
+    # Started by a handoff (handoff.py): the listening socket comes from the old process.
+    takeover = Takeover.from_env() if not worker else None
+    if not worker:
+        ip = get_local_ip()
+        print(f"Server started, listening on IP address {ip}")
+        if takeover is not None:
+            print(f"Taking over from server process {takeover.pid}")
+        print_house_edge(config)
+
+    if takeover is not None:
+        tcp = takeover.listener()
+    else:
+        tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if worker:
+            tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        tcp.bind(("", tcp_port))
+        tcp.listen(LISTEN_BACKLOG)
     tcp.settimeout(SOCKET_TIMEOUT_SEC)
     port = tcp.getsockname()[1]
 
-    stop_evt = threading.Event()
+    # WakeupEvents: blocked reads and the accept loop wake as soon as these are set.
+    stop_evt = WakeupEvent()
+    # Set when this process stops accepting: on shutdown, or once a handoff succeeded.
+    drain_evt = WakeupEvent()
     shutdown_printed_evt = threading.Event()
+    handoff = Handoff(drain_evt) if handoff_supported() and not worker else None
 
     # Track active client sockets so we can close them on Ctrl+C without freezing.
     sockets_lock = threading.Lock()
     sockets_set: set[socket.socket] = set()
 
-    # Track client threads so we can join them for a cleaner exit.
-    threads_lock = threading.Lock()
-    client_threads: set[threading.Thread] = set()
-    def _client_thread_entry(conn: socket.socket, addr: Tuple[str, int]) -> None:
-        try:
-            handle_client(conn, addr, stop_evt, sockets_set, sockets_lock, server_name)
-        finally:
-            # Ensure finished client threads don't linger in the tracking set.
-            with threads_lock:
-                client_threads.discard(threading.current_thread())
+    reaped = ReapStats()
+    limits = config.peer_limits()
 
+    def _serve_client(conn: socket.socket, addr: Tuple[str, int], idle: bool) -> None:
+        handle_client(
+            conn, addr, stop_evt, sockets_set, sockets_lock, config, shoes, sessions, handoff, idle, pool, reaped,
+            limits,
+        )
+
+    # Client threads, started up front; accepted connections queue for them (admission.py).
+    pool = ClientPool(
+        config.client_slots(), config.admission_queue, _serve_client, lambda text: GAME_LOG.event(EVT_INFO, text)
+    )
+
+    def _start_client(conn: socket.socket, addr: Tuple[str, int], idle: bool = False) -> None:
+        # Tracked from the start, so that shutdown also closes connections still queued.
+        with sockets_lock:
+            sockets_set.add(conn)
+        if not pool.submit(conn, addr, idle):
+            with sockets_lock:
+                sockets_set.discard(conn)
+            reject(conn)
+
+    def _adopt_connection(conn: socket.socket) -> None:
+        # An idle keep-alive connection passed over by the old process (handoff.Takeover).
+        try:
+            addr = conn.getpeername()
+        except OSError:
+            conn.close()
+            return
+        _start_client(conn, addr, idle=True)
 
     def _shutdown(reason: str) -> None:
         # Ensure the shutdown message is printed exactly once.
         if not shutdown_printed_evt.is_set():
             shutdown_printed_evt.set()
-            print("\nServer shutting down gracefully...")
-        stop_evt.set()
+            if handoff is not None and handoff.pid:
+                print(f"\nDrained; server process {handoff.pid} has taken over")
+            elif not worker:
+                print("\nServer shutting down gracefully...")
+        # Set the flag now, but wake the threads only after their sockets are shut down.
+        stop_evt.set(wake=False)
+        drain_evt.set(wake=False)
 
         # Close listening socket to unblock accept().
         try:
@@ -279,18 +806,25 @@ def run_server(server_name: str = "The House Always ACKs", tcp_port: int = 0) ->
         except OSError:
             pass
 
-        # Close all active client sockets to unblock their recv loops.
+        # Shut the client connections down; each thread closes its own socket as it exits.
         with sockets_lock:
-            for s in list(sockets_set):
+            for s in sockets_set:
                 try:
                     s.shutdown(socket.SHUT_RDWR)
                 except OSError:
                     pass
-                try:
-                    s.close()
-                except OSError:
-                    pass
             sockets_set.clear()
+        stop_evt.wake()
+        drain_evt.wake()
+        pool.close()
+
+    def _handoff_thread() -> None:
+        # Blocks until the new process is ready, so it runs off the accept loop.
+        if not handoff.start(tcp):
+            GAME_LOG.event(EVT_INFO, "Handoff failed: the new server process did not start; still serving")
+            return
+        GAME_LOG.event(EVT_INFO, f"Server process {handoff.pid} took over the listening socket; draining")
+        handoff.release(sessions)
 
     # Ctrl+C handler: do not raise KeyboardInterrupt noise, just initiate shutdown.
     previous_handler = signal.getsignal(signal.SIGINT)
@@ -299,37 +833,70 @@ def run_server(server_name: str = "The House Always ACKs", tcp_port: int = 0) ->
         _shutdown("sigint")
         # Do NOT chain to the previous handler, to avoid extra KeyboardInterrupt/tracebacks.
 
+    def _handoff_handler(signum, frame):  # type: ignore[no-untyped-def]
+        threading.Thread(target=_handoff_thread, name="handoff", daemon=True).start()
+
     try:
         signal.signal(signal.SIGINT, _sigint_handler)
     except Exception:
         # If signal registration fails, we still handle KeyboardInterrupt in the accept loop.
         pass
 
-    offer_thread = threading.Thread(target=broadcast_offers, args=(stop_evt, server_name, port), daemon=True)
-    offer_thread.start()
-    print(f"Offering UDP broadcasts on port {UDP_PORT_OFFERS}, TCP listening on port {port}")
-
+    if not worker:
+        offer_thread = threading.Thread(
+            target=broadcast_offers,
+            args=(drain_evt, server_name, port, lambda: pool.stats.load(pool.active)),
+            daemon=True,
+        )
+        offer_thread.start()
+        print(f"Offering UDP broadcasts on port {UDP_PORT_OFFERS}, TCP listening on port {port}")
+    elif load_slot is not None:
+        threading.Thread(
+            target=publish_load,
+            args=(drain_evt, load_slot, lambda: pool.stats.load(pool.active)),
+            daemon=True,
+        ).start()
+
+    shoes = ShoeFactory(config.decks, config.penetration, config.seed, config.secure_rng, config.shuffle_pool)
+    shoes.start()
+    sessions = open_session_table(config, shoes, worker, takeover is not None)
+    GAME_LOG.start()
+    pool.start()
+    if takeover is not None:
+        takeover.ready(shoes, sessions, _adopt_connection, lambda text: GAME_LOG.event(EVT_INFO, text))
+    previous_handoff_handler = None
+    if handoff is not None:
+        previous_handoff_handler = signal.getsignal(HANDOFF_SIGNAL)
+        signal.signal(HANDOFF_SIGNAL, _handoff_handler)
+    accept_waiter = SocketWaiter(tcp)
     try:
-        while not stop_evt.is_set():
+        while not drain_evt.is_set():
+            if not accept_waiter.wait(drain_evt):
+                continue
             try:
                 conn, addr = tcp.accept()
             except socket.timeout:
+                # Taken by the other process sharing the socket (handoff.py).
                 continue
             except OSError:
                 # Listening socket likely closed during shutdown.
                 break
-
-            with sockets_lock:
-                sockets_set.add(conn)
-
-            th = threading.Thread(
-                target=_client_thread_entry,
-                args=(conn, addr),
-                daemon=False,
-            )
-            with threads_lock:
-                client_threads.add(th)
-            th.start()
+            if not limits.connect(addr[0]):
+                # Over its connection rate: turned away before it takes a thread or a game.
+                reject(conn)
+                continue
+            _start_client(conn, addr)
+
+        if handoff is not None and handoff.active:
+            # Handed off: let the active sessions finish, then exit.
+            deadline = time.monotonic() + config.drain_timeout
+            while not stop_evt.is_set():
+                if pool.wait_idle(timeout=SOCKET_TIMEOUT_SEC):
+                    break
+                if config.drain_timeout > 0 and time.monotonic() >= deadline:
+                    GAME_LOG.event(EVT_INFO, f"Drain timeout: closing {pool.active} sessions still active")
+                    break
+            handoff.close()
 
     except KeyboardInterrupt:
         # Fallback path if signal handler wasn't installed for some reason.
@@ -338,12 +905,143 @@ def run_server(server_name: str = "The House Always ACKs", tcp_port: int = 0) ->
         _shutdown("finally")
 
         # Join client threads briefly to let them exit cleanly.
-        with threads_lock:
-            threads = list(client_threads)
-        for th in threads:
-            th.join(timeout=1.0)
+        pool.join(timeout=SHUTDOWN_JOIN_SEC)
+
+        shoes.close()
+        if shoes.pool is not None:
+            GAME_LOG.event(EVT_INFO, shoes.describe())
+        close_session_table(sessions)
+        if pool.stats.queued or pool.stats.rejected:
+            GAME_LOG.event(EVT_INFO, pool.stats.describe())
+        if reaped.total:
+            GAME_LOG.event(EVT_INFO, reaped.describe())
+        if limits.refused:
+            GAME_LOG.event(EVT_INFO, limits.describe())
+        if handoff is not None and handoff.pid:
+            GAME_LOG.event(EVT_INFO, handoff.describe())
+        # Print whatever the client threads logged before exiting.
+        GAME_LOG.close()
 
         # Best effort: restore previous SIGINT handler.
+        try:
+            signal.signal(signal.SIGINT, previous_handler)
+            if previous_handoff_handler is not None:
+                signal.signal(HANDOFF_SIGNAL, previous_handoff_handler)
+        except Exception:
+            pass
+
+
+# Supervisor (--workers N): liveness check interval and grace period before killing workers.
+WORKER_POLL_SEC = 1.0
+WORKER_SHUTDOWN_GRACE_SEC = 3.0
+
+
+def _worker_entry(config: ServerConfig, load_slot: WorkerLoad) -> None:
+    # Own process group: Ctrl+C reaches only the supervisor, which stops the workers.
+    os.setpgrp()
+    try:
+        if config.engine == "asyncio":
+            from async_server import run_server_async
+
+            run_server_async(config, worker=True, load_slot=load_slot)
+        else:
+            run_server(config, worker=True, load_slot=load_slot)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_supervisor(config: ServerConfig) -> None:
+    """Run `config.workers` server processes sharing one TCP port via SO_REUSEPORT.
+
+    This process only broadcasts the offers (with the combined load) and restarts crashed workers.
+    """
+    server_name, workers = config.server_name, config.workers
+    ip = get_local_ip()
+    print(f"Server started, listening on IP address {ip}")
+    print_house_edge(config)
+
+    # Reserve the port (and resolve port 0) with a bound socket that never listens.
+    holder = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    holder.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    holder.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    holder.bind(("", config.tcp_port))
+    port = holder.getsockname()[1]
+    # Workers bind the resolved port (matters when config.tcp_port is 0).
+    worker_config = dataclasses.replace(config, tcp_port=port)
+
+    stop_evt = threading.Event()
+    loads = WorkerLoads(workers, config.client_slots())
+
+    def _spawn(idx: int) -> multiprocessing.Process:
+        # A restarted worker starts empty: its predecessor's connections died with it.
+        loads.reset(idx)
+        proc = multiprocessing.Process(
+            target=_worker_entry,
+            args=(worker_config, loads.slot(idx)),
+            name=f"blackjack-worker-{idx}",
+        )
+        proc.start()
+        return proc
+
+    def _shutdown(reason: str) -> None:
+        # Ensure the shutdown message is printed exactly once.
+        if not stop_evt.is_set():
+            stop_evt.set()
+            print("\nServer shutting down gracefully...")
+
+    previous_handler = signal.getsignal(signal.SIGINT)
+
+    def _sigint_handler(signum, frame):  # type: ignore[no-untyped-def]
+        _shutdown("sigint")
+
+    try:
+        signal.signal(signal.SIGINT, _sigint_handler)
+    except Exception:
+        pass
+
+    procs = [_spawn(i) for i in range(workers)]
+
+    offer_thread = threading.Thread(
+        target=broadcast_offers, args=(stop_evt, server_name, port, loads.total), daemon=True
+    )
+    offer_thread.start()
+    print(
+        f"Offering UDP broadcasts on port {UDP_PORT_OFFERS}, TCP listening on port {port} "
+        f"({workers} workers, {config.engine} engine)"
+    )
+
+    try:
+        while not stop_evt.is_set():
+            stop_evt.wait(WORKER_POLL_SEC)
+            if stop_evt.is_set():
+                break
+            for i, proc in enumerate(procs):
+                if not proc.is_alive():
+                    print(f"Worker {i} (pid {proc.pid}) exited with code {proc.exitcode}; restarting")
+                    procs[i] = _spawn(i)
+    except KeyboardInterrupt:
+        _shutdown("keyboardinterrupt")
+    finally:
+        _shutdown("finally")
+
+        # Each worker runs its own _shutdown on SIGINT (close listener and client sockets).
+        for proc in procs:
+            if proc.is_alive():
+                try:
+                    os.kill(proc.pid, signal.SIGINT)
+                except OSError:
+                    pass
+        for proc in procs:
+            proc.join(timeout=WORKER_SHUTDOWN_GRACE_SEC)
+            if proc.is_alive():
+                proc.kill()
+                proc.join(timeout=1.0)
+
+        try:
+            holder.close()
+        except OSError:
+            pass
+
         try:
             signal.signal(signal.SIGINT, previous_handler)
         except Exception:
@@ -354,11 +1052,252 @@ def main() -> None:
     p = argparse.ArgumentParser()
     p.add_argument("--name", default="The House Always ACKs")
     p.add_argument("--port", type=int, default=0)
+    p.add_argument(
+        "--engine",
+        choices=("threads", "asyncio"),
+        default="threads",
+        help="threads = a fixed pool of --max-clients threads, up to --admission-queue more connections "
+        "waiting for one (default); asyncio = coroutines on one event loop, no session limit unless "
+        "--max-clients is given (idle keep-alive connections never hold a slot)",
+    )
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="run N worker processes sharing the TCP port via SO_REUSEPORT (default 1 = single process)",
+    )
+    p.add_argument(
+        "--log",
+        choices=VERBOSITY_LEVELS,
+        default=VERBOSITY_FULL,
+        help="game output: full = every state change (default), summary = one line per round, off",
+    )
+    p.add_argument(
+        "--log-sample",
+        type=float,
+        default=1.0,
+        metavar="RATE",
+        help="log only this fraction of rounds (0..1, default 1)",
+    )
+    p.add_argument(
+        "--decks",
+        type=int,
+        default=DEFAULT_SHOE_DECKS,
+        help=f"decks per session shoe ({MIN_SHOE_DECKS}..{MAX_SHOE_DECKS}, default {DEFAULT_SHOE_DECKS})",
+    )
+    p.add_argument(
+        "--penetration",
+        type=float,
+        default=DEFAULT_PENETRATION,
+        help=f"fraction of the shoe dealt before the cut card (default {DEFAULT_PENETRATION})",
+    )
+    p.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="seed the shuffles: each session shuffles from its own stream derived from the seed, so the "
+        "n-th session always gets the same cards (turns the shuffle pool off)",
+    )
+    p.add_argument("--secure-rng", action="store_true", help="shuffle with the OS CSPRNG (random.SystemRandom)")
+    p.add_argument(
+        "--shuffle-pool",
+        type=int,
+        default=DEFAULT_POOL_DEPTH,
+        metavar="N",
+        help=f"pre-shuffled shoe orders kept ready by a background thread (default {DEFAULT_POOL_DEPTH}, 0 = off; "
+        "not used with --seed)",
+    )
+    p.add_argument(
+        "--keepalive-idle",
+        type=float,
+        default=KEEPALIVE_IDLE_SEC,
+        metavar="SEC",
+        help=f"keep a finished session's connection open this long for the next request "
+        f"(default {KEEPALIVE_IDLE_SEC:g}, 0 = close after every session)",
+    )
+    p.add_argument(
+        "--resume-ttl",
+        type=float,
+        default=DEFAULT_RESUME_TTL_SEC,
+        metavar="SEC",
+        help=f"keep a dropped resumable session this long for its client (default {DEFAULT_RESUME_TTL_SEC:g}, 0 = off)",
+    )
+    p.add_argument(
+        "--resume-capacity",
+        type=int,
+        default=DEFAULT_RESUME_CAPACITY,
+        metavar="N",
+        help=f"dropped sessions kept at most; the oldest is evicted (default {DEFAULT_RESUME_CAPACITY})",
+    )
+    p.add_argument(
+        "--checkpoint",
+        default=None,
+        metavar="FILE",
+        help="checkpoint resumable sessions to FILE and recover them from it on startup",
+    )
+    p.add_argument(
+        "--checkpoint-fsync",
+        type=float,
+        default=DEFAULT_FSYNC_INTERVAL_SEC,
+        metavar="SEC",
+        help=f"fsync checkpoints at most this often (default {DEFAULT_FSYNC_INTERVAL_SEC:g}); "
+        "a crash loses at most this much progress",
+    )
+    p.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=DEFAULT_DRAIN_TIMEOUT_SEC,
+        metavar="SEC",
+        help=f"after a handoff (SIGUSR2), let active sessions finish for this long "
+        f"(default {DEFAULT_DRAIN_TIMEOUT_SEC:g}, 0 = no limit)",
+    )
+    p.add_argument(
+        "--max-clients",
+        type=int,
+        default=None,
+        metavar="N",
+        help=f"sessions served at once; the threads engine starts this many client threads "
+        f"(default {DEFAULT_MAX_CLIENTS}), the asyncio engine has no limit by default (0 = no limit)",
+    )
+    p.add_argument(
+        "--admission-queue",
+        type=int,
+        default=DEFAULT_ADMISSION_QUEUE,
+        metavar="N",
+        help=f"connections waiting for a free slot at most; more are told the server is busy "
+        f"(default {DEFAULT_ADMISSION_QUEUE}, 0 = no waiting)",
+    )
+    p.add_argument(
+        "--request-timeout",
+        type=float,
+        default=DEFAULT_REQUEST_TIMEOUT_SEC,
+        metavar="SEC",
+        help=f"reap connections whose request has not arrived after this long "
+        f"(default {DEFAULT_REQUEST_TIMEOUT_SEC:g}, 0 = no limit)",
+    )
+    p.add_argument(
+        "--decision-timeout",
+        type=float,
+        default=DEFAULT_DECISION_TIMEOUT_SEC,
+        metavar="SEC",
+        help=f"reap players who take longer than this to Hit or Stand "
+        f"(default {DEFAULT_DECISION_TIMEOUT_SEC:g}, 0 = no limit)",
+    )
+    p.add_argument(
+        "--session-timeout",
+        type=float,
+        default=DEFAULT_SESSION_TIMEOUT_SEC,
+        metavar="SEC",
+        help="reap sessions still running after this long (default 0 = no limit)",
+    )
+    p.add_argument(
+        "--heartbeat",
+        type=float,
+        default=DEFAULT_HEARTBEAT_SEC,
+        metavar="SEC",
+        help="probe quiet connections every SEC seconds (TCP keepalive) and reap dead peers (default 0 = off)",
+    )
+    p.add_argument(
+        "--conn-rate",
+        type=float,
+        default=DEFAULT_CONN_RATE,
+        metavar="PER_SEC",
+        help="refuse connections from an IP beyond this many per second, per server process "
+        "(default 0 = no limit)",
+    )
+    p.add_argument(
+        "--decision-rate",
+        type=float,
+        default=DEFAULT_DECISION_RATE,
+        metavar="PER_SEC",
+        help="close connections of an IP playing more decisions (and session requests) per second "
+        "than this (default 0 = no limit)",
+    )
+    p.add_argument(
+        "--rate-peers",
+        type=int,
+        default=DEFAULT_RATE_PEERS,
+        metavar="N",
+        help=f"IPs whose rates are tracked; the least recently seen are forgotten (default {DEFAULT_RATE_PEERS})",
+    )
     args = p.parse_args()
+    if args.seed is not None and args.secure_rng:
+        p.error("--seed and --secure-rng are mutually exclusive")
+    if args.shuffle_pool < 0:
+        p.error("--shuffle-pool must not be negative")
+    if not MIN_SHOE_DECKS <= args.decks <= MAX_SHOE_DECKS:
+        p.error(f"--decks must be within {MIN_SHOE_DECKS}..{MAX_SHOE_DECKS}")
+    if not 0.0 < args.penetration < 1.0:
+        p.error("--penetration must be within (0, 1)")
+    if args.resume_ttl < 0 or args.resume_capacity < 0:
+        p.error("--resume-ttl and --resume-capacity must not be negative")
+    if args.checkpoint and (args.resume_ttl <= 0 or args.resume_capacity <= 0):
+        p.error("--checkpoint needs session resumption (--resume-ttl and --resume-capacity above 0)")
+    if args.checkpoint and args.workers > 1:
+        p.error("--checkpoint cannot be combined with --workers (one checkpoint file per process)")
+    if args.checkpoint_fsync < 0:
+        p.error("--checkpoint-fsync must not be negative")
+    if args.keepalive_idle < 0:
+        p.error("--keepalive-idle must not be negative")
+    if args.drain_timeout < 0:
+        p.error("--drain-timeout must not be negative")
+    if args.max_clients is not None and args.max_clients < (1 if args.engine == "threads" else 0):
+        p.error("--max-clients must be at least 1 (0 = no limit is for --engine asyncio only)")
+    if args.admission_queue < 0:
+        p.error("--admission-queue must not be negative")
+    if min(args.request_timeout, args.decision_timeout, args.session_timeout, args.heartbeat) < 0:
+        p.error("--request-timeout, --decision-timeout, --session-timeout and --heartbeat must not be negative")
+    if args.conn_rate < 0 or args.decision_rate < 0:
+        p.error("--conn-rate and --decision-rate must not be negative")
+    if args.rate_peers < 1:
+        p.error("--rate-peers must be at least 1")
+    if not 0.0 <= args.log_sample <= 1.0:
+        p.error("--log-sample must be within 0..1")
+    if args.workers < 1:
+        p.error("--workers must be at least 1")
+    if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        p.error("--workers requires SO_REUSEPORT, which this platform does not provide")
+
+    config = ServerConfig(
+        server_name=args.name,
+        tcp_port=args.port,
+        engine=args.engine,
+        workers=args.workers,
+        log_verbosity=args.log,
+        log_sample_rate=args.log_sample,
+        decks=args.decks,
+        penetration=args.penetration,
+        seed=args.seed,
+        secure_rng=args.secure_rng,
+        shuffle_pool=args.shuffle_pool,
+        keepalive_idle=args.keepalive_idle,
+        resume_capacity=args.resume_capacity,
+        resume_ttl=args.resume_ttl,
+        checkpoint_path=args.checkpoint,
+        checkpoint_fsync=args.checkpoint_fsync,
+        drain_timeout=args.drain_timeout,
+        max_clients=args.max_clients,
+        admission_queue=args.admission_queue,
+        request_timeout=args.request_timeout,
+        decision_timeout=args.decision_timeout,
+        session_timeout=args.session_timeout,
+        heartbeat=args.heartbeat,
+        conn_rate=args.conn_rate,
+        decision_rate=args.decision_rate,
+        rate_peers=args.rate_peers,
+    )
 
     # Wrap in try/except as a last safety net to avoid any top-level KeyboardInterrupt traceback.
     try:
-        run_server(server_name=args.name, tcp_port=args.port)
+        if config.workers > 1:
+            run_supervisor(config)
+        elif config.engine == "asyncio":
+            # Imported lazily: async_server imports helpers from this module.
+            from async_server import run_server_async
+
+            run_server_async(config)
+        else:
+            run_server(config)
     except KeyboardInterrupt:
         # If this ever happens, keep it quiet.
         print("\nServer shutting down gracefully...")
@@ -0,0 +1,180 @@
+"""sessions.py
+
+Resumable sessions (protocol v2, FLAG_RESUMABLE; no networking here).
+
+- A session that asks to be resumable gets a random token in its welcome.
+- When its connection drops, the server parks the Session in a SessionTable: the shoe, the
+  round index and the game in progress (if the player still had a decision to make).
+- A client reconnecting with MSG_RESUME + token claims it and continues where it stopped;
+  a round whose outcome was already decided counts as played.
+- The table is bounded: parked sessions expire after `ttl` seconds, and when it is full the
+  longest-parked one is evicted.
+- With a checkpoint.Checkpointer, every step of a resumable session is also checkpointed
+  to disk (Session.update), so sessions can be recovered after a server restart.
+- During a handoff (see handoff.py) parked sessions are forwarded to the new server process
+  instead of being kept.
+"""
+
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from blackjack import BlackJackGame, Card, Shoe
+from common import NO_TOKEN, TOKEN_SIZE
+
+# Parked sessions kept per server process, and how long each may wait for its client.
+DEFAULT_RESUME_CAPACITY = 10_000
+DEFAULT_RESUME_TTL_SEC = 120.0
+
+
+@dataclass
+class Session:
+    client_name: str
+    rounds: int
+    flags: int
+    shoe: Shoe
+    token: bytes = NO_TOKEN
+    table: Optional[List[int]] = None  # autoplay decision table (autoplay is not resumable)
+    round_idx: int = 0  # round being played; with game None, the last one decided
+    game: Optional[BlackJackGame] = None  # round waiting for a player decision
+    # Called after every step of a round (checkpoint.Checkpointer.save when checkpointing).
+    on_update: Optional[Callable[["Session"], None]] = field(default=None, repr=False)
+
+    def update(self, game: Optional[BlackJackGame]) -> None:
+        """Record the round's progress: `game` waits for a decision, None = round decided."""
+        self.game = game
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def decide(self) -> None:
+        """The player's part of the round is over: a drop resumes at the next round.
+
+        Not checkpointed: the dealer still draws from the shoe, so the round is saved with
+        update(None) once it has.
+        """
+        self.game = None
+
+    @property
+    def resumable(self) -> bool:
+        return self.token != NO_TOKEN
+
+    @property
+    def next_round(self) -> int:
+        """Round a resumed session continues with."""
+        return self.round_idx if self.game is not None else self.round_idx + 1
+
+    def visible_cards(self) -> List[Card]:
+        """What the player sees of the round in progress: their cards, then the dealer's upcard."""
+        if self.game is None:
+            return []
+        return self.game.get_player_cards() + self.game.get_dealer_cards()[:1]
+
+
+class SessionTable:
+    """Parked sessions by token; bounded by `capacity` and a per-session TTL."""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_RESUME_CAPACITY,
+        ttl: float = DEFAULT_RESUME_TTL_SEC,
+        checkpoints=None,
+    ):
+        self.capacity = capacity
+        self.ttl = ttl
+        # Optional checkpoint.Checkpointer: resumable sessions then also survive a restart.
+        self.checkpoints = checkpoints
+        self._lock = threading.Lock()
+        # token -> (expiry time, session), oldest first
+        self._parked: "OrderedDict[bytes, Tuple[float, Session]]" = OrderedDict()
+        self._forward: Optional[Callable[[Session], None]] = None
+        self.parked = 0
+        self.resumed = 0
+        self.expired = 0
+        self.evicted = 0
+        self.forwarded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.ttl > 0
+
+    def open(self, session: Session) -> None:
+        """Make a new session resumable: give it a token (and start checkpointing it)."""
+        session.token = secrets.token_bytes(TOKEN_SIZE)
+        if self.checkpoints is not None:
+            self.checkpoints.begin(session)
+
+    def close(self, session: Session) -> None:
+        """A resumable session finished: nothing left to resume."""
+        if self.checkpoints is not None:
+            self.checkpoints.end(session)
+
+    def adopt(self, session: Session) -> None:
+        """Park a session handed over by the previous server process (and checkpoint it)."""
+        if self.checkpoints is not None:
+            self.checkpoints.begin(session)
+        self.park(session)
+
+    def forward(self, send: Callable[[Session], None]) -> None:
+        """Pass parked sessions to `send` from now on, starting with those already waiting."""
+        with self._lock:
+            self._forward = send
+            waiting = [session for _, session in self._parked.values()]
+            self._parked.clear()
+            self.forwarded += len(waiting)
+        for session in waiting:
+            send(session)
+
+    def park(self, session: Session) -> None:
+        now = time.monotonic()
+        with self._lock:
+            send = self._forward
+            if send is not None:
+                self.forwarded += 1
+            else:
+                self._expire(now)
+                self._parked[session.token] = (now + self.ttl, session)
+                self._parked.move_to_end(session.token)
+                self.parked += 1
+                while len(self._parked) > self.capacity:
+                    _, (_, dropped) = self._parked.popitem(last=False)
+                    self.evicted += 1
+                    self.close(dropped)
+        if send is not None:
+            send(session)
+
+    def claim(self, token: bytes) -> Optional[Session]:
+        """Remove and return the parked session for `token`; None if unknown or expired."""
+        if token == NO_TOKEN:
+            return None
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._parked.pop(token, None)
+            if entry is None:
+                return None
+            self.resumed += 1
+            return entry[1]
+
+    def _expire(self, now: float) -> None:
+        # Entries are in parking order and share one TTL, so expired ones are at the front.
+        while self._parked:
+            expiry, _ = next(iter(self._parked.values()))
+            if expiry > now:
+                break
+            _, (_, dropped) = self._parked.popitem(last=False)
+            self.expired += 1
+            self.close(dropped)
+
+    def describe(self) -> str:
+        """One-line table metrics."""
+        with self._lock:
+            waiting = len(self._parked)
+        return (
+            f"session resumption: {self.parked} parked, {self.resumed} resumed, "
+            f"{self.expired} expired, {self.evicted} evicted, {waiting} still waiting"
+            + (f", {self.forwarded} handed over" if self.forwarded else "")
+        )
@@ -0,0 +1,175 @@
+"""shuffle.py
+
+Where shuffled card orders come from (no networking).
+
+- RngFactory hands every session its own random.Random stream, so sessions never share
+  (and contend on) the global `random` state. Streams derive from one seed for
+  reproducible runs, or come from the OS CSPRNG (random.SystemRandom) when `secure`.
+- ShufflePool is a background producer keeping a bounded stock of pre-shuffled shoe
+  orders, so a (re)shuffle on the request path is a pop; if the pool runs dry the shoe
+  shuffles synchronously instead (counted as a miss).
+- ShoeFactory ties both together for the server: one call per session -> new Shoe.
+  A seeded factory has no pool: pooled orders come from the producer's one stream in
+  whatever order sessions take them, so each session shuffles from its own child stream
+  instead (the n-th session created always gets the same cards).
+"""
+
+from __future__ import annotations
+
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from blackjack import CARDS, DEFAULT_PENETRATION, DEFAULT_SHOE_DECKS, Card, Shoe
+
+# Pre-shuffled shoe orders kept ready (per server process).
+DEFAULT_POOL_DEPTH = 64
+# How often the producer re-checks the stop flag while the pool is full.
+_PRODUCER_WAIT_SEC = 0.5
+
+
+class RngFactory:
+    """Independent RNG streams, one per session."""
+
+    def __init__(self, seed: Optional[int] = None, secure: bool = False):
+        if secure and seed is not None:
+            raise ValueError("a secure (OS entropy) RNG cannot be seeded")
+        self.secure = secure
+        self._lock = threading.Lock()
+        self._master = random.Random(seed)
+
+    def new_stream(self) -> random.Random:
+        if self.secure:
+            # SystemRandom reads os.urandom; it has no shared state to contend on.
+            return random.SystemRandom()
+        with self._lock:
+            child_seed = self._master.getrandbits(128)
+        return random.Random(child_seed)
+
+
+@dataclass
+class PoolStats:
+    depth: int          # shoe orders ready right now
+    capacity: int
+    produced: int       # total orders shuffled by the producer
+    served: int         # takes answered from the pool
+    misses: int         # takes that found the pool empty
+    refill_rate: float  # orders produced per second since start
+
+
+class ShufflePool:
+    """Background producer of shuffled card orders for `decks`-deck shoes."""
+
+    def __init__(self, decks: int, depth: int = DEFAULT_POOL_DEPTH, rng: Optional[random.Random] = None):
+        if depth < 1:
+            raise ValueError(f"pool depth must be positive, got {depth}")
+        self.decks = decks
+        self.depth = depth
+        self._rng = rng or random.Random()
+        self._queue: "queue.Queue[List[Card]]" = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._stats_lock = threading.Lock()
+        self._produced = 0
+        self._served = 0
+        self._misses = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="shuffle-pool", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        # Free a slot so a producer blocked on a full pool returns now, not after its wait.
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        base = list(CARDS) * self.decks
+        while not self._stop.is_set():
+            cards = base[:]
+            self._rng.shuffle(cards)
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(cards, timeout=_PRODUCER_WAIT_SEC)
+                except queue.Full:
+                    continue
+                self._produced += 1
+                break
+
+    def take(self, fallback_rng: random.Random) -> List[Card]:
+        """A shuffled order for one shoe; shuffles with fallback_rng if the pool is empty."""
+        try:
+            cards = self._queue.get_nowait()
+        except queue.Empty:
+            with self._stats_lock:
+                self._misses += 1
+            cards = list(CARDS) * self.decks
+            fallback_rng.shuffle(cards)
+            return cards
+        with self._stats_lock:
+            self._served += 1
+        return cards
+
+    def stats(self) -> PoolStats:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return PoolStats(
+            depth=self._queue.qsize(),
+            capacity=self.depth,
+            produced=self._produced,
+            served=self._served,
+            misses=self._misses,
+            refill_rate=self._produced / elapsed if elapsed > 0 else 0.0,
+        )
+
+
+class ShoeFactory:
+    """Builds the per-session shoes for a server process."""
+
+    def __init__(
+        self,
+        decks: int = DEFAULT_SHOE_DECKS,
+        penetration: float = DEFAULT_PENETRATION,
+        seed: Optional[int] = None,
+        secure: bool = False,
+        pool_depth: int = DEFAULT_POOL_DEPTH,
+    ):
+        self.decks = decks
+        self.penetration = penetration
+        self.rngs = RngFactory(seed, secure)
+        # Seeded: no pool, so every shuffle of a session comes from that session's stream.
+        use_pool = pool_depth > 0 and seed is None
+        self.pool = ShufflePool(decks, pool_depth, self.rngs.new_stream()) if use_pool else None
+
+    def start(self) -> None:
+        if self.pool is not None:
+            self.pool.start()
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+
+    def new_shoe(self) -> Shoe:
+        return Shoe(self.decks, self.penetration, rng=self.rngs.new_stream(), pool=self.pool)
+
+    def describe(self) -> str:
+        """One-line pool metrics."""
+        if self.pool is None:
+            return "shuffle pool: disabled"
+        st = self.pool.stats()
+        return (
+            f"shuffle pool: depth {st.depth}/{st.capacity}, produced {st.produced} "
+            f"({st.refill_rate:.0f}/s), served {st.served}, misses {st.misses}"
+        )
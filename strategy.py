@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+"""strategy.py
+
+Exact (combinatorial, no sampling) analysis of the rules in blackjack.py:
+- dealer final-total distribution for every upcard, by memoized recursion over the
+  remaining deck composition,
+- player Stand / Hit expected values for every (player total, soft, dealer upcard),
+- the resulting Hit/Stand chart and the house edge when playing it,
+- EvOracle: the same exact Stand/Hit EVs for a live decision, given the cards still unseen
+  (blackjack.ev() is the convenience entry point).
+
+A deck composition is a tuple of 10 counts: Ace, 2..9, then all ten-valued cards.
+The hole card is drawn after the player's hits; since the player never sees it, this is
+equivalent to the real dealing order (p, d, p, d, hits...).
+
+Results depend only on the rule constants and the deck count, so they are cached as JSON
+(see cache_dir()); `load_or_compute()` makes later starts instant.
+
+    python strategy.py [--decks N]     # print chart and house edge (computes once)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from blackjack import ACE_VALUE, BLACKJACK, DEALER_MAX, ROYALTY_VALUE, SUITS, VALUES, DEFAULT_SHOE_DECKS
+
+STRATEGY_VERSION = 1
+CACHE_DIR_ENV = "HOUSE_CACHE_DIR"
+# EvOracle memo entries (per table); a decision fills a few hundred at most.
+DEFAULT_EV_CACHE = 100_000
+# EvOracle background work hands the lock over this often, so ev_within() waits at most that.
+EV_SLICE_SEC = 0.0003
+
+# Composition index -> hard points (Ace = 1). Index 9 holds 10/J/Q/K.
+RANKS = 10
+POINTS = tuple(range(1, RANKS + 1))
+# Dealer upcards in chart column order: 2..9, ten, Ace (points 2..11).
+UPCARD_POINTS = tuple(range(2, ACE_VALUE + 1))
+# Dealer outcome vector: final totals DEALER_MAX..BLACKJACK, then bust.
+DEALER_OUTCOMES = BLACKJACK - DEALER_MAX + 2
+BUST = DEALER_OUTCOMES - 1
+
+Counts = Tuple[int, ...]
+
+
+def full_shoe(decks: int) -> Counts:
+    per_rank = len(SUITS) * decks
+    tens = len(VALUES) - (RANKS - 1)  # 10, J, Q, K
+    return (per_rank,) * (RANKS - 1) + (per_rank * tens,)
+
+
+def counts_from_ranks(rank_counts: Sequence[int]) -> Counts:
+    """Composition tuple from per-rank counts indexed rank - 1 (Shoe.rank_counts layout)."""
+    return tuple(rank_counts[:RANKS - 1]) + (sum(rank_counts[RANKS - 1:]),)
+
+
+def rank_index_for_points(points: int) -> int:
+    """Composition index for a card worth `points` (Ace as 1 or ACE_VALUE)."""
+    return 0 if points in (1, ACE_VALUE) else points - 1
+
+
+def upcard_points(i: int) -> int:
+    """Points of a dealer upcard with composition index i (Ace = ACE_VALUE)."""
+    return ACE_VALUE if i == 0 else POINTS[i]
+
+
+def _take(counts: Counts, i: int) -> Counts:
+    return counts[:i] + (counts[i] - 1,) + counts[i + 1:]
+
+
+def _total(hard: int, ace: bool) -> Tuple[int, bool]:
+    """(value, soft) from hard total and "holds an Ace"; same rule as Hand.add_card."""
+    if ace and hard + ROYALTY_VALUE <= BLACKJACK:
+        return hard + ROYALTY_VALUE, True
+    return hard, False
+
+
+class Analyzer:
+    """Memoized exact EVs; the memo tables grow with every composition seen."""
+
+    def __init__(self):
+        self._dealer: Dict[tuple, Tuple[float, ...]] = {}
+        self._stand: Dict[tuple, float] = {}
+        self._best: Dict[tuple, Tuple[float, float]] = {}
+
+    def dealer_probs(self, hard: int, ace: bool, counts: Counts) -> Tuple[float, ...]:
+        """Final-total distribution of a dealer holding (hard, ace) drawing from `counts`."""
+        key = (hard, ace, counts)
+        got = self._dealer.get(key)
+        if got is not None:
+            return got
+        total, _ = _total(hard, ace)
+        n = sum(counts)
+        if total >= DEALER_MAX or n == 0:
+            # (n == 0 cannot happen with a full deck per round; count it as standing.)
+            out = [0.0] * DEALER_OUTCOMES
+            out[BUST if total > BLACKJACK else max(total, DEALER_MAX) - DEALER_MAX] = 1.0
+        else:
+            out = [0.0] * DEALER_OUTCOMES
+            for i, c in enumerate(counts):
+                if not c:
+                    continue
+                sub = self.dealer_probs(hard + POINTS[i], ace or i == 0, _take(counts, i))
+                w = c / n
+                for k in range(DEALER_OUTCOMES):
+                    out[k] += w * sub[k]
+        res = tuple(out)
+        self._dealer[key] = res
+        return res
+
+    def stand_ev(self, total: int, up: int, counts: Counts) -> float:
+        """EV of standing on `total` vs upcard index `up`; counts exclude all seen cards."""
+        key = (total, up, counts)
+        got = self._stand.get(key)
+        if got is not None:
+            return got
+        probs = self.dealer_probs(POINTS[up], up == 0, counts)
+        ev = probs[BUST]
+        for k in range(DEALER_OUTCOMES - 1):
+            final = DEALER_MAX + k
+            if total > final:
+                ev += probs[k]
+            elif total < final:
+                ev -= probs[k]
+        self._stand[key] = ev
+        return ev
+
+    def stand_hit_ev(self, hard: int, ace: bool, up: int, counts: Counts) -> Tuple[float, float]:
+        """(Stand EV, Hit EV) with optimal composition-dependent play after the hit."""
+        key = (hard, ace, up, counts)
+        got = self._best.get(key)
+        if got is not None:
+            return got
+        total, _ = _total(hard, ace)
+        stand = self.stand_ev(total, up, counts)
+        n = sum(counts)
+        hit = 0.0
+        for i, c in enumerate(counts):
+            if not c:
+                continue
+            nh = hard + POINTS[i]
+            if nh > BLACKJACK:
+                hit -= c / n
+            else:
+                s, h = self.stand_hit_ev(nh, ace or i == 0, up, _take(counts, i))
+                hit += c / n * max(s, h)
+        res = (stand, hit)
+        self._best[key] = res
+        return res
+
+    def chart_ev(self, hard: int, ace: bool, up: int, counts: Counts, chart: "Strategy", memo: dict) -> float:
+        """EV when every later decision follows `chart`."""
+        key = (hard, ace, up, counts)
+        got = memo.get(key)
+        if got is not None:
+            return got
+        total, soft = _total(hard, ace)
+        if not chart.should_hit(total, soft, upcard_points(up)):
+            ev = self.stand_ev(total, up, counts)
+        else:
+            n = sum(counts)
+            ev = 0.0
+            for i, c in enumerate(counts):
+                if not c:
+                    continue
+                nh = hard + POINTS[i]
+                ev += c / n * (-1.0 if nh > BLACKJACK else self.chart_ev(nh, ace or i == 0, up, _take(counts, i), chart, memo))
+        memo[key] = ev
+        return ev
+
+
+class _OutOfTime(Exception):
+    """An ev_within() computation ran past its deadline (its finished subtrees stay cached)."""
+
+
+class LruCache:
+    """Bounded dict: the least recently used entry is evicted once `maxsize` is exceeded."""
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError(f"cache size must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable):
+        got = self._data.get(key)
+        if got is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return got
+
+    def put(self, key: Hashable, value) -> None:
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+def _dealer_sequences(up: int) -> List[Tuple[Tuple[Tuple[int, int], ...], int, int, int]]:
+    """Every way the dealer can finish from upcard index `up`, grouped by the cards drawn.
+
+    Returns (((rank index, count), ...), cards drawn, outcome, orderings) rows. The chance
+    of one ordered draw sequence only depends on which cards it uses, so for a composition
+    with n cards it is orderings * prod(c_i falling m_i) / (n falling k) - one pass over
+    this table instead of a recursion per composition.
+    """
+    acc: Dict[tuple, int] = {}
+    drawn = [0] * RANKS
+
+    def walk(hard: int, ace: bool, k: int) -> None:
+        total, _ = _total(hard, ace)
+        if total >= DEALER_MAX:
+            out = BUST if total > BLACKJACK else total - DEALER_MAX
+            key = (tuple((i, m) for i, m in enumerate(drawn) if m), k, out)
+            acc[key] = acc.get(key, 0) + 1
+            return
+        for i in range(RANKS):
+            drawn[i] += 1
+            walk(hard + POINTS[i], ace or i == 0, k + 1)
+            drawn[i] -= 1
+
+    walk(POINTS[up], up == 0, 0)
+    return [(cards, k, out, ways) for (cards, k, out), ways in acc.items()]
+
+
+class EvOracle:
+    """Exact Stand / Hit EVs for a live decision, given the composition still unseen.
+
+    Hit EV assumes perfect composition-dependent play afterwards, exactly like
+    Analyzer.stand_hit_ev. Three exact shortcuts keep a decision cheap:
+    - a later decision on <= 16 that cannot bust is always a hit (every drawn total
+      does at least as well as standing, and the removed card does not change the
+      dealer's odds on average),
+    - a later hit is not explored when standing already beats its best case (1 - 2 * bust
+      chance),
+    - the dealer's odds after a hit are derived from the parent composition's: taking one
+      card of rank j scales each dealer draw by (c_j - m_j) / c_j, one multiply per row
+      instead of a full pass over the table.
+    Results are memoized in LRU tables keyed on the composition tuple, so the follow-up
+    decisions of a round (one card removed) are found in the cache, well under a
+    millisecond. The first decision of a round is computed cold: a few ms typically, tens
+    of ms for low totals whose hit trees reach hundreds of compositions. Callers with a
+    latency budget use ev_within(), which gives up on time and lets the answer finish in
+    the background; warm() precomputes the first decisions of a fresh shoe.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_EV_CACHE):
+        self._tables = []
+        for up in range(RANKS):
+            # Rows grouped by (outcome, cards drawn): one slice sum per group.
+            rows = sorted(_dealer_sequences(up), key=lambda row: (row[2], row[1]))
+            spans = []
+            for idx, (_cards, k, o, _ways) in enumerate(rows):
+                if spans and spans[-1][:2] == [o, k]:
+                    spans[-1][3] = idx + 1
+                else:
+                    spans.append([o, k, idx, idx + 1])
+            columns = [[dict(cards).get(i, 0) for cards, _k, _o, _w in rows] for i in range(RANKS)]
+            self._tables.append((
+                [(cards, float(ways)) for cards, _k, _o, ways in rows],
+                columns,
+                [tuple(span) for span in spans],
+            ))
+        self._max_drawn = max(max(column) for _rows, columns, _spans in self._tables for column in columns)
+        self._max_k = max(k for _rows, _columns, spans in self._tables for _o, k, _a, _b in spans)
+        self._dealer = LruCache(cache_size)
+        self._best = LruCache(cache_size)
+        self._root = LruCache(cache_size)
+        # Held while computing: the caches are shared with the background thread.
+        self._lock = threading.Lock()
+        self._deadline: Optional[float] = None
+        self._background_holds = False  # at the deadline, pause rather than give up
+        # Decisions for the background thread: ev_within() misses first, then warm().
+        self._pending: Deque[Tuple[int, bool, int, Counts]] = deque()
+        self._pending_cond = threading.Condition()
+        self._background: Optional[threading.Thread] = None
+
+    def _weights(self, up: int, counts: Counts) -> List[float]:
+        """orderings * prod(c_i falling m_i) for every row of upcard `up`'s table."""
+        # Falling factorials c*(c-1)*... per rank (zero past c).
+        top = self._max_drawn
+        ff = []
+        for c in counts:
+            row = [1.0] + [0.0] * top
+            for j in range(min(c, top)):
+                row[j + 1] = row[j] * (c - j)
+            ff.append(row)
+        weights = []
+        for cards, ways in self._tables[up][0]:
+            for i, m in cards:
+                ways *= ff[i][m]
+                if not ways:
+                    break
+            weights.append(ways)
+        return weights
+
+    def _drawn_weights(self, up: int, weights: List[float], c: int, i: int) -> List[float]:
+        """Row weights after one more card of rank `i` (of `c` left) is taken."""
+        scale = [(c - m) / c for m in range(self._max_drawn + 1)]
+        return [w * scale[m] for w, m in zip(weights, self._tables[up][1][i])]
+
+    def dealer_probs(self, up: int, counts: Counts, weights: Optional[List[float]] = None) -> Tuple[float, ...]:
+        key = (up, counts)
+        got = self._dealer.get(key)
+        if got is not None:
+            return got
+        if weights is None:
+            weights = self._weights(up, counts)
+        n = sum(counts)
+        # n falling k, the number of ordered k-card draws.
+        nff = [1.0] * (self._max_k + 1)
+        for j in range(min(n, self._max_k)):
+            nff[j + 1] = nff[j] * (n - j)
+        out = [0.0] * DEALER_OUTCOMES
+        for o, k, a, b in self._tables[up][2]:
+            out[o] += sum(weights[a:b]) / nff[k]
+        if n == 0 or not any(out):
+            # Empty composition (cannot happen with a real shoe): count it as standing.
+            out[max(upcard_points(up), DEALER_MAX) - DEALER_MAX] = 1.0
+        res = tuple(out)
+        self._dealer.put(key, res)
+        return res
+
+    def stand_ev(self, total: int, up: int, counts: Counts, weights: Optional[List[float]] = None) -> float:
+        probs = self.dealer_probs(up, counts, weights)
+        ev = probs[BUST]
+        for k in range(DEALER_OUTCOMES - 1):
+            final = DEALER_MAX + k
+            if total > final:
+                ev += probs[k]
+            elif total < final:
+                ev -= probs[k]
+        return ev
+
+    def _hit_ev(
+        self, hard: int, ace: bool, up: int, counts: Counts, n: int, bust: int, weights: Optional[List[float]]
+    ) -> float:
+        ev = -bust / n
+        for i, c in enumerate(counts):
+            if c and hard + POINTS[i] <= BLACKJACK:
+                ev += c / n * self._best_ev(hard + POINTS[i], ace or i == 0, up, _take(counts, i), weights, i)
+        return ev
+
+    def _best_ev(
+        self, hard: int, ace: bool, up: int, counts: Counts, parent: Optional[List[float]], drawn: int
+    ) -> float:
+        """Best EV of (hard, ace) on `counts`, reached by drawing rank `drawn` from `parent`'s."""
+        key = (hard, ace, up, counts)
+        got = self._best.get(key)
+        if got is not None:
+            return got
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            self._time_up()
+        if parent is None:
+            weights = self._weights(up, counts)
+        else:
+            weights = self._drawn_weights(up, parent, counts[drawn] + 1, drawn)
+        total, _ = _total(hard, ace)
+        n = sum(counts)
+        bust = sum(c for i, c in enumerate(counts) if hard + POINTS[i] > BLACKJACK)
+        if n == 0:
+            ev = self.stand_ev(total, up, counts, weights)
+        elif not bust and total < DEALER_MAX:
+            ev = self._hit_ev(hard, ace, up, counts, n, 0, weights)
+        else:
+            ev = self.stand_ev(total, up, counts, weights)
+            if ev < 1.0 - 2.0 * bust / n:
+                ev = max(ev, self._hit_ev(hard, ace, up, counts, n, bust, weights))
+        self._best.put(key, ev)
+        return ev
+
+    def stand_hit_ev(self, hard: int, ace: bool, up: int, counts: Counts) -> Tuple[float, float]:
+        key = (hard, ace, up, counts)
+        got = self._root.get(key)
+        if got is not None:
+            return got
+        total, _ = _total(hard, ace)
+        n = sum(counts)
+        # After a hit the composition was met below the previous decision, and its subtree
+        # is usually cached: skip the full table pass unless the dealer's odds are new.
+        weights = None if (up, counts) in self._dealer else self._weights(up, counts)
+        stand = self.stand_ev(total, up, counts, weights)
+        if n == 0:
+            res = (stand, stand)
+        else:
+            bust = sum(c for i, c in enumerate(counts) if hard + POINTS[i] > BLACKJACK)
+            res = (stand, self._hit_ev(hard, ace, up, counts, n, bust, weights))
+        self._root.put(key, res)
+        return res
+
+    def _time_up(self) -> None:
+        if not self._background_holds:
+            raise _OutOfTime
+        # The recursion only keeps local state, so a waiting ev_within() may use the
+        # caches in between.
+        self._deadline = None
+        self._lock.release()
+        time.sleep(0)
+        self._lock.acquire()
+        self._deadline, self._background_holds = time.perf_counter() + EV_SLICE_SEC, True
+
+    def ev(self, player_hand, dealer_upcard, remaining_counts: Sequence[int]) -> Tuple[float, float]:
+        """(Stand EV, Hit EV) per unit bet; see blackjack.ev for the arguments."""
+        with self._lock:
+            return self.stand_hit_ev(*_decision(player_hand, dealer_upcard, remaining_counts))
+
+    def ev_within(
+        self, player_hand, dealer_upcard, remaining_counts: Sequence[int], timeout: float
+    ) -> Optional[Tuple[float, float]]:
+        """ev(), or None if it takes longer than `timeout` seconds.
+
+        The background thread then finishes it, so asking again later (or after a hit,
+        whose subtree is part of it) finds it in the cache.
+        """
+        deadline = time.perf_counter() + timeout
+        decision = _decision(player_hand, dealer_upcard, remaining_counts)
+        _hard, _ace, up, counts = decision
+        got = None
+        # A composition the dealer's odds were never computed for costs a full table
+        # pass (~1 ms for an Ace up) that cannot be cut short: leave it to the background.
+        if (up, counts) in self._dealer and self._lock.acquire(timeout=timeout):
+            self._deadline, self._background_holds = deadline, False
+            try:
+                got = self.stand_hit_ev(*decision)
+            except _OutOfTime:
+                pass
+            finally:
+                self._deadline = None
+                self._lock.release()
+        if got is None:
+            self._queue([decision], urgent=True)
+        return got
+
+    def warm(self, remaining_counts: Sequence[int]) -> None:
+        """Compute every first decision that can be dealt from `remaining_counts` (each
+        two-card hand against each upcard) in the background, instead of what was queued."""
+        counts = counts_from_ranks(remaining_counts)
+        decisions = []
+        for up in range(RANKS):
+            for a in range(RANKS):
+                for b in range(a, RANKS):
+                    left = list(counts)
+                    for i in (up, a, b):
+                        left[i] -= 1
+                    if min(left) >= 0:
+                        decisions.append((POINTS[a] + POINTS[b], a == 0 or b == 0, up, tuple(left)))
+        self._queue(decisions, urgent=False)
+
+    def _queue(self, decisions: List[Tuple[int, bool, int, Counts]], urgent: bool) -> None:
+        with self._pending_cond:
+            if urgent:
+                self._pending.extendleft(decisions)
+            else:
+                self._pending.clear()
+                self._pending.extend(decisions)
+            if self._background is None:
+                self._background = threading.Thread(target=self._work, name="ev-oracle", daemon=True)
+                self._background.start()
+            self._pending_cond.notify()
+
+    def _work(self) -> None:
+        while True:
+            with self._pending_cond:
+                while not self._pending:
+                    self._pending_cond.wait()
+                decision = self._pending.popleft()
+            with self._lock:
+                self._deadline, self._background_holds = time.perf_counter() + EV_SLICE_SEC, True
+                try:
+                    self.stand_hit_ev(*decision)
+                finally:
+                    self._deadline = None
+            time.sleep(0)
+
+    def cache_info(self) -> str:
+        parts = []
+        for name, cache in (("decisions", self._root), ("subtrees", self._best), ("dealer", self._dealer)):
+            parts.append(f"{name} {len(cache)} ({cache.hits} hits, {cache.misses} misses, {cache.evictions} evicted)")
+        return ", ".join(parts)
+
+
+def _decision(player_hand, dealer_upcard, remaining_counts: Sequence[int]) -> Tuple[int, bool, int, Counts]:
+    """EvOracle.stand_hit_ev arguments for a live decision."""
+    hard = sum(rank_index_for_points(c.points) + 1 for c in player_hand.cards)
+    ace = any(c.rank == 1 for c in player_hand.cards)
+    return hard, ace, rank_index_for_points(dealer_upcard.points), counts_from_ranks(remaining_counts)
+
+
+_ORACLE: Optional[EvOracle] = None
+
+
+def default_oracle() -> EvOracle:
+    """Process-wide oracle used by blackjack.ev (built on first use, ~0.2s)."""
+    global _ORACLE
+    if _ORACLE is None:
+        _ORACLE = EvOracle()
+    return _ORACLE
+
+
+@dataclass
+class Strategy:
+    """Hit/Stand chart plus the numbers it was derived from."""
+
+    rules: dict
+    # hit[soft][total] -> string over UPCARD_POINTS, "H" = hit, "S" = stand
+    hit: Dict[str, Dict[str, str]]
+    # ev[soft][total] -> [[stand, hit], ...] per upcard (two-card-hand weighted averages)
+    ev: Dict[str, Dict[str, List[List[float]]]]
+    dealer: Dict[str, List[float]]  # upcard points -> final-total distribution
+    house_edge: float  # -EV per unit bet when following the chart
+    optimal_house_edge: float  # -EV with perfect composition-dependent play
+
+    def should_hit(self, total: int, soft: bool, upcard_points: int) -> bool:
+        row = self.hit["soft" if soft else "hard"].get(str(total))
+        if row is None:
+            # Totals never seen as a two-card hand: hit below 12 (cannot bust), else stand.
+            return total < BLACKJACK - ROYALTY_VALUE + 1
+        return row[upcard_points - UPCARD_POINTS[0]] == "H"
+
+    def format_chart(self) -> str:
+        head = "        " + " ".join(f"{'A' if u == ACE_VALUE else u:>2}" for u in UPCARD_POINTS)
+        lines = [head]
+        for kind in ("hard", "soft"):
+            for total in sorted(self.hit[kind], key=int):
+                lines.append(f"{kind} {int(total):2d} " + " ".join(f"{c:>2}" for c in self.hit[kind][total]))
+        return "\n".join(lines)
+
+
+def rules_key(decks: int) -> dict:
+    return {
+        "version": STRATEGY_VERSION,
+        "decks": decks,
+        "blackjack": BLACKJACK,
+        "dealer_max": DEALER_MAX,
+        "ace_value": ACE_VALUE,
+        "royalty_value": ROYALTY_VALUE,
+    }
+
+
+def compute(decks: int = DEFAULT_SHOE_DECKS, analyzer: Optional[Analyzer] = None) -> Strategy:
+    az = analyzer or Analyzer()
+    shoe = full_shoe(decks)
+    n0 = sum(shoe)
+
+    # Two-card hands per upcard, weighted by their probability given the upcard.
+    acc: Dict[Tuple[str, int, int], List[float]] = {}
+    dealer: Dict[str, List[float]] = {}
+    for up in range(RANKS):
+        after_up = _take(shoe, up)
+        dealer[str(upcard_points(up))] = list(az.dealer_probs(POINTS[up], up == 0, after_up))
+        n1 = sum(after_up)
+        for a in range(RANKS):
+            if not after_up[a]:
+                continue
+            after_a = _take(after_up, a)
+            for b in range(RANKS):
+                if not after_a[b]:
+                    continue
+                w = after_up[a] / n1 * after_a[b] / (n1 - 1)
+                hard, ace = POINTS[a] + POINTS[b], a == 0 or b == 0
+                total, soft = _total(hard, ace)
+                s, h = az.stand_hit_ev(hard, ace, up, _take(after_a, b))
+                slot = acc.setdefault(("soft" if soft else "hard", total, up), [0.0, 0.0, 0.0])
+                slot[0] += w
+                slot[1] += w * s
+                slot[2] += w * h
+
+    hit: Dict[str, Dict[str, str]] = {"hard": {}, "soft": {}}
+    ev: Dict[str, Dict[str, List[List[float]]]] = {"hard": {}, "soft": {}}
+    for kind in ("hard", "soft"):
+        totals = sorted({t for (k, t, _u) in acc if k == kind})
+        for total in totals:
+            row, evs = [], []
+            for up_points in UPCARD_POINTS:
+                w, ws, wh = acc[(kind, total, rank_index_for_points(up_points))]
+                s, h = ws / w, wh / w
+                row.append("H" if h > s else "S")
+                evs.append([s, h])
+            hit[kind][str(total)] = "".join(row)
+            ev[kind][str(total)] = evs
+
+    strategy = Strategy(rules=rules_key(decks), hit=hit, ev=ev, dealer=dealer, house_edge=0.0, optimal_house_edge=0.0)
+
+    # House edge: average over every initial deal (player, player, upcard).
+    chart_total = opt_total = 0.0
+    memo: dict = {}
+    for a in range(RANKS):
+        after_a = _take(shoe, a)
+        for b in range(RANKS):
+            if not after_a[b]:
+                continue
+            after_b = _take(after_a, b)
+            for up in range(RANKS):
+                if not after_b[up]:
+                    continue
+                w = shoe[a] / n0 * after_a[b] / (n0 - 1) * after_b[up] / (n0 - 2)
+                rest = _take(after_b, up)
+                hard, ace = POINTS[a] + POINTS[b], a == 0 or b == 0
+                chart_total += w * az.chart_ev(hard, ace, up, rest, strategy, memo)
+                opt_total += w * max(az.stand_hit_ev(hard, ace, up, rest))
+    strategy.house_edge = -chart_total
+    strategy.optimal_house_edge = -opt_total
+    return strategy
+
+
+# ---- disk cache ----
+
+def cache_dir() -> str:
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser("~"), ".cache", "thehousealwaysacks")
+
+
+def cache_path(decks: int) -> str:
+    digest = hashlib.sha1(json.dumps(rules_key(decks), sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir(), f"strategy-{digest}.json")
+
+
+def load_cached(decks: int = DEFAULT_SHOE_DECKS) -> Optional[Strategy]:
+    """The cached strategy for these rules, or None (missing, unreadable or stale)."""
+    try:
+        with open(cache_path(decks), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("rules") != rules_key(decks):
+            return None
+        return Strategy(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def save(strategy: Strategy) -> None:
+    path = cache_path(strategy.rules["decks"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write-then-rename so a concurrent reader never sees a partial file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(strategy.__dict__, f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load_or_compute(decks: int = DEFAULT_SHOE_DECKS) -> Strategy:
+    strategy = load_cached(decks)
+    if strategy is None:
+        strategy = compute(decks)
+        try:
+            save(strategy)
+        except OSError:
+            pass  # read-only home etc.: still usable, just recomputed next time
+    return strategy
+
+
+def main() -> None:
+    p = argparse.ArgumentParser()
+    p.add_argument("--decks", type=int, default=DEFAULT_SHOE_DECKS)
+    p.add_argument("--recompute", action="store_true", help="ignore the cache")
+    args = p.parse_args()
+
+    start = time.perf_counter()
+    strategy = None if args.recompute else load_cached(args.decks)
+    source = "cache"
+    if strategy is None:
+        strategy = compute(args.decks)
+        save(strategy)
+        source = "computed"
+    print(f"{args.decks}-deck rules ({source} in {time.perf_counter() - start:.2f}s, {cache_path(args.decks)})")
+    print(strategy.format_chart())
+    print(f"house edge with this chart:   {strategy.house_edge * 100:.3f}%")
+    print(f"house edge with perfect play: {strategy.optimal_house_edge * 100:.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""test_checkpoint.py
+
+- Checkpointer.recover on a file whose tail was torn or corrupted by a crash.
+"""
+
+from __future__ import annotations
+
+import secrets
+
+from checkpoint import REC_KEY, RECORD_HEAD, STATE_BODY, Checkpointer, encode_session, read_records
+from common import TOKEN_SIZE
+from sessions import Session
+from shuffle import ShoeFactory
+
+
+def _shoes() -> ShoeFactory:
+    return ShoeFactory(decks=2, seed=7, pool_depth=0)
+
+
+def _checkpoint_file(tmp_path, damage):
+    """A file with round 1, then round 2 of one session; `damage` edits round 2's records."""
+    shoes = _shoes()
+    session = Session("alice", 10, 0, shoes.new_shoe(), token=secrets.token_bytes(TOKEN_SIZE), round_idx=1)
+    first = encode_session(session)
+    session.round_idx = 2
+    path = tmp_path / "sessions.ckpt"
+    path.write_bytes(first + damage(bytearray(encode_session(session))))
+    return str(path), session.token
+
+
+def test_recover_ignores_truncated_last_record(tmp_path):
+    path, token = _checkpoint_file(tmp_path, lambda recs: recs[:-3])
+
+    (session,) = Checkpointer(path).recover(_shoes(), max_age=60.0)
+    assert session.token == token
+    assert session.client_name == "alice"
+    assert session.round_idx == 1
+    # The file was rewritten with only intact records.
+    with open(path, "rb") as f:
+        assert len(read_records(f.read())) == 3
+
+
+def test_recover_stops_at_flipped_crc(tmp_path):
+    def flip_last_crc(recs):
+        # The last record is round 2's STATE, with no cards between rounds.
+        recs[-(RECORD_HEAD.size + REC_KEY.size + STATE_BODY.size)] ^= 0x01
+        return recs
+
+    path, token = _checkpoint_file(tmp_path, flip_last_crc)
+
+    (session,) = Checkpointer(path).recover(_shoes(), max_age=60.0)
+    assert session.token == token
+    assert session.round_idx == 1
+
+
+def test_recover_missing_file(tmp_path):
+    assert Checkpointer(str(tmp_path / "none.ckpt")).recover(_shoes(), max_age=60.0) == []
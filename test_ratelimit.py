@@ -0,0 +1,50 @@
+"""test_ratelimit.py
+
+- RateLimiter: burst, refill at the rate, and LRU eviction of buckets (on a fake clock).
+"""
+
+from __future__ import annotations
+
+import pytest
+
+import ratelimit
+from ratelimit import BURST_SEC, RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_refill(clock):
+    limiter = RateLimiter("decisions", rate=5.0)
+    burst = int(5.0 * BURST_SEC)
+
+    assert all(limiter.allow("10.0.0.1") for _ in range(burst))
+    assert not limiter.allow("10.0.0.1")
+    assert not limiter.allow("10.0.0.1")
+    assert limiter.allow("10.0.0.2")  # other peers have their own bucket
+
+    clock[0] += 0.2  # one token at 5/s
+    assert limiter.allow("10.0.0.1")
+    assert not limiter.allow("10.0.0.1")
+
+    clock[0] += 60.0  # refills up to the burst, not beyond
+    assert all(limiter.allow("10.0.0.1") for _ in range(burst))
+    assert not limiter.allow("10.0.0.1")
+    assert (limiter.refused, limiter.throttled_peers) == (4, 3)
+
+
+def test_lru_eviction(clock):
+    limiter = RateLimiter("connections", rate=0.5, capacity=2)  # burst of one
+
+    assert limiter.allow("a")
+    assert limiter.allow("b")
+    assert not limiter.allow("a")  # a is now the most recently used
+    assert limiter.allow("c")      # evicts b
+    assert len(limiter) == 2
+
+    assert not limiter.allow("a")  # still tracked, still empty
+    assert limiter.allow("b")      # evicted: starts over with a full bucket
@@ -0,0 +1,55 @@
+"""test_sessions.py
+
+- SessionTable.park / claim: TTL expiry and capacity eviction (on a fake clock).
+"""
+
+from __future__ import annotations
+
+import secrets
+
+import pytest
+
+import sessions
+from common import TOKEN_SIZE
+from sessions import Session, SessionTable
+from shuffle import ShoeFactory
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _session(name: str) -> Session:
+    shoe = ShoeFactory(decks=1, seed=1, pool_depth=0).new_shoe()
+    return Session(name, 5, 0, shoe, token=secrets.token_bytes(TOKEN_SIZE))
+
+
+def test_claim_before_and_after_ttl(clock):
+    table = SessionTable(capacity=10, ttl=30.0)
+    early, late = _session("early"), _session("late")
+    table.park(early)
+    table.park(late)
+
+    clock[0] += 29.0
+    assert table.claim(early.token) is early
+    assert table.claim(early.token) is None  # claimed once only
+
+    clock[0] += 1.0
+    assert table.claim(late.token) is None
+    assert (table.resumed, table.expired) == (1, 1)
+
+
+def test_full_table_evicts_longest_parked(clock):
+    table = SessionTable(capacity=2, ttl=30.0)
+    first, second, third = _session("first"), _session("second"), _session("third")
+    for session in (first, second, third):
+        table.park(session)
+        clock[0] += 1.0
+
+    assert table.claim(first.token) is None
+    assert table.claim(second.token) is second
+    assert table.claim(third.token) is third
+    assert (table.evicted, table.expired) == (1, 0)